@@ -34,6 +34,13 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """autogenerate时忽略FTS5索引表及其影子表（由触发器维护，不在模型元数据中）"""
+    if type_ == "table" and name.startswith("search_index"):
+        return False
+    return True
+
+
 def get_url():
     """获取数据库URL"""
     return settings.DATABASE_URL
@@ -55,6 +62,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -81,7 +89,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,86 @@
+"""add materialized paths to tree tables
+
+Revision ID: 4c2e8a1f9b03
+Revises:
+Create Date: 2026-10-17 09:12:44.318201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2e8a1f9b03'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+TREE_TABLES = ("test_cases", "trade_templates", "test_data_nodes")
+
+
+def _backfill(connection, table_name):
+    """Compute path/full_path for every existing row in one pass"""
+    table = sa.table(
+        table_name,
+        sa.column("id", sa.Integer),
+        sa.column("parent_id", sa.Integer),
+        sa.column("name", sa.String),
+        sa.column("path", sa.String),
+        sa.column("full_path", sa.String),
+    )
+    rows = {row.id: row for row in connection.execute(sa.select(table.c.id, table.c.parent_id, table.c.name))}
+    paths = {}
+
+    def resolve(node_id):
+        # Iterative walk up to the first resolved ancestor, then back down
+        chain = []
+        current = node_id
+        while current is not None and current not in paths and current in rows:
+            chain.append(current)
+            current = rows[current].parent_id
+        parent_path, parent_full_path = paths.get(current, ("/", ""))
+        for chain_id in reversed(chain):
+            name = rows[chain_id].name
+            parent_path = f"{parent_path}{chain_id}/"
+            parent_full_path = f"{parent_full_path}/{name}" if parent_full_path else name
+            paths[chain_id] = (parent_path, parent_full_path)
+        return paths[node_id]
+
+    params = []
+    for node_id in rows:
+        path, full_path = resolve(node_id)
+        params.append({"node_id": node_id, "new_path": path, "new_full_path": full_path})
+
+    if params:
+        connection.execute(
+            table.update().where(table.c.id == sa.bindparam("node_id")).values(
+                path=sa.bindparam("new_path"), full_path=sa.bindparam("new_full_path")
+            ),
+            params,
+        )
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    for table_name in TREE_TABLES:
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        if "path" not in existing:
+            op.add_column(table_name, sa.Column("path", sa.String(length=1000), nullable=True))
+            op.create_index(f"ix_{table_name}_path", table_name, ["path"])
+        if "full_path" not in existing:
+            op.add_column(table_name, sa.Column("full_path", sa.String(length=2000), nullable=True))
+            op.create_index(f"ix_{table_name}_full_path", table_name, ["full_path"])
+
+        _backfill(connection, table_name)
+
+
+def downgrade() -> None:
+    for table_name in TREE_TABLES:
+        op.drop_index(f"ix_{table_name}_full_path", table_name=table_name)
+        op.drop_index(f"ix_{table_name}_path", table_name=table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column("full_path")
+            batch_op.drop_column("path")
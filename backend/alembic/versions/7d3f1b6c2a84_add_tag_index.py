@@ -0,0 +1,96 @@
+"""add normalized tag index for test cases
+
+Revision ID: 7d3f1b6c2a84
+Revises: 4c2e8a1f9b03
+Create Date: 2026-10-17 11:40:05.927113
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3f1b6c2a84'
+down_revision = '4c2e8a1f9b03'
+branch_labels = None
+depends_on = None
+
+
+def _parse_tags(value):
+    names = []
+    for part in (value or "").split(","):
+        name = part.strip().lstrip("@").strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _backfill(connection):
+    """Split the comma separated test_cases.tags strings into tags/test_case_tags rows"""
+    test_cases = sa.table("test_cases", sa.column("id", sa.Integer), sa.column("tags", sa.String))
+    tags = sa.table(
+        "tags",
+        sa.column("id", sa.Integer),
+        sa.column("name", sa.String),
+        sa.column("created_at", sa.DateTime),
+        sa.column("updated_at", sa.DateTime),
+    )
+    case_tags = sa.table("test_case_tags", sa.column("test_case_id", sa.Integer), sa.column("tag_id", sa.Integer))
+
+    case_names = {
+        row.id: _parse_tags(row.tags)
+        for row in connection.execute(sa.select(test_cases.c.id, test_cases.c.tags).where(test_cases.c.tags.isnot(None)))
+    }
+    tag_ids = dict(connection.execute(sa.select(tags.c.name, tags.c.id)).all())
+
+    now = datetime.utcnow()
+    missing = sorted({name for names in case_names.values() for name in names} - tag_ids.keys())
+    if missing:
+        connection.execute(tags.insert(), [{"name": name, "created_at": now, "updated_at": now} for name in missing])
+        tag_ids = dict(connection.execute(sa.select(tags.c.name, tags.c.id)).all())
+
+    existing = set(connection.execute(sa.select(case_tags.c.test_case_id, case_tags.c.tag_id)).all())
+    rows = [
+        {"test_case_id": case_id, "tag_id": tag_ids[name]}
+        for case_id, names in case_names.items()
+        for name in names
+        if (case_id, tag_ids[name]) not in existing
+    ]
+    if rows:
+        connection.execute(case_tags.insert(), rows)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    existing_tables = set(sa.inspect(connection).get_table_names())
+
+    if "tags" not in existing_tables:
+        op.create_table(
+            "tags",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String(length=100), nullable=False, comment="Tag name"),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_tags_id", "tags", ["id"])
+        op.create_index("ix_tags_name", "tags", ["name"], unique=True)
+
+    if "test_case_tags" not in existing_tables:
+        op.create_table(
+            "test_case_tags",
+            sa.Column("test_case_id", sa.Integer(), sa.ForeignKey("test_cases.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("tag_id", sa.Integer(), sa.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+        )
+        op.create_index("ix_test_case_tags_tag_id", "test_case_tags", ["tag_id", "test_case_id"])
+
+    _backfill(connection)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_test_case_tags_tag_id", table_name="test_case_tags")
+    op.drop_table("test_case_tags")
+    op.drop_index("ix_tags_name", table_name="tags")
+    op.drop_index("ix_tags_id", table_name="tags")
+    op.drop_table("tags")
@@ -0,0 +1,32 @@
+"""add fts5 search index with sync triggers
+
+Revision ID: 9a6e4d2c8f15
+Revises: 7d3f1b6c2a84
+Create Date: 2026-10-17 14:05:31.442870
+
+"""
+from alembic import op
+
+from app.models.search import SEARCH_SOURCES, SEARCH_TABLE, rebuild_search_index, search_index_ddl
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6e4d2c8f15'
+down_revision = '7d3f1b6c2a84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    for statement in search_index_ddl():
+        connection.exec_driver_sql(statement)
+    rebuild_search_index(connection)
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    for _, _, table, *_ in SEARCH_SOURCES:
+        for suffix in ("ai", "au", "ad"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}")
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
@@ -0,0 +1,39 @@
+"""add scenario_durations table for duration-balanced execution shards
+
+Revision ID: a7d9c1e3f5b8
+Revises: f1c3e5a7b9d2
+Create Date: 2026-10-17 23:52:17.480263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d9c1e3f5b8'
+down_revision = 'f1c3e5a7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scenario_durations',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nodeid', sa.String(length=500), nullable=False, comment='pytest node id'),
+        sa.Column('avg_duration', sa.Float(), nullable=False, comment='Moving average run time (seconds)'),
+        sa.Column('last_duration', sa.Float(), nullable=False, comment='Run time of the last execution (seconds)'),
+        sa.Column('samples', sa.Integer(), nullable=False, comment='Recorded runs'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nodeid'),
+    )
+    for column in ('id', 'created_at', 'updated_at'):
+        op.create_index(f'ix_scenario_durations_{column}', 'scenario_durations', [column])
+
+
+def downgrade() -> None:
+    for column in ('id', 'created_at', 'updated_at'):
+        op.drop_index(f'ix_scenario_durations_{column}', table_name='scenario_durations')
+    op.drop_table('scenario_durations')
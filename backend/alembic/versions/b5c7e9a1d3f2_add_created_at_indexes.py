@@ -0,0 +1,42 @@
+"""add created_at indexes for keyset pagination
+
+Revision ID: b5c7e9a1d3f2
+Revises: 9a6e4d2c8f15
+Create Date: 2026-10-17 16:22:48.105337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5c7e9a1d3f2'
+down_revision = '9a6e4d2c8f15'
+branch_labels = None
+depends_on = None
+
+
+TABLES = (
+    "projects", "tags", "test_cases", "test_data", "test_data_nodes", "test_steps",
+    "trade_templates", "test_case_files", "test_case_history", "test_case_reviews",
+    "test_case_steps", "test_executions", "test_reports", "test_step_results",
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+    for table_name in TABLES:
+        if table_name not in existing_tables:
+            continue
+        index_name = f"ix_{table_name}_created_at"
+        if index_name not in {index["name"] for index in inspector.get_indexes(table_name)}:
+            op.create_index(index_name, table_name, ["created_at"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+    for table_name in TABLES:
+        if table_name in existing_tables:
+            op.drop_index(f"ix_{table_name}_created_at", table_name=table_name)
@@ -0,0 +1,45 @@
+"""run template validation jobs through the execution_jobs queue
+
+Revision ID: b8e0f2a4c6d9
+Revises: a7d9c1e3f5b8
+Create Date: 2026-10-18 10:12:40.518327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e0f2a4c6d9'
+down_revision = 'a7d9c1e3f5b8'
+branch_labels = None
+depends_on = None
+
+
+def _execution_fk():
+    # SQLite的表重建不会保留反射得到的 ON DELETE，显式给出
+    return [sa.Column('execution_id', sa.Integer(), sa.ForeignKey('test_executions.id', ondelete='CASCADE'),
+                      nullable=False, comment='Execution to run')]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('execution_jobs', reflect_args=_execution_fk()) as batch_op:
+        batch_op.alter_column('execution_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('kind', existing_type=sa.String(length=50), existing_nullable=False,
+                              comment='Handler: playwright, engine or template_validation')
+        batch_op.add_column(sa.Column('validation_job_id', sa.Integer(), nullable=True,
+                                      comment='Template validation job to run'))
+        batch_op.create_foreign_key('fk_execution_jobs_validation_job_id', 'template_validation_jobs',
+                                    ['validation_job_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_index('ix_execution_jobs_validation_job_id', ['validation_job_id'])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM execution_jobs WHERE execution_id IS NULL")
+    with op.batch_alter_table('execution_jobs', reflect_args=_execution_fk()) as batch_op:
+        batch_op.drop_index('ix_execution_jobs_validation_job_id')
+        batch_op.drop_constraint('fk_execution_jobs_validation_job_id', type_='foreignkey')
+        batch_op.drop_column('validation_job_id')
+        batch_op.alter_column('kind', existing_type=sa.String(length=50), existing_nullable=False,
+                              comment='Handler: playwright or engine')
+        batch_op.alter_column('execution_id', existing_type=sa.Integer(), nullable=False)
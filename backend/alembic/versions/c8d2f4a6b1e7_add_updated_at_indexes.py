@@ -0,0 +1,42 @@
+"""add updated_at indexes for conditional GET validators
+
+Revision ID: c8d2f4a6b1e7
+Revises: b5c7e9a1d3f2
+Create Date: 2026-10-17 18:05:12.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8d2f4a6b1e7'
+down_revision = 'b5c7e9a1d3f2'
+branch_labels = None
+depends_on = None
+
+
+TABLES = (
+    "projects", "tags", "test_cases", "test_data", "test_data_nodes", "test_steps",
+    "trade_templates", "test_case_files", "test_case_history", "test_case_reviews",
+    "test_case_steps", "test_executions", "test_reports", "test_step_results",
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+    for table_name in TABLES:
+        if table_name not in existing_tables:
+            continue
+        index_name = f"ix_{table_name}_updated_at"
+        if index_name not in {index["name"] for index in inspector.get_indexes(table_name)}:
+            op.create_index(index_name, table_name, ["updated_at"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+    for table_name in TABLES:
+        if table_name in existing_tables:
+            op.drop_index(f"ix_{table_name}_updated_at", table_name=table_name)
@@ -0,0 +1,47 @@
+"""add cache revision and broadcast message tables for the cross-process change feed
+
+Revision ID: d3a9b7c5e2f1
+Revises: c8d2f4a6b1e7
+Create Date: 2026-10-17 19:12:40.518263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.change_feed import drop_revision_triggers, revision_trigger_ddl
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9b7c5e2f1'
+down_revision = 'c8d2f4a6b1e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cache_revisions',
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name'),
+    )
+    op.create_table(
+        'broadcast_messages',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('channel', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False, comment='JSON'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_broadcast_messages_created_at', 'broadcast_messages', ['created_at'])
+
+    connection = op.get_bind()
+    for statement in revision_trigger_ddl(set(sa.inspect(connection).get_table_names())):
+        connection.exec_driver_sql(statement)
+
+
+def downgrade() -> None:
+    drop_revision_triggers(op.get_bind())
+    op.drop_index('ix_broadcast_messages_created_at', table_name='broadcast_messages')
+    op.drop_table('broadcast_messages')
+    op.drop_table('cache_revisions')
@@ -0,0 +1,73 @@
+"""add trade template xml_schema and bulk validation job/result tables
+
+Revision ID: e6b4c2d8a0f3
+Revises: d3a9b7c5e2f1
+Create Date: 2026-10-17 21:36:08.214571
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b4c2d8a0f3'
+down_revision = 'd3a9b7c5e2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 直接 ALTER TABLE（不重建表），保留 trade_templates 上的变更通知触发器
+    op.add_column('trade_templates', sa.Column(
+        'xml_schema', sa.Text(), nullable=True,
+        comment='XSD the rendered output must conform to (inherited by descendants)',
+    ))
+
+    op.create_table(
+        'template_validation_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('root_id', sa.Integer(), nullable=False, comment='Root node of the validated subtree'),
+        sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='validationjobstatus'),
+                  nullable=False, comment='Job status'),
+        sa.Column('total', sa.Integer(), nullable=True, comment='Templates to validate'),
+        sa.Column('valid_count', sa.Integer(), nullable=True, comment='Valid templates so far'),
+        sa.Column('invalid_count', sa.Integer(), nullable=True, comment='Invalid templates so far'),
+        sa.Column('error', sa.Text(), nullable=True, comment='Why the job failed'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='Start time'),
+        sa.Column('completed_at', sa.DateTime(), nullable=True, comment='Completion time'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['root_id'], ['trade_templates.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    for column in ('id', 'root_id', 'created_at', 'updated_at'):
+        op.create_index(f'ix_template_validation_jobs_{column}', 'template_validation_jobs', [column])
+
+    op.create_table(
+        'template_validation_results',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=False),
+        sa.Column('valid', sa.Boolean(), nullable=False, comment='Rendered and parsed without errors'),
+        sa.Column('errors', sa.JSON(), nullable=True, comment='Error messages'),
+        sa.Column('warnings', sa.JSON(), nullable=True, comment='Warning messages'),
+        sa.Column('duration_ms', sa.Float(), nullable=True, comment='Render + parse time'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['template_validation_jobs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['template_id'], ['trade_templates.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    for column in ('id', 'job_id', 'template_id', 'created_at', 'updated_at'):
+        op.create_index(f'ix_template_validation_results_{column}', 'template_validation_results', [column])
+
+
+def downgrade() -> None:
+    for column in ('id', 'job_id', 'template_id', 'created_at', 'updated_at'):
+        op.drop_index(f'ix_template_validation_results_{column}', table_name='template_validation_results')
+    op.drop_table('template_validation_results')
+    for column in ('id', 'root_id', 'created_at', 'updated_at'):
+        op.drop_index(f'ix_template_validation_jobs_{column}', table_name='template_validation_jobs')
+    op.drop_table('template_validation_jobs')
+
+    op.drop_column('trade_templates', 'xml_schema')
@@ -0,0 +1,51 @@
+"""add execution_jobs table for the durable test execution queue
+
+Revision ID: f1c3e5a7b9d2
+Revises: e6b4c2d8a0f3
+Create Date: 2026-10-17 22:48:51.093317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c3e5a7b9d2'
+down_revision = 'e6b4c2d8a0f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'execution_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('execution_id', sa.Integer(), nullable=False, comment='Execution to run'),
+        sa.Column('kind', sa.String(length=50), nullable=False, comment='Handler: playwright or engine'),
+        sa.Column('priority', sa.Integer(), nullable=False, comment='Higher runs first'),
+        sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', name='jobstatus'),
+                  nullable=False, comment='Job status'),
+        sa.Column('attempts', sa.Integer(), nullable=False, comment='Times claimed'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, comment='Give up after this many attempts'),
+        sa.Column('available_at', sa.DateTime(), nullable=False, comment='Not claimed before (retry backoff)'),
+        sa.Column('worker_id', sa.String(length=200), nullable=True, comment='Worker holding the lease'),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True,
+                  comment="Lease end, renewed by the worker's heartbeat"),
+        sa.Column('last_error', sa.Text(), nullable=True, comment='Error of the last failed attempt'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='Start of the last attempt'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='Completion time'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['execution_id'], ['test_executions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_execution_jobs_claim', 'execution_jobs', ['status', 'priority', 'id'])
+    for column in ('id', 'execution_id', 'created_at', 'updated_at'):
+        op.create_index(f'ix_execution_jobs_{column}', 'execution_jobs', [column])
+
+
+def downgrade() -> None:
+    for column in ('id', 'execution_id', 'created_at', 'updated_at'):
+        op.drop_index(f'ix_execution_jobs_{column}', table_name='execution_jobs')
+    op.drop_index('ix_execution_jobs_claim', table_name='execution_jobs')
+    op.drop_table('execution_jobs')
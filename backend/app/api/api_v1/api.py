@@ -7,7 +7,10 @@ from app.api.api_v1.endpoints import (
     test_data,
     projects,
     trade_templates,
-    test_case_files
+    test_case_files,
+    search,
+    agents,
+    execution_engine
 )
 from app.api.api_v1.endpoints import test_executions_simplified as test_executions
 from app.api.api_v1.endpoints import test_cases_simplified as test_cases
@@ -57,3 +60,21 @@ api_router.include_router(
     prefix="/test-case-files",
     tags=["test-case-files"]
 )
+
+api_router.include_router(
+    search.router,
+    prefix="/search",
+    tags=["search"]
+)
+
+api_router.include_router(
+    agents.router,
+    prefix="/agents",
+    tags=["agents"]
+)
+
+api_router.include_router(
+    execution_engine.router,
+    prefix="/execution-engine",
+    tags=["execution-engine"]
+)
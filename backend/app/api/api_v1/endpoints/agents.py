@@ -0,0 +1,85 @@
+"""
+Remote Execution Agent API Endpoints
+
+Agents (``backend/qa_agent.py``) pull playwright jobs from the execution
+queue, run them on their own machine and report back under the job lease.
+"""
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_db
+from app.services.agent_jobs import (
+    LeaseLost,
+    claim_for_agent,
+    complete_for_agent,
+    heartbeat,
+    record_results,
+)
+
+router = APIRouter()
+
+
+class ClaimRequest(BaseModel):
+    agent_id: str = Field(..., min_length=1, max_length=200)
+    kinds: List[str] = ["playwright"]
+    lease_seconds: int = Field(60, ge=10, le=3600)
+
+
+class LeaseRequest(BaseModel):
+    agent_id: str
+    lease_seconds: int = Field(60, ge=10, le=3600)
+
+
+class ResultsRequest(LeaseRequest):
+    results: List[Dict[str, Any]] = Field(..., description="pytest test reports: nodeid, outcome, duration, longrepr")
+
+
+class CompleteRequest(BaseModel):
+    agent_id: str
+    report: Optional[Dict[str, Any]] = Field(None, description="Run report: summary (total/passed/failed/skipped) and tests")
+    error: Optional[str] = Field(None, description="Why the run could not complete; the job is retried")
+
+
+async def _under_lease(db: AsyncSession, function, *args):
+    try:
+        return await db.run_sync(lambda session: function(session, *args))
+    except LeaseLost as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/claim")
+async def claim_job(request: ClaimRequest, db: AsyncSession = Depends(get_async_db)):
+    """Claim the next queued job; 204 when there is nothing to run"""
+    claimed = await db.run_sync(
+        lambda session: claim_for_agent(session, request.agent_id, request.kinds, request.lease_seconds)
+    )
+    if claimed is None:
+        return Response(status_code=204)
+    # 租约期内至少续约两次
+    return {**claimed, "heartbeat_interval": request.lease_seconds / 3}
+
+
+@router.post("/jobs/{job_id}/heartbeat")
+async def renew_job_lease(job_id: int, request: LeaseRequest, db: AsyncSession = Depends(get_async_db)):
+    """Extend the lease; 409 when the agent no longer holds the job"""
+    await _under_lease(db, heartbeat, job_id, request.agent_id, request.lease_seconds)
+    return {"job_id": job_id, "lease_seconds": request.lease_seconds}
+
+
+@router.post("/jobs/{job_id}/results")
+async def report_job_results(job_id: int, request: ResultsRequest, db: AsyncSession = Depends(get_async_db)):
+    """Stream finished test results back (also renews the lease)"""
+    await _under_lease(db, record_results, job_id, request.agent_id, request.results, request.lease_seconds)
+    return {"job_id": job_id, "received": len(request.results)}
+
+
+@router.post("/jobs/{job_id}/complete")
+async def complete_job(job_id: int, request: CompleteRequest, db: AsyncSession = Depends(get_async_db)):
+    """Finish the job with the run report, or with an error to retry it"""
+    if (request.report is None) == (request.error is None):
+        raise HTTPException(status_code=400, detail="Exactly one of report and error is required")
+    job = await _under_lease(db, complete_for_agent, job_id, request.agent_id, request.report, request.error)
+    return {"job_id": job.id, "status": job.status.value, "attempts": job.attempts, "last_error": job.last_error}
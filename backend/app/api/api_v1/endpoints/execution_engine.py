@@ -1,10 +1,11 @@
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.api import deps
+from app.core.database import get_db
 from app.services.execution_engine import ExecutionEngineService
+from app.services.job_queue import enqueue
 from app.models.test_execution import TestExecution, TestStepResult
 
 router = APIRouter()
@@ -16,6 +17,7 @@ class ExecutionCreateRequest(BaseModel):
     browser: str = "chromium"
     headless: bool = True
     project_id: int = None
+    priority: int = 0
 
 class ExecutionResponse(BaseModel):
     id: int
@@ -46,8 +48,7 @@ class StepResultResponse(BaseModel):
 @router.post("/executions", response_model=ExecutionResponse)
 async def create_execution(
     request: ExecutionCreateRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """创建并启动测试执行"""
     service = ExecutionEngineService(db)
@@ -58,15 +59,15 @@ async def create_execution(
         config=request.dict()
     )
     
-    # 后台异步执行
-    background_tasks.add_task(service.start_execution, execution.id)
+    # 加入持久化执行队列，由执行worker领取
+    enqueue(db, execution.id, "engine", request.priority)
     
     return execution
 
 @router.get("/executions/{execution_id}", response_model=ExecutionResponse)
 def get_execution(
     execution_id: int,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """获取执行状态"""
     service = ExecutionEngineService(db)
@@ -80,7 +81,7 @@ def get_execution(
 @router.get("/executions/{execution_id}/steps", response_model=List[StepResultResponse])
 def get_execution_steps(
     execution_id: int,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """获取执行步骤详情"""
     service = ExecutionEngineService(db)
@@ -91,7 +92,7 @@ def get_execution_steps(
 @router.post("/executions/{execution_id}/stop")
 async def stop_execution(
     execution_id: int,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """停止执行"""
     # TODO: 实现停止执行逻辑
@@ -100,7 +101,7 @@ async def stop_execution(
 @router.get("/executions/{execution_id}/report")
 def get_execution_report(
     execution_id: int,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """获取执行报告"""
     service = ExecutionEngineService(db)
@@ -129,7 +130,7 @@ class FeatureFileRequest(BaseModel):
 @router.post("/feature-files")
 def create_feature_file(
     request: FeatureFileRequest,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """创建或更新Feature文件"""
     from app.models.execution_engine import FeatureFile
@@ -167,7 +168,7 @@ def create_feature_file(
 @router.get("/feature-files/{test_case_id}")
 def get_feature_file(
     test_case_id: int,
-    db: Session = Depends(deps.get_db)
+    db: Session = Depends(get_db)
 ):
     """获取测试用例关联的Feature文件"""
     from app.models.execution_engine import FeatureFile
@@ -182,40 +183,9 @@ def get_feature_file(
     
     return feature_file
 
-# WebSocket支持实时状态更新
+# WebSocket支持实时状态更新（执行、队列和agent在状态变化时经 execution_updates 推送）
 from fastapi import WebSocket, WebSocketDisconnect
-import json
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-    
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-    
-    async def broadcast_execution_update(self, execution_id: int, data: Dict):
-        message = {
-            "type": "execution_update",
-            "execution_id": execution_id,
-            "data": data
-        }
-        
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                disconnected.append(connection)
-        
-        # 清理断开的连接
-        for connection in disconnected:
-            self.active_connections.remove(connection)
-
-manager = ConnectionManager()
+from app.services.execution_updates import execution_updates as manager
 
 @router.websocket("/ws/executions")
 async def websocket_endpoint(websocket: WebSocket):
@@ -2,10 +2,11 @@
 项目管理相关API端点
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.project import Project, ProjectStatus
 
 router = APIRouter()
@@ -32,9 +33,9 @@ class ProjectResponse(BaseModel):
         from_attributes = True
 
 @router.get("/", response_model=List[ProjectResponse])
-async def get_projects(db: Session = Depends(get_db)):
+async def get_projects(db: AsyncSession = Depends(get_async_db)):
     """Get project list"""
-    projects = db.query(Project).all()
+    projects = (await db.scalars(select(Project))).all()
     # Convert enum to string for response
     result = []
     for project in projects:
@@ -50,10 +51,10 @@ async def get_projects(db: Session = Depends(get_db)):
     return result
 
 @router.post("/", response_model=ProjectResponse)
-async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
+async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_async_db)):
     """Create new project"""
     # Check if project name already exists
-    existing_project = db.query(Project).filter(Project.name == project.name).first()
+    existing_project = await db.scalar(select(Project).where(Project.name == project.name))
     if existing_project:
         raise HTTPException(status_code=400, detail="Project name already exists")
 
@@ -70,8 +71,8 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
         status=status_enum
     )
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
 
     # Return formatted response
     return {
@@ -84,27 +85,27 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
     }
 
 @router.get("/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: int, db: Session = Depends(get_db)):
+async def get_project(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取项目详情"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 @router.put("/{project_id}", response_model=ProjectResponse)
-async def update_project(project_id: int, project: ProjectUpdate, db: Session = Depends(get_db)):
+async def update_project(project_id: int, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
     """更新项目"""
-    db_project = db.query(Project).filter(Project.id == project_id).first()
+    db_project = await db.get(Project, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
 
     # 更新字段
     if project.name is not None:
         # 检查名称是否与其他项目冲突
-        existing = db.query(Project).filter(
+        existing = await db.scalar(select(Project).where(
             Project.name == project.name,
             Project.id != project_id
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Project name already exists")
         db_project.name = project.name
@@ -115,17 +116,17 @@ async def update_project(project_id: int, project: ProjectUpdate, db: Session =
     if project.status is not None:
         db_project.status = ProjectStatus.ACTIVE if project.status == "active" else ProjectStatus.PAUSED
 
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     return db_project
 
 @router.delete("/{project_id}")
-async def delete_project(project_id: int, db: Session = Depends(get_db)):
+async def delete_project(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除项目"""
-    db_project = db.query(Project).filter(Project.id == project_id).first()
+    db_project = await db.get(Project, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    db.delete(db_project)
-    db.commit()
+    await db.delete(db_project)
+    await db.commit()
     return {"message": "Project deleted successfully"}
@@ -0,0 +1,90 @@
+"""
+Full-text Search API Endpoints (SQLite FTS5)
+"""
+import html
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.models.search import KIND_CODES, SEARCH_TABLE, decode_rowid
+from app.utils.pagination import decode_cursor, encode_cursor
+
+router = APIRouter()
+
+# 高亮标记先用私有区字符占位，HTML转义后再替换成<mark>，避免内容中的标签被原样输出
+_MARK_START, _MARK_END = "\ue000", "\ue001"
+SNIPPET_TOKENS = 24
+
+
+def build_match_query(q: str) -> str:
+    """把用户输入转换为FTS5查询：每个词按短语前缀匹配，词之间为AND"""
+    terms = ['"' + term.replace('"', '""') + '"*' for term in q.split()]
+    return " ".join(terms)
+
+
+def render_highlight(value: str) -> str:
+    return html.escape(value or "").replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+@router.get("/")
+async def search(
+    q: str = Query(..., min_length=1, description="Search text, words are prefix-matched and ANDed"),
+    kinds: Optional[str] = Query(None, description="Comma separated: test_case,test_case_file,test_step,trade_template"),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked (bm25) full-text search over test cases, feature files, steps and trade templates"""
+    match = build_match_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Empty search query")
+
+    conditions = [f"{SEARCH_TABLE} MATCH :match"]
+    params = {"match": match, "mark_start": _MARK_START, "mark_end": _MARK_END, "limit": limit + 1}
+    bind_params = []
+
+    if kinds:
+        kind_list = [kind.strip() for kind in kinds.split(",") if kind.strip()]
+        unknown = [kind for kind in kind_list if kind not in KIND_CODES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown kinds: {', '.join(unknown)}")
+        conditions.append("kind IN :kinds")
+        params["kinds"] = kind_list
+        bind_params.append(bindparam("kinds", expanding=True))
+
+    if cursor:
+        # 键集分页：按 (rank, rowid) 继续，不使用OFFSET
+        after_rank, after_rowid = decode_cursor(cursor, 2)
+        try:
+            params["after_rank"], params["after_rowid"] = float(after_rank), int(after_rowid)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        conditions.append("(rank > :after_rank OR (rank = :after_rank AND rowid > :after_rowid))")
+
+    statement = text(
+        f"SELECT rowid, kind, rank, "
+        f"highlight({SEARCH_TABLE}, 0, :mark_start, :mark_end) AS title, "
+        f"snippet({SEARCH_TABLE}, 1, :mark_start, :mark_end, '…', {SNIPPET_TOKENS}) AS snippet "
+        f"FROM {SEARCH_TABLE} WHERE {' AND '.join(conditions)} "
+        f"ORDER BY rank, rowid LIMIT :limit"
+    ).bindparams(*bind_params)
+
+    rows = (await db.execute(statement, params)).all()
+
+    items = []
+    for row in rows[:limit]:
+        kind, entity_id = decode_rowid(row.rowid)
+        items.append({
+            "kind": kind,
+            "id": entity_id,
+            "title": render_highlight(row.title),
+            "snippet": render_highlight(row.snippet),
+            "rank": row.rank,
+        })
+
+    next_cursor = encode_cursor(rows[limit - 1].rank, rows[limit - 1].rowid) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
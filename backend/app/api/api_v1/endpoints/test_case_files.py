@@ -1,13 +1,17 @@
 """
 Test Case File Management API Endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.test_case_file import TestCaseFile, FileType
+from app.utils.conditional import row_validator
+from app.utils.pagination import PageParams, paginate
+from app.utils.projection import FieldSet, ProjectionParams, iso
 
 router = APIRouter()
 
@@ -41,60 +45,69 @@ class TestCaseFileResponse(BaseModel):
         from_attributes = True
 
 
+# 列表默认不返回文件内容，需要时用 include=content
+TEST_CASE_FILE_FIELDS = FieldSet(TestCaseFile, {
+    "id": None,
+    "name": None,
+    "file_type": lambda f: f.file_type.value,
+    "content": lambda f: f.content or "",
+    "test_case_id": None,
+    "creator_id": None,
+    "is_active": None,
+    "version": None,
+    "full_name": (lambda f: f.full_name, ("name", "file_type")),
+    "file_extension": (lambda f: f.file_extension, ("file_type",)),
+    "created_at": lambda f: iso(f.created_at),
+    "updated_at": lambda f: iso(f.updated_at),
+}, default=[
+    "name", "file_type", "test_case_id", "creator_id", "is_active", "version",
+    "full_name", "file_extension", "created_at", "updated_at",
+])
+
+
 @router.get("/")
 async def get_test_case_files(
+    response: Response,
     test_case_id: Optional[int] = Query(None, description="Test case ID filter"),
     file_type: Optional[str] = Query(None, description="File type filter"),
-    db: Session = Depends(get_db)
+    page: PageParams = Depends(),
+    projection: ProjectionParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get test case files"""
-    query = db.query(TestCaseFile).filter(TestCaseFile.is_active == True)
+    """Get test case files, optionally keyset paginated and projected (content only with include=content)"""
+    selected = TEST_CASE_FILE_FIELDS.resolve(projection)
+    query = select(TestCaseFile).where(TestCaseFile.is_active == True).options(
+        TEST_CASE_FILE_FIELDS.load_only(selected)
+    )
 
     if test_case_id:
-        query = query.filter(TestCaseFile.test_case_id == test_case_id)
+        query = query.where(TestCaseFile.test_case_id == test_case_id)
 
     if file_type:
-        query = query.filter(TestCaseFile.file_type == FileType(file_type))
-    
-    files = query.order_by(TestCaseFile.created_at.desc()).all()
-    
-    result = []
-    for file in files:
-        result.append({
-            "id": file.id,
-            "name": file.name,
-            "file_type": file.file_type.value,
-            "content": file.content or "",
-            "test_case_id": file.test_case_id,
-            "creator_id": file.creator_id,
-            "is_active": file.is_active,
-            "version": file.version,
-            "full_name": file.full_name,
-            "file_extension": file.file_extension,
-            "created_at": file.created_at.isoformat() if file.created_at else None,
-            "updated_at": file.updated_at.isoformat() if file.updated_at else None,
-        })
-    
-    return result
+        query = query.where(TestCaseFile.file_type == FileType(file_type))
+    
+    files = await paginate(db, query, TestCaseFile, page, response)
+    
+    return [TEST_CASE_FILE_FIELDS.serialize(file, selected) for file in files]
 
 
 @router.post("/")
-async def create_test_case_file(file: TestCaseFileCreate, db: Session = Depends(get_db)):
+async def create_test_case_file(file: TestCaseFileCreate, db: AsyncSession = Depends(get_async_db)):
     """Create new test case file"""
     
     # Check if test case exists
     from app.models.test_case import TestCase
-    test_case = db.query(TestCase).filter(TestCase.id == file.test_case_id).first()
+    test_case = await db.get(TestCase, file.test_case_id)
     if not test_case:
         raise HTTPException(status_code=404, detail="Test case not found")
     
     # Check name conflict for same test case and file type
-    existing = db.query(TestCaseFile).filter(
+    existing = await db.scalar(select(TestCaseFile).where(
         TestCaseFile.name == file.name,
         TestCaseFile.test_case_id == file.test_case_id,
         TestCaseFile.file_type == FileType(file.file_type),
         TestCaseFile.is_active == True
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="File name already exists for this test case")
     
@@ -108,8 +121,8 @@ async def create_test_case_file(file: TestCaseFileCreate, db: Session = Depends(
     )
     
     db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
+    await db.commit()
+    await db.refresh(db_file)
     
     return {
         "id": db_file.id,
@@ -128,12 +141,16 @@ async def create_test_case_file(file: TestCaseFileCreate, db: Session = Depends(
 
 
 @router.get("/{file_id}")
-async def get_test_case_file(file_id: int, db: Session = Depends(get_db)):
+async def get_test_case_file(file_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get test case file details"""
-    file = db.query(TestCaseFile).filter(TestCaseFile.id == file_id).first()
-    
-    if not file:
+    validator = await row_validator(db, request, TestCaseFile, file_id)
+    if not validator:
         raise HTTPException(status_code=404, detail="File not found")
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    file = await db.get(TestCaseFile, file_id)
     
     return {
         "id": file.id,
@@ -152,22 +169,22 @@ async def get_test_case_file(file_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{file_id}")
-async def update_test_case_file(file_id: int, file: TestCaseFileUpdate, db: Session = Depends(get_db)):
+async def update_test_case_file(file_id: int, file: TestCaseFileUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update test case file"""
-    db_file = db.query(TestCaseFile).filter(TestCaseFile.id == file_id).first()
+    db_file = await db.get(TestCaseFile, file_id)
     
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
     
     # Check name conflict if name is being updated
     if file.name and file.name != db_file.name:
-        existing = db.query(TestCaseFile).filter(
+        existing = await db.scalar(select(TestCaseFile).where(
             TestCaseFile.name == file.name,
             TestCaseFile.test_case_id == db_file.test_case_id,
             TestCaseFile.file_type == db_file.file_type,
             TestCaseFile.id != file_id,
             TestCaseFile.is_active == True
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="File name already exists for this test case")
     
@@ -179,8 +196,8 @@ async def update_test_case_file(file_id: int, file: TestCaseFileUpdate, db: Sess
     if file.is_active is not None:
         db_file.is_active = file.is_active
     
-    db.commit()
-    db.refresh(db_file)
+    await db.commit()
+    await db.refresh(db_file)
     
     return {
         "id": db_file.id,
@@ -199,24 +216,24 @@ async def update_test_case_file(file_id: int, file: TestCaseFileUpdate, db: Sess
 
 
 @router.delete("/{file_id}")
-async def delete_test_case_file(file_id: int, db: Session = Depends(get_db)):
+async def delete_test_case_file(file_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete test case file"""
-    file = db.query(TestCaseFile).filter(TestCaseFile.id == file_id).first()
+    file = await db.get(TestCaseFile, file_id)
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     # Soft delete
     file.is_active = False
-    db.commit()
+    await db.commit()
     
     return {"message": "File deleted successfully"}
 
 
 @router.post("/{file_id}/validate")
-async def validate_file_content(file_id: int, db: Session = Depends(get_db)):
+async def validate_file_content(file_id: int, db: AsyncSession = Depends(get_async_db)):
     """Validate file content based on file type"""
-    file = db.query(TestCaseFile).filter(TestCaseFile.id == file_id).first()
+    file = await db.get(TestCaseFile, file_id)
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
@@ -7,6 +7,7 @@ from typing import List, Optional
 from pydantic import BaseModel
 from app.core.database import get_db
 from app.models.test_case import TestCase, Priority, TestCaseStatus
+from app.services.tree_service import load_subtree, build_tree
 
 router = APIRouter()
 
@@ -60,17 +61,15 @@ async def get_test_cases_tree(
     db: Session = Depends(get_db)
 ):
     """获取测试用例树形结构"""
-    query = db.query(TestCase)
-
+    criteria = []
     if project_id:
-        query = query.filter(TestCase.project_id == project_id)
+        criteria.append(TestCase.project_id == project_id)
 
-    if parent_id is None:
-        query = query.filter(TestCase.parent_id.is_(None))
-    else:
-        query = query.filter(TestCase.parent_id == parent_id)
-
-    cases = query.order_by(TestCase.sort_order, TestCase.created_at).all()
+    # 一次递归查询加载整棵子树
+    cases = load_subtree(
+        db, TestCase, parent_id, *criteria,
+        order_by=(TestCase.sort_order, TestCase.created_at)
+    )
 
     # Helper function to convert case to dict
     def case_to_dict(case):
@@ -87,31 +86,12 @@ async def get_test_cases_tree(
             "sort_order": case.sort_order or 0,
             "project_id": case.project_id,
             "creator_id": case.creator_id,
-            "full_path": case.name,  # Simplified for now
+            "full_path": case.full_path or case.name,
             "created_at": case.created_at.isoformat() if case.created_at else None,
             "updated_at": case.updated_at.isoformat() if case.updated_at else None,
         }
 
-    # Recursively load children
-    def load_children(case):
-        children = db.query(TestCase).filter(
-            TestCase.parent_id == case.id
-        ).order_by(TestCase.sort_order, TestCase.created_at).all()
-
-        result = []
-        for child in children:
-            child_dict = case_to_dict(child)
-            child_dict['children'] = load_children(child)
-            result.append(child_dict)
-        return result
-
-    result = []
-    for case in cases:
-        case_dict = case_to_dict(case)
-        case_dict['children'] = load_children(case)
-        result.append(case_dict)
-
-    return result
+    return build_tree(cases, case_to_dict, parent_id)
 
 @router.get("/")
 async def get_test_cases(
@@ -146,7 +126,7 @@ async def get_test_cases(
             "sort_order": case.sort_order if hasattr(case, 'sort_order') else 0,
             "project_id": case.project_id,
             "creator_id": case.creator_id,
-            "full_path": case.name,
+            "full_path": case.full_path or case.name,
             "children": [],
             "created_at": case.created_at.isoformat() if case.created_at else None,
             "updated_at": case.updated_at.isoformat() if case.updated_at else None,
@@ -1,13 +1,22 @@
 """
 Test Case Management API Endpoints - Simplified Version
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.test_case import TestCase
+from app.models.test_case_file import TestCaseFile
+from app.services.tree_cache import tree_cache
+from app.services.tree_service import subtree_cte, build_tree, move_error
+from app.utils.conditional import collection_validator, row_validator
+from app.utils.pagination import PageParams, paginate
+from app.utils.projection import FieldSet, ProjectionParams, iso
+from app.api.api_v1.endpoints.test_case_files import TEST_CASE_FILE_FIELDS
 
 router = APIRouter()
 
@@ -24,6 +33,7 @@ class TestCaseUpdate(BaseModel):
     tags: str = None
     gherkin_content: str = None
     is_folder: bool = None
+    parent_id: Optional[int] = None  # Move under this node (null: to the root) when given
 
 class TestCaseResponse(BaseModel):
     id: int
@@ -46,109 +56,114 @@ class TestCaseResponse(BaseModel):
 # Resolve forward references
 TestCaseResponse.model_rebuild()
 
+# 列表和树默认不返回 gherkin_content，需要时用 include=gherkin_content
+TEST_CASE_FIELDS = FieldSet(TestCase, {
+    "id": None,
+    "name": None,
+    "tags": lambda c: c.tags or "",
+    "gherkin_content": lambda c: c.gherkin_content or "",
+    "is_folder": lambda c: bool(c.is_folder),
+    "parent_id": None,
+    "sort_order": lambda c: c.sort_order or 0,
+    "creator_id": None,
+    "full_path": (lambda c: c.full_path or c.name, ("full_path", "name")),
+    "children": (lambda c: [], ()),
+    "files": (lambda c: [], ()),
+    "created_at": lambda c: iso(c.created_at),
+    "updated_at": lambda c: iso(c.updated_at),
+}, default=[
+    "name", "tags", "is_folder", "parent_id", "sort_order", "creator_id",
+    "full_path", "children", "files", "created_at", "updated_at",
+])
+
+
+async def load_test_cases_tree(db: AsyncSession, parent_id: Optional[int], selected, file_selected):
+    """Whole subtree in one recursive query, files for it in one more"""
+    tree = subtree_cte(TestCase, parent_id)
+    cases = (await db.scalars(
+        select(TestCase).join(tree, TestCase.id == tree.c.id).options(
+            TEST_CASE_FIELDS.load_only(selected, "parent_id", "is_folder")
+        ).order_by(
+            TestCase.sort_order, TestCase.created_at
+        )
+    )).all()
+
+    files_by_case = defaultdict(list)
+    case_files = (await db.scalars(
+        select(TestCaseFile).where(
+            TestCaseFile.test_case_id.in_(select(tree.c.id))
+        ).options(
+            TEST_CASE_FILE_FIELDS.load_only(file_selected, "test_case_id")
+        ).order_by(TestCaseFile.id)
+    )).all()
+    for f in case_files:
+        files_by_case[f.test_case_id].append(TEST_CASE_FILE_FIELDS.serialize(f, file_selected))
+
+    def case_to_dict(case):
+        case_dict = TEST_CASE_FIELDS.serialize(case, selected)
+        case_dict["files"] = [] if case.is_folder else files_by_case.get(case.id, [])
+        return case_dict
+
+    return build_tree(cases, case_to_dict, parent_id)
+
+
 @router.get("/tree")
 async def get_test_cases_tree(
+    request: Request,
+    response: Response,
     parent_id: Optional[int] = Query(None, description="Parent node ID, null for root nodes"),
-    db: Session = Depends(get_db)
+    projection: ProjectionParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get test cases tree structure"""
-    query = db.query(TestCase)
-
-    if parent_id is None:
-        query = query.filter(TestCase.parent_id.is_(None))
-    else:
-        query = query.filter(TestCase.parent_id == parent_id)
-
-    cases = query.order_by(TestCase.sort_order, TestCase.created_at).all()
-
-    def build_tree_node(case):
-        children = db.query(TestCase).filter(
-            TestCase.parent_id == case.id
-        ).order_by(TestCase.sort_order, TestCase.created_at).all()
-        
-        # Load files for this test case
-        files = []
-        if not case.is_folder:
-            try:
-                from app.models.test_case_file import TestCaseFile
-                case_files = db.query(TestCaseFile).filter(TestCaseFile.test_case_id == case.id).all()
-                files = [{
-                    "id": f.id,
-                    "name": f.name,
-                    "file_type": f.file_type,
-                    "full_name": f.full_name,
-                    "content": f.content or ""
-                } for f in case_files]
-            except:
-                files = []
-
-        return {
-            "id": case.id,
-            "name": case.name,
-            "tags": case.tags or "",
-            "gherkin_content": case.gherkin_content or "",
-            "is_folder": case.is_folder or False,
-            "parent_id": case.parent_id,
-            "sort_order": case.sort_order or 0,
-            "creator_id": case.creator_id,
-            "full_path": case.name,  # Simplified for now
-            "children": [build_tree_node(child) for child in children],
-            "files": files,
-            "created_at": case.created_at.isoformat() if case.created_at else None,
-            "updated_at": case.updated_at.isoformat() if case.updated_at else None,
-        }
-
-    result = []
-    for case in cases:
-        result.append(build_tree_node(case))
-
-    return result
+    """Get test cases tree structure (file fields are projected with a files. prefix, e.g. include=files.content)"""
+    selected = [
+        name for name in TEST_CASE_FIELDS.resolve(projection.own(["files"]))
+        if name not in ("children", "files")
+    ]
+    file_selected = TEST_CASE_FILE_FIELDS.resolve(projection.nested("files"))
+
+    validator = await collection_validator(db, request, TestCase, TestCaseFile)
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    return await tree_cache.response(
+        ("test_cases", parent_id, tuple(selected), tuple(file_selected)),
+        (TestCase.__tablename__, TestCaseFile.__tablename__),
+        lambda: load_test_cases_tree(db, parent_id, selected, file_selected),
+        headers=validator.headers,
+    )
 
 
 @router.get("/")
 async def get_test_cases(
+    response: Response,
     is_folder: Optional[bool] = Query(None, description="Whether it's a folder"),
-    db: Session = Depends(get_db)
+    page: PageParams = Depends(),
+    projection: ProjectionParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get test cases list (flat structure)"""
-    query = db.query(TestCase)
+    """Get test cases list (flat structure), optionally keyset paginated and projected"""
+    selected = TEST_CASE_FIELDS.resolve(projection)
+    query = select(TestCase).options(TEST_CASE_FIELDS.load_only(selected))
 
     if is_folder is not None:
-        query = query.filter(TestCase.is_folder == is_folder)
-
-    cases = query.order_by(TestCase.created_at.desc()).all()
-
-    result = []
-    for case in cases:
-        case_dict = {
-            "id": case.id,
-            "name": case.name,
-            "tags": case.tags or "",
-            "gherkin_content": case.gherkin_content or "",
-            "is_folder": bool(case.is_folder) if hasattr(case, 'is_folder') else False,
-            "parent_id": case.parent_id if hasattr(case, 'parent_id') else None,
-            "sort_order": case.sort_order if hasattr(case, 'sort_order') else 0,
-            "creator_id": case.creator_id,
-            "full_path": case.name,
-            "children": [],
-            "files": [],
-            "created_at": case.created_at.isoformat() if case.created_at else None,
-            "updated_at": case.updated_at.isoformat() if case.updated_at else None,
-        }
-        result.append(case_dict)
-
-    return result
+        query = query.where(TestCase.is_folder == is_folder)
+
+    cases = await paginate(db, query, TestCase, page, response)
+
+    return [TEST_CASE_FIELDS.serialize(case, selected) for case in cases]
 
 
 @router.post("/")
-async def create_test_case(case: TestCaseCreate, db: Session = Depends(get_db)):
+async def create_test_case(case: TestCaseCreate, db: AsyncSession = Depends(get_async_db)):
     """Create new test case"""
     
     # Check for name conflicts at the same level
-    existing = db.query(TestCase).filter(
+    existing = await db.scalar(select(TestCase).where(
         TestCase.name == case.name,
         TestCase.parent_id == case.parent_id
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="Test case name already exists at this level")
 
@@ -162,8 +177,8 @@ async def create_test_case(case: TestCaseCreate, db: Session = Depends(get_db)):
         creator_id=case.creator_id
     )
     db.add(db_case)
-    db.commit()
-    db.refresh(db_case)
+    await db.commit()
+    await db.refresh(db_case)
 
     return {
         "id": db_case.id,
@@ -174,7 +189,7 @@ async def create_test_case(case: TestCaseCreate, db: Session = Depends(get_db)):
         "parent_id": db_case.parent_id,
         "sort_order": db_case.sort_order or 0,
         "creator_id": db_case.creator_id,
-        "full_path": db_case.name,
+        "full_path": db_case.full_path or db_case.name,
         "children": [],
         "files": [],
         "created_at": db_case.created_at.isoformat() if db_case.created_at else None,
@@ -183,12 +198,16 @@ async def create_test_case(case: TestCaseCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{case_id}")
-async def get_test_case(case_id: int, db: Session = Depends(get_db)):
+async def get_test_case(case_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get test case details"""
-    case = db.query(TestCase).filter(TestCase.id == case_id).first()
-    
-    if not case:
+    validator = await row_validator(db, request, TestCase, case_id)
+    if not validator:
         raise HTTPException(status_code=404, detail="Test case not found")
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    case = await db.get(TestCase, case_id)
     
     return {
         "id": case.id,
@@ -199,7 +218,7 @@ async def get_test_case(case_id: int, db: Session = Depends(get_db)):
         "parent_id": case.parent_id,
         "sort_order": case.sort_order or 0,
         "creator_id": case.creator_id,
-        "full_path": case.name,
+        "full_path": case.full_path or case.name,
         "children": [],
         "files": [],
         "created_at": case.created_at.isoformat() if case.created_at else None,
@@ -208,22 +227,30 @@ async def get_test_case(case_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{case_id}")
-async def update_test_case(case_id: int, case: TestCaseUpdate, db: Session = Depends(get_db)):
+async def update_test_case(case_id: int, case: TestCaseUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update test case"""
-    db_case = db.query(TestCase).filter(TestCase.id == case_id).first()
+    db_case = await db.get(TestCase, case_id)
     
     if not db_case:
         raise HTTPException(status_code=404, detail="Test case not found")
 
-    if case.name is not None:
-        # Check for name conflicts
-        existing = db.query(TestCase).filter(
-            TestCase.name == case.name,
+    moved = "parent_id" in case.model_fields_set and case.parent_id != db_case.parent_id
+    if moved:
+        error = await move_error(db, TestCase, db_case, case.parent_id)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        db_case.parent_id = case.parent_id
+
+    if case.name is not None or moved:
+        # Check for name conflicts (at the new level when moved)
+        existing = await db.scalar(select(TestCase).where(
+            TestCase.name == (case.name or db_case.name),
             TestCase.parent_id == db_case.parent_id,
             TestCase.id != case_id
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Test case name already exists at this level")
+    if case.name is not None:
         db_case.name = case.name
 
     if case.tags is not None:
@@ -234,8 +261,8 @@ async def update_test_case(case_id: int, case: TestCaseUpdate, db: Session = Dep
     if case.is_folder is not None:
         db_case.is_folder = case.is_folder
 
-    db.commit()
-    db.refresh(db_case)
+    await db.commit()
+    await db.refresh(db_case)
 
     return {
         "id": db_case.id,
@@ -246,7 +273,7 @@ async def update_test_case(case_id: int, case: TestCaseUpdate, db: Session = Dep
         "parent_id": db_case.parent_id,
         "sort_order": db_case.sort_order or 0,
         "creator_id": db_case.creator_id,
-        "full_path": db_case.name,
+        "full_path": db_case.full_path or db_case.name,
         "children": [],
         "files": [],
         "created_at": db_case.created_at.isoformat() if db_case.created_at else None,
@@ -255,19 +282,21 @@ async def update_test_case(case_id: int, case: TestCaseUpdate, db: Session = Dep
 
 
 @router.delete("/{case_id}")
-async def delete_test_case(case_id: int, db: Session = Depends(get_db)):
+async def delete_test_case(case_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete test case"""
-    case = db.query(TestCase).filter(TestCase.id == case_id).first()
+    case = await db.get(TestCase, case_id)
     
     if not case:
         raise HTTPException(status_code=404, detail="Test case not found")
     
     # Check if has children
-    children_count = db.query(TestCase).filter(TestCase.parent_id == case_id).count()
+    children_count = await db.scalar(
+        select(func.count()).select_from(TestCase).where(TestCase.parent_id == case_id)
+    )
     if children_count > 0:
         raise HTTPException(status_code=400, detail="Cannot delete test case with children")
     
-    db.delete(case)
-    db.commit()
+    await db.delete(case)
+    await db.commit()
     
     return {"message": "Test case deleted successfully"}
@@ -1,12 +1,19 @@
 """
 测试数据管理相关API端点 - 支持树形结构和Jinja2模板
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.test_data import TestDataNode, DataNodeType
+from app.services.batch_renderer import streaming_render_response
+from app.services.template_renderer import template_renderer
+from app.services.tree_cache import tree_cache
+from app.services.tree_service import subtree_cte, build_tree, move_error
+from app.utils.conditional import collection_validator, row_validator
 
 router = APIRouter()
 
@@ -29,6 +36,7 @@ class TestDataNodeUpdate(BaseModel):
     jinja2_template: str = None
     template_variables: Dict[str, Any] = None
     is_active: bool = None
+    parent_id: Optional[int] = None  # 移动到该节点下（null为根节点），提供时生效
 
 class TestDataNodeResponse(BaseModel):
     id: int
@@ -42,7 +50,7 @@ class TestDataNodeResponse(BaseModel):
     template_variables: Dict[str, Any] = {}
     is_active: bool = True
     version: str = "v1.0"
-    project_id: int
+    project_id: int = None
     creator_id: int = None
     full_path: str = None
     children: List['TestDataNodeResponse'] = []
@@ -55,51 +63,60 @@ class TestDataNodeResponse(BaseModel):
 # 解决前向引用问题
 TestDataNodeResponse.model_rebuild()
 
+
+def node_to_dict(node):
+    """节点转换为响应字典（只读取已加载的列，不触发关系加载）"""
+    return {
+        "id": node.id,
+        "name": node.name,
+        "description": node.description,
+        "node_type": node.node_type,
+        "parent_id": node.parent_id,
+        "sort_order": node.sort_order or 0,
+        "data_content": node.data_content or {},
+        "jinja2_template": node.jinja2_template,
+        "template_variables": node.template_variables or {},
+        "is_active": node.is_active,
+        "version": node.version,
+        "creator_id": node.creator_id,
+        "full_path": node.full_path,
+        "children": [],
+        "created_at": node.created_at.isoformat() if node.created_at else None,
+        "updated_at": node.updated_at.isoformat() if node.updated_at else None,
+    }
+
 @router.get("/tree", response_model=List[TestDataNodeResponse])
 async def get_test_data_tree(
+    request: Request,
+    response: Response,
     project_id: Optional[int] = Query(None, description="项目ID过滤"),
     parent_id: Optional[int] = Query(None, description="父节点ID，null获取根节点"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取测试数据树形结构"""
-    query = db.query(TestDataNode)
-
-    if project_id:
-        query = query.filter(TestDataNode.project_id == project_id)
-
-    if parent_id is None:
-        query = query.filter(TestDataNode.parent_id.is_(None))
-    else:
-        query = query.filter(TestDataNode.parent_id == parent_id)
-
-    nodes = query.filter(TestDataNode.is_active == True).order_by(TestDataNode.sort_order).all()
-
-    # 递归加载子节点
-    def load_children(node):
-        children = db.query(TestDataNode).filter(
-            TestDataNode.parent_id == node.id,
-            TestDataNode.is_active == True
-        ).order_by(TestDataNode.sort_order).all()
-
-        result = []
-        for child in children:
-            child_dict = TestDataNodeResponse.from_orm(child).dict()
-            child_dict['full_path'] = child.full_path
-            child_dict['children'] = load_children(child)
-            result.append(child_dict)
-        return result
-
-    result = []
-    for node in nodes:
-        node_dict = TestDataNodeResponse.from_orm(node).dict()
-        node_dict['full_path'] = node.full_path
-        node_dict['children'] = load_children(node)
-        result.append(node_dict)
-
-    return result
+    scope = [TestDataNode.project_id == project_id] if project_id else []
+    validator = await collection_validator(db, request, (TestDataNode, *scope))
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    criteria = [TestDataNode.is_active == True, *scope]
+
+    async def load_tree():
+        # 一次递归查询加载整棵子树，在内存中组装
+        tree = subtree_cte(TestDataNode, parent_id, *criteria)
+        nodes = (await db.scalars(
+            select(TestDataNode).join(tree, TestDataNode.id == tree.c.id).order_by(TestDataNode.sort_order)
+        )).all()
+        return build_tree(nodes, node_to_dict, parent_id)
+
+    return await tree_cache.response(
+        ("test_data_nodes", project_id, parent_id), (TestDataNode.__tablename__,), load_tree,
+        headers=validator.headers,
+    )
 
 @router.post("/nodes", response_model=TestDataNodeResponse)
-async def create_test_data_node(node: TestDataNodeCreate, db: Session = Depends(get_db)):
+async def create_test_data_node(node: TestDataNodeCreate, db: AsyncSession = Depends(get_async_db)):
     """创建测试数据节点"""
     # 验证节点类型
     if node.node_type not in ["folder", "template", "data"]:
@@ -107,18 +124,18 @@ async def create_test_data_node(node: TestDataNodeCreate, db: Session = Depends(
 
     # 验证父节点存在性
     if node.parent_id:
-        parent = db.query(TestDataNode).filter(TestDataNode.id == node.parent_id).first()
+        parent = await db.get(TestDataNode, node.parent_id)
         if not parent:
             raise HTTPException(status_code=404, detail="Parent node not found")
         if parent.node_type != "folder":
             raise HTTPException(status_code=400, detail="Parent must be a folder node")
 
     # 检查同级节点名称冲突
-    existing = db.query(TestDataNode).filter(
+    existing = await db.scalar(select(TestDataNode).where(
         TestDataNode.name == node.name,
         TestDataNode.parent_id == node.parent_id,
         TestDataNode.project_id == node.project_id
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="Node name already exists at this level")
 
@@ -135,42 +152,52 @@ async def create_test_data_node(node: TestDataNodeCreate, db: Session = Depends(
         creator_id=node.creator_id
     )
     db.add(db_node)
-    db.commit()
-    db.refresh(db_node)
+    await db.commit()
+    await db.refresh(db_node)
 
-    response = TestDataNodeResponse.from_orm(db_node)
-    response.full_path = db_node.full_path
-    return response
+    return node_to_dict(db_node)
 
 @router.get("/nodes/{node_id}", response_model=TestDataNodeResponse)
-async def get_test_data_node(node_id: int, db: Session = Depends(get_db)):
+async def get_test_data_node(node_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """获取测试数据节点详情"""
-    node = db.query(TestDataNode).filter(TestDataNode.id == node_id).first()
-    if not node:
+    validator = await row_validator(db, request, TestDataNode, node_id)
+    if not validator:
         raise HTTPException(status_code=404, detail="Node not found")
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    node = await db.get(TestDataNode, node_id)
 
-    response = TestDataNodeResponse.from_orm(node)
-    response.full_path = node.full_path
-    return response
+    return node_to_dict(node)
 
 @router.put("/nodes/{node_id}", response_model=TestDataNodeResponse)
-async def update_test_data_node(node_id: int, node: TestDataNodeUpdate, db: Session = Depends(get_db)):
+async def update_test_data_node(node_id: int, node: TestDataNodeUpdate, db: AsyncSession = Depends(get_async_db)):
     """更新测试数据节点"""
-    db_node = db.query(TestDataNode).filter(TestDataNode.id == node_id).first()
+    db_node = await db.get(TestDataNode, node_id)
     if not db_node:
         raise HTTPException(status_code=404, detail="Node not found")
 
+    # 移动：父节点必须存在，且不能是自身或子孙节点
+    moved = "parent_id" in node.model_fields_set and node.parent_id != db_node.parent_id
+    if moved:
+        error = await move_error(db, TestDataNode, db_node, node.parent_id)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        db_node.parent_id = node.parent_id
+
     # 更新字段
-    if node.name is not None:
-        # 检查名称冲突
-        existing = db.query(TestDataNode).filter(
-            TestDataNode.name == node.name,
+    if node.name is not None or moved:
+        # 检查名称冲突（移动时检查新的层级）
+        existing = await db.scalar(select(TestDataNode).where(
+            TestDataNode.name == (node.name or db_node.name),
             TestDataNode.parent_id == db_node.parent_id,
             TestDataNode.project_id == db_node.project_id,
             TestDataNode.id != node_id
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Node name already exists at this level")
+    if node.name is not None:
         db_node.name = node.name
 
     if node.description is not None:
@@ -193,37 +220,39 @@ async def update_test_data_node(node_id: int, node: TestDataNodeUpdate, db: Sess
     if node.is_active is not None:
         db_node.is_active = node.is_active
 
-    db.commit()
-    db.refresh(db_node)
+    await db.commit()
+    await db.refresh(db_node)
 
-    response = TestDataNodeResponse.from_orm(db_node)
-    response.full_path = db_node.full_path
-    return response
+    return node_to_dict(db_node)
 
 @router.delete("/nodes/{node_id}")
-async def delete_test_data_node(node_id: int, db: Session = Depends(get_db)):
+async def delete_test_data_node(node_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除测试数据节点"""
-    db_node = db.query(TestDataNode).filter(TestDataNode.id == node_id).first()
+    db_node = await db.get(TestDataNode, node_id)
     if not db_node:
         raise HTTPException(status_code=404, detail="Node not found")
 
     # 检查是否有子节点
-    children = db.query(TestDataNode).filter(TestDataNode.parent_id == node_id).count()
+    children = await db.scalar(
+        select(func.count()).select_from(TestDataNode).where(TestDataNode.parent_id == node_id)
+    )
     if children > 0:
         raise HTTPException(status_code=400, detail="Cannot delete node with children")
 
-    db.delete(db_node)
-    db.commit()
+    await db.delete(db_node)
+    await db.commit()
     return {"message": "Node deleted successfully"}
 
 @router.post("/nodes/{node_id}/render")
 async def render_jinja2_template(
     node_id: int,
+    request: Request,
     variables: Dict[str, Any] = {},
-    db: Session = Depends(get_db)
+    stream: bool = Query(False, description="只流式返回渲染结果（客户端接受时gzip压缩），不回显模板和变量"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """渲染Jinja2模板"""
-    node = db.query(TestDataNode).filter(TestDataNode.id == node_id).first()
+    node = await db.get(TestDataNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
 
@@ -231,12 +260,11 @@ async def render_jinja2_template(
         raise HTTPException(status_code=400, detail="Node is not a template or has no template content")
 
     try:
-        from jinja2 import Template
-        template = Template(node.jinja2_template)
-
         # 合并节点定义的变量和请求传入的变量
-        render_vars = {**node.template_variables, **variables}
-        rendered_content = template.render(**render_vars)
+        render_vars = {**(node.template_variables or {}), **variables}
+        if stream:
+            return streaming_render_response(request, node.jinja2_template, render_vars)
+        rendered_content = await asyncio.to_thread(template_renderer.render, node.jinja2_template, render_vars)
 
         return {
             "rendered_content": rendered_content,
@@ -4,13 +4,22 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from app.core.database import get_db
 from app.models.test_execution import TestExecution
 from app.models.test_case import TestCase
+from app.models.tag import case_ids_with_any_tag
+from app.services.tag_expression import (
+    TagExpressionError,
+    compile_tag_expression,
+    parse_tag_expression,
+    to_pytest_expression,
+)
 from app.services.execution_engine import ExecutionEngineService
+from app.services.job_queue import enqueue
 from app.services.test_executor import PlaywrightTestExecutor
+from app.services.test_sharding import MAX_SHARDS
 
 router = APIRouter()
 
@@ -19,6 +28,7 @@ class TestExecutionCreate(BaseModel):
     description: str = ""
     test_case_ids: List[int] = []  # Support multi-select test cases
     tags: List[str] = []  # Support tag-based execution
+    tag_expression: Optional[str] = None  # e.g. "smoke and not slow or (api and regression)"
     environment: str = "test"
     browser: str = "chromium"
     headless: bool = True
@@ -26,6 +36,7 @@ class TestExecutionCreate(BaseModel):
     status: str = "pending"
     notes: str = ""
     execution_type: str = "playwright"  # playwright, manual, api
+    shards: int = Field(1, ge=1, le=MAX_SHARDS)  # Parallel pytest-xdist workers, balanced by past durations
 
 class TestExecutionResponse(BaseModel):
     id: int
@@ -94,24 +105,28 @@ async def create_test_execution(
     """创建测试执行记录（支持多选测试用例和标签）"""
     # 根据test_case_ids或tags获取要执行的测试用例
     test_cases = []
+    tag_expression = None
 
     if execution.test_case_ids:
         # 通过ID获取测试用例
         test_cases = db.query(TestCase).filter(TestCase.id.in_(execution.test_case_ids)).all()
         if len(test_cases) != len(execution.test_case_ids):
             raise HTTPException(status_code=404, detail="Some test cases not found")
+    elif execution.tag_expression:
+        # 通过标签表达式获取测试用例（编译为标签索引上的集合运算）
+        try:
+            tag_expression = to_pytest_expression(parse_tag_expression(execution.tag_expression))
+            matching_ids = compile_tag_expression(execution.tag_expression)
+        except TagExpressionError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid tag expression: {e}")
+        test_cases = db.query(TestCase).filter(TestCase.id.in_(matching_ids)).all()
     elif execution.tags:
-        # 通过标签获取测试用例
-        from sqlalchemy import or_
-        tag_conditions = []
-        for tag in execution.tags:
-            tag_conditions.append(TestCase.tags.like(f"%{tag}%"))
+        # 通过标签获取测试用例（标签索引精确匹配）
         test_cases = db.query(TestCase).filter(
-            TestCase.is_active == True,
-            or_(*tag_conditions)
+            TestCase.id.in_(case_ids_with_any_tag(execution.tags))
         ).all()
     else:
-        raise HTTPException(status_code=400, detail="Either test_case_ids or tags must be provided")
+        raise HTTPException(status_code=400, detail="Either test_case_ids, tag_expression or tags must be provided")
 
     # 创建单个执行记录，包含所有选中的测试用例
     db_execution = TestExecution(
@@ -122,10 +137,12 @@ async def create_test_execution(
         execution_config={
             "test_case_ids": [tc.id for tc in test_cases],
             "tags": execution.tags,
+            "tag_expression": tag_expression,
             "environment": execution.environment,
             "browser": execution.browser,
             "headless": execution.headless,
             "execution_type": execution.execution_type,
+            "shards": execution.shards,
             "notes": execution.notes
         },
         total_cases=len(test_cases)
@@ -244,10 +261,10 @@ async def get_test_reports_summary(
 @router.post("/{execution_id}/start-playwright")
 async def start_playwright_execution(
     execution_id: int,
-    background_tasks: BackgroundTasks,
+    priority: int = 0,
     db: Session = Depends(get_db)
 ):
-    """启动Playwright测试执行"""
+    """启动Playwright测试执行（加入执行队列，由执行worker领取）"""
     execution = db.query(TestExecution).filter(TestExecution.id == execution_id).first()
     if not execution:
         raise HTTPException(status_code=404, detail="Test execution not found")
@@ -255,10 +272,9 @@ async def start_playwright_execution(
     if execution.status != "pending":
         raise HTTPException(status_code=400, detail="Execution is not in pending status")
 
-    # 在后台启动测试执行
-    background_tasks.add_task(run_playwright_execution, execution_id, db)
+    job = enqueue(db, execution_id, "playwright", priority)
 
-    return {"message": "Playwright execution started", "execution_id": execution_id}
+    return {"message": "Playwright execution queued", "execution_id": execution_id, "job_id": job.id}
 
 
 @router.get("/{execution_id}/progress")
@@ -295,31 +311,3 @@ async def get_execution_report(execution_id: int, db: Session = Depends(get_db))
         "completed_at": execution.completed_at.isoformat() if execution.completed_at else None,
         "test_results": test_results
     }
-
-
-async def run_playwright_execution(execution_id: int, db: Session):
-    """后台运行Playwright测试执行"""
-    try:
-        executor = PlaywrightTestExecutor(db)
-        execution = db.query(TestExecution).filter(TestExecution.id == execution_id).first()
-
-        # 获取执行配置
-        test_case_ids = execution.execution_config.get("test_case_ids", [])
-        tags = execution.execution_config.get("tags", [])
-
-        # 执行测试
-        result = await executor.execute_test_cases(
-            execution_id=execution_id,
-            test_case_ids=test_case_ids if test_case_ids else None,
-            tags=tags if tags else None
-        )
-
-        print(f"Execution {execution_id} completed: {result}")
-
-    except Exception as e:
-        print(f"Execution {execution_id} failed: {str(e)}")
-        # 更新执行状态为失败
-        execution = db.query(TestExecution).filter(TestExecution.id == execution_id).first()
-        if execution:
-            execution.status = "failed"
-            db.commit()
@@ -1,13 +1,30 @@
 """
 Test Execution Management API Endpoints - Simplified Version
 """
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy import JSON, Boolean, String, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.core.database import get_db
-from app.models.test_execution import TestExecution
+from app.core.database import get_async_db
+from app.models.execution_job import ExecutionJob
+from app.models.tag import case_ids_with_any_tag, normalize_tags
+from app.models.test_case import TestCase
+from app.models.test_execution import ExecutionStatus, TestExecution
+from app.services.browser_servers import browser_servers
+from app.services.job_queue import enqueue, job_pool, queue_stats
+from app.services.pytest_pool import pytest_pool
+from app.services.tag_expression import (
+    TagExpressionError,
+    compile_tag_expression,
+    parse_tag_expression,
+    tags_to_expression,
+    to_pytest_expression,
+)
+from app.services.test_sharding import MAX_SHARDS
+from app.utils.pagination import PageParams, paginate
+from app.utils.serialization import RowSerializer
 
 router = APIRouter()
 
@@ -15,11 +32,13 @@ class TestExecutionCreate(BaseModel):
     name: str
     description: str = ""
     test_case_ids: List[int] = []
+    tags: List[str] = []  # Run the cases carrying any of these tags
+    tag_expression: Optional[str] = None  # e.g. "smoke and not slow or (api and regression)"
     environment: str = "test"
     browser: str = "chromium"
     headless: bool = True
     executor: str = "system"
-    status: str = "pending"
+    status: ExecutionStatus = ExecutionStatus.PENDING  # Unknown values are rejected with 422
     notes: str = ""
 
 class TestExecutionResponse(BaseModel):
@@ -42,49 +61,102 @@ class TestExecutionResponse(BaseModel):
         from_attributes = True
 
 
+def _config(key: str, default, type_=String):
+    """execution_config 中的执行参数"""
+    return type_coerce(func.coalesce(func.json_extract(TestExecution.execution_config, f"$.{key}"), default), type_)
+
+
+TEST_EXECUTION_ROWS = RowSerializer(
+    {
+        "id": TestExecution.id,
+        "name": TestExecution.name,
+        "description": func.coalesce(TestExecution.description, ""),
+        "test_case_ids": _config("test_case_ids", "[]", JSON),
+        "status": TestExecution.status,
+        "progress": func.coalesce(TestExecution.progress, 0),
+        "environment": _config("environment", "test"),
+        "browser": _config("browser", "chromium"),
+        "headless": _config("headless", True, Boolean),
+        "executed_at": TestExecution.created_at,
+        "created_at": TestExecution.created_at,
+        "updated_at": TestExecution.updated_at,
+    },
+    constants={"pass_rate": 0, "executor": "system"},  # Simplified for now
+)
+
+
+def _tag_selection(tags: Optional[List[str]], tag_expression: Optional[str]) -> dict:
+    """
+    校验标签选择条件并规范化表达式（执行时再按标签索引解析用例，
+    同一表达式也作为 pytest -m 过滤场景）；标签按用例标签的规则规范化
+    """
+    tags = normalize_tags(tags)
+    try:
+        if tag_expression:
+            tag_expression = to_pytest_expression(parse_tag_expression(tag_expression))
+        elif tags:
+            to_pytest_expression(parse_tag_expression(tags_to_expression(tags)))
+    except TagExpressionError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tag expression: {e}")
+    return {"tags": tags or [], "tag_expression": tag_expression or None}
+
+
+async def _execution_dict(db: AsyncSession, execution_id: int) -> dict:
+    """单条执行记录，字段与列表接口相同"""
+    row = (await db.execute(TEST_EXECUTION_ROWS.select().where(TestExecution.id == execution_id))).one()
+    return TEST_EXECUTION_ROWS.to_dicts([row])[0]
+
+
+def _execution_config(execution: TestExecutionCreate, config: Optional[dict] = None) -> dict:
+    """创建/更新请求中的执行参数（保留已有配置中的其它参数，如 shards）"""
+    return {
+        **(config or {}),
+        "test_case_ids": execution.test_case_ids,
+        **_tag_selection(execution.tags, execution.tag_expression),
+        "environment": execution.environment,
+        "browser": execution.browser,
+        "headless": execution.headless,
+        "notes": execution.notes,
+    }
+
+
 @router.get("/")
 async def get_test_executions(
-    status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    response: Response,
+    status: Optional[ExecutionStatus] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get test execution records list"""
-    query = db.query(TestExecution)
+    """Get test execution records list, optionally keyset paginated"""
+    query = TEST_EXECUTION_ROWS.select()
 
     if status:
-        query = query.filter(TestExecution.status == status)
-
-    executions = query.order_by(TestExecution.created_at.desc()).all()
-
-    result = []
-    for execution in executions:
-        execution_dict = {
-            "id": execution.id,
-            "name": execution.name,
-            "description": execution.description or "",
-            "test_case_ids": [],  # Simplified for now
-            "status": execution.status.value if hasattr(execution.status, 'value') else str(execution.status),
-            "progress": execution.progress or 0,
-            "pass_rate": 0,  # Calculate this based on results
-            "environment": execution.environment or "test",
-            "browser": execution.browser or "chromium",
-            "headless": execution.headless if hasattr(execution, 'headless') else True,
-            "executor": "system",  # Simplified
-            "executed_at": execution.created_at.isoformat() if execution.created_at else None,
-            "created_at": execution.created_at.isoformat() if execution.created_at else None,
-            "updated_at": execution.updated_at.isoformat() if execution.updated_at else None,
-        }
-        result.append(execution_dict)
-
-    return result
+        query = query.where(TestExecution.status == status)
+
+    rows = await paginate(db, query, TestExecution, page, response, rows=True)
+    return TEST_EXECUTION_ROWS.response(rows, headers=dict(response.headers))
 
 
 @router.post("/")
 async def create_test_execution(
     execution: TestExecutionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create test execution task"""
-    
+    """Create test execution task (cases by id, or by tags / tag expression)"""
+    config = _execution_config(execution)
+
+    if execution.test_case_ids:
+        case_ids = select(TestCase.id).where(TestCase.id.in_(execution.test_case_ids))
+    elif config["tag_expression"]:
+        case_ids = compile_tag_expression(config["tag_expression"])
+    elif config["tags"]:
+        case_ids = case_ids_with_any_tag(config["tags"])
+    else:
+        case_ids = None
+    total_cases = await db.scalar(
+        select(func.count()).select_from(TestCase).where(TestCase.id.in_(case_ids))
+    ) if case_ids is not None else 0
+
     # Create simple execution record
     db_execution = TestExecution(
         name=execution.name,
@@ -92,69 +164,103 @@ async def create_test_execution(
         test_case_id=execution.test_case_ids[0] if execution.test_case_ids else None,
         status=execution.status,
         progress=0,
-        environment=execution.environment,
-        browser=execution.browser,
-        headless=execution.headless,
+        total_cases=total_cases,
         executor_id=1,  # Default executor
-        notes=execution.notes,
+        execution_config=config,
     )
-    
+
     db.add(db_execution)
-    db.commit()
-    db.refresh(db_execution)
-    
+    await db.commit()
+
+    return await _execution_dict(db, db_execution.id)
+
+
+def _job_dict(job: ExecutionJob) -> dict:
     return {
-        "id": db_execution.id,
-        "name": db_execution.name,
-        "description": db_execution.description or "",
-        "test_case_ids": execution.test_case_ids,
-        "status": db_execution.status.value if hasattr(db_execution.status, 'value') else str(db_execution.status),
-        "progress": db_execution.progress or 0,
-        "pass_rate": 0,
-        "environment": db_execution.environment or "test",
-        "browser": db_execution.browser or "chromium",
-        "headless": db_execution.headless if hasattr(db_execution, 'headless') else True,
-        "executor": execution.executor,
-        "executed_at": db_execution.created_at.isoformat() if db_execution.created_at else None,
-        "created_at": db_execution.created_at.isoformat() if db_execution.created_at else None,
-        "updated_at": db_execution.updated_at.isoformat() if db_execution.updated_at else None,
+        "id": job.id,
+        "execution_id": job.execution_id,
+        "kind": job.kind,
+        "priority": job.priority,
+        "status": job.status.value,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        "available_at": job.available_at.isoformat() if job.available_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+    }
+
+
+@router.get("/queue")
+async def get_execution_queue(db: AsyncSession = Depends(get_async_db)):
+    """Execution queue: jobs per status, this process's workers, warm pytest workers and browser servers"""
+    return {
+        "jobs": await db.run_sync(queue_stats),
+        **job_pool.stats(),
+        "pytest_pool": pytest_pool.stats(),
+        "browser_servers": browser_servers.stats(),
     }
 
 
+@router.post("/{execution_id}/start", status_code=202)
+async def start_test_execution(
+    execution_id: int,
+    priority: int = Query(0, description="Higher priority jobs are claimed first"),
+    kind: str = Query("playwright", pattern="^(playwright|engine)$", description="Execution handler"),
+    shards: Optional[int] = Query(None, ge=1, le=MAX_SHARDS, description="Parallel pytest-xdist workers (playwright)"),
+    tags: Optional[List[str]] = Query(None, description="Run the cases carrying any of these tags"),
+    tag_expression: Optional[str] = Query(None, description='Tag expression, e.g. "smoke and not slow"'),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue a run of the execution (returns the already active job if it is queued or running)"""
+    execution = await db.get(TestExecution, execution_id)
+
+    if not execution:
+        raise HTTPException(status_code=404, detail="Test execution not found")
+
+    overrides = {}
+    if shards is not None:
+        overrides["shards"] = shards
+    if tags or tag_expression:
+        # 按标签选择本次运行的用例（替换创建时的选择条件）
+        overrides.update(_tag_selection(tags, tag_expression), test_case_ids=[])
+    if overrides:
+        execution.execution_config = {**(execution.execution_config or {}), **overrides}
+        await db.commit()
+
+    job = await db.run_sync(lambda session: enqueue(session, execution_id, kind, priority))
+    return _job_dict(job)
+
+
+@router.get("/{execution_id}/jobs")
+async def get_execution_jobs(execution_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Queue history of the execution, newest first"""
+    jobs = await db.scalars(
+        select(ExecutionJob).where(ExecutionJob.execution_id == execution_id).order_by(ExecutionJob.id.desc())
+    )
+    return [_job_dict(job) for job in jobs]
+
+
 @router.get("/{execution_id}")
-async def get_test_execution(execution_id: int, db: Session = Depends(get_db)):
+async def get_test_execution(execution_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get test execution details"""
-    execution = db.query(TestExecution).filter(TestExecution.id == execution_id).first()
+    execution = await db.get(TestExecution, execution_id)
     
     if not execution:
         raise HTTPException(status_code=404, detail="Test execution not found")
     
-    return {
-        "id": execution.id,
-        "name": execution.name,
-        "description": execution.description or "",
-        "test_case_ids": [],
-        "status": execution.status.value if hasattr(execution.status, 'value') else str(execution.status),
-        "progress": execution.progress or 0,
-        "pass_rate": 0,
-        "environment": execution.environment or "test",
-        "browser": execution.browser or "chromium",
-        "headless": execution.headless if hasattr(execution, 'headless') else True,
-        "executor": "system",
-        "executed_at": execution.created_at.isoformat() if execution.created_at else None,
-        "created_at": execution.created_at.isoformat() if execution.created_at else None,
-        "updated_at": execution.updated_at.isoformat() if execution.updated_at else None,
-    }
+    return await _execution_dict(db, execution_id)
 
 
 @router.put("/{execution_id}")
 async def update_test_execution(
     execution_id: int,
     execution: TestExecutionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update test execution"""
-    db_execution = db.query(TestExecution).filter(TestExecution.id == execution_id).first()
+    db_execution = await db.get(TestExecution, execution_id)
     
     if not db_execution:
         raise HTTPException(status_code=404, detail="Test execution not found")
@@ -163,41 +269,22 @@ async def update_test_execution(
     db_execution.name = execution.name
     db_execution.description = execution.description
     db_execution.status = execution.status
-    db_execution.environment = execution.environment
-    db_execution.browser = execution.browser
-    db_execution.headless = execution.headless
-    db_execution.notes = execution.notes
+    db_execution.execution_config = _execution_config(execution, db_execution.execution_config)
     
-    db.commit()
-    db.refresh(db_execution)
+    await db.commit()
     
-    return {
-        "id": db_execution.id,
-        "name": db_execution.name,
-        "description": db_execution.description or "",
-        "test_case_ids": execution.test_case_ids,
-        "status": db_execution.status.value if hasattr(db_execution.status, 'value') else str(db_execution.status),
-        "progress": db_execution.progress or 0,
-        "pass_rate": 0,
-        "environment": db_execution.environment or "test",
-        "browser": db_execution.browser or "chromium",
-        "headless": db_execution.headless if hasattr(db_execution, 'headless') else True,
-        "executor": execution.executor,
-        "executed_at": db_execution.created_at.isoformat() if db_execution.created_at else None,
-        "created_at": db_execution.created_at.isoformat() if db_execution.created_at else None,
-        "updated_at": db_execution.updated_at.isoformat() if db_execution.updated_at else None,
-    }
+    return await _execution_dict(db, execution_id)
 
 
 @router.delete("/{execution_id}")
-async def delete_test_execution(execution_id: int, db: Session = Depends(get_db)):
+async def delete_test_execution(execution_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete test execution"""
-    execution = db.query(TestExecution).filter(TestExecution.id == execution_id).first()
+    execution = await db.get(TestExecution, execution_id)
     
     if not execution:
         raise HTTPException(status_code=404, detail="Test execution not found")
     
-    db.delete(execution)
-    db.commit()
+    await db.delete(execution)
+    await db.commit()
     
     return {"message": "Test execution deleted successfully"}
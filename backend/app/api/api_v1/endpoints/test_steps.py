@@ -1,13 +1,16 @@
 """
 测试步骤管理相关API端点
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.test_step import TestStep, StepType
 from app.services.test_case_generator import TestCaseGenerator
+from app.utils.pagination import PageParams, paginate
+from app.utils.serialization import RowSerializer
 
 router = APIRouter()
 
@@ -48,51 +51,57 @@ class TestStepResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def _fix_step_row(step):
+    """SQL中无法表达的字段：空类型和旧版字符串参数列表"""
+    if step["type"] is None:
+        step["type"] = "unknown"
+    parameters = step["parameters"] or []
+    if parameters and isinstance(parameters[0], str):
+        # Convert string array to dict array for compatibility
+        parameters = [{"name": param, "type": "string"} for param in parameters]
+    step["parameters"] = parameters
+
+
+TEST_STEP_ROWS = RowSerializer(
+    {
+        "id": TestStep.id,
+        "name": TestStep.name,
+        "description": func.coalesce(TestStep.description, ""),
+        "type": TestStep.type,
+        "parameters": TestStep.parameters,
+        "decorator": func.coalesce(TestStep.decorator, ""),
+        "usage_example": func.coalesce(TestStep.usage_example, ""),
+        "function_name": func.coalesce(TestStep.function_name, ""),
+        "creator_id": func.coalesce(TestStep.creator_id, 1),
+        "created_at": TestStep.created_at,
+        "updated_at": TestStep.updated_at,
+    },
+    fixup=_fix_step_row,
+)
+
+
 @router.get("/")
 async def get_test_steps(
+    response: Response,
     step_type: Optional[str] = Query(None, description="Step type filter"),
-    db: Session = Depends(get_db)
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get test steps list"""
-    query = db.query(TestStep)
+    """Get test steps list, optionally keyset paginated"""
+    query = TEST_STEP_ROWS.select()
 
     if step_type:
         try:
             step_type_enum = StepType(step_type)
-            query = query.filter(TestStep.type == step_type_enum)
+            query = query.where(TestStep.type == step_type_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid step type")
 
-    steps = query.order_by(TestStep.created_at.desc()).all()
-    # Convert enum to string for response
-    result = []
-    for step in steps:
-        # Handle parameters - convert string array to dict array if needed
-        parameters = step.parameters or []
-        if parameters and isinstance(parameters[0], str):
-            # Convert string array to dict array for compatibility
-            parameters = [{"name": param, "type": "string"} for param in parameters]
-
-        step_dict = {
-            "id": step.id,
-            "name": step.name,
-            "description": step.description or "",
-            "type": step.type.value if step.type else "unknown",
-            "parameters": parameters,
-
-            "decorator": step.decorator or "",
-            "usage_example": step.usage_example or "",
-            "function_name": step.function_name or "",
-
-            "creator_id": step.creator_id or 1,
-            "created_at": step.created_at.isoformat() if step.created_at else None,
-            "updated_at": step.updated_at.isoformat() if step.updated_at else None,
-        }
-        result.append(step_dict)
-    return result
+    rows = await paginate(db, query, TestStep, page, response, rows=True)
+    return TEST_STEP_ROWS.response(rows, headers=dict(response.headers))
 
 @router.post("/", response_model=TestStepResponse)
-async def create_test_step(step: TestStepCreate, db: Session = Depends(get_db)):
+async def create_test_step(step: TestStepCreate, db: AsyncSession = Depends(get_async_db)):
     """创建测试步骤"""
     # 验证步骤类型
     try:
@@ -101,9 +110,9 @@ async def create_test_step(step: TestStepCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Invalid step type")
 
     # Check for duplicate step names
-    existing_step = db.query(TestStep).filter(
+    existing_step = await db.scalar(select(TestStep).where(
         TestStep.name == step.name
-    ).first()
+    ))
     if existing_step:
         raise HTTPException(status_code=400, detail="Step name already exists")
 
@@ -120,8 +129,8 @@ async def create_test_step(step: TestStepCreate, db: Session = Depends(get_db)):
         creator_id=step.creator_id
     )
     db.add(db_step)
-    db.commit()
-    db.refresh(db_step)
+    await db.commit()
+    await db.refresh(db_step)
 
     # Return formatted response
     return {
@@ -141,27 +150,27 @@ async def create_test_step(step: TestStepCreate, db: Session = Depends(get_db)):
     }
 
 @router.get("/{step_id}", response_model=TestStepResponse)
-async def get_test_step(step_id: int, db: Session = Depends(get_db)):
+async def get_test_step(step_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取测试步骤详情"""
-    step = db.query(TestStep).filter(TestStep.id == step_id).first()
+    step = await db.get(TestStep, step_id)
     if not step:
         raise HTTPException(status_code=404, detail="Test step not found")
     return step
 
 @router.put("/{step_id}", response_model=TestStepResponse)
-async def update_test_step(step_id: int, step: TestStepUpdate, db: Session = Depends(get_db)):
+async def update_test_step(step_id: int, step: TestStepUpdate, db: AsyncSession = Depends(get_async_db)):
     """更新测试步骤"""
-    db_step = db.query(TestStep).filter(TestStep.id == step_id).first()
+    db_step = await db.get(TestStep, step_id)
     if not db_step:
         raise HTTPException(status_code=404, detail="Test step not found")
 
     # 更新字段
     if step.name is not None:
         # 检查名称冲突
-        existing = db.query(TestStep).filter(
+        existing = await db.scalar(select(TestStep).where(
             TestStep.name == step.name,
             TestStep.id != step_id
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Step name already exists in this project")
         db_step.name = step.name
@@ -187,8 +196,8 @@ async def update_test_step(step_id: int, step: TestStepUpdate, db: Session = Dep
     if step.function_name is not None:
         db_step.function_name = step.function_name
 
-    db.commit()
-    db.refresh(db_step)
+    await db.commit()
+    await db.refresh(db_step)
 
     return {
         "id": db_step.id,
@@ -205,14 +214,14 @@ async def update_test_step(step_id: int, step: TestStepUpdate, db: Session = Dep
     }
 
 @router.delete("/{step_id}")
-async def delete_test_step(step_id: int, db: Session = Depends(get_db)):
+async def delete_test_step(step_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除测试步骤"""
-    db_step = db.query(TestStep).filter(TestStep.id == step_id).first()
+    db_step = await db.get(TestStep, step_id)
     if not db_step:
         raise HTTPException(status_code=404, detail="Test step not found")
 
-    db.delete(db_step)
-    db.commit()
+    await db.delete(db_step)
+    await db.commit()
     return {"message": "Test step deleted successfully"}
 
 
@@ -227,19 +236,18 @@ class TestCaseGenerateRequest(BaseModel):
 @router.post("/generate-test-case")
 async def generate_test_case_from_steps(
     request: TestCaseGenerateRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """从选定的Test Steps生成Playwright+pytest-bdd测试用例"""
     try:
-        generator = TestCaseGenerator(db)
-
-        result = generator.generate_test_case_from_steps(
+        # 生成器是同步服务，通过run_sync在异步会话中执行
+        result = await db.run_sync(lambda session: TestCaseGenerator(session).generate_test_case_from_steps(
             step_ids=request.step_ids,
             test_case_name=request.test_case_name,
             test_case_description=request.test_case_description,
             tags=request.tags,
             project_id=request.project_id
-        )
+        ))
 
         return {
             "success": True,
@@ -254,10 +262,9 @@ async def generate_test_case_from_steps(
 
 
 @router.get("/available-for-generation")
-async def get_available_steps_for_generation(db: Session = Depends(get_db)):
+async def get_available_steps_for_generation(db: AsyncSession = Depends(get_async_db)):
     """获取可用于生成测试用例的步骤"""
-    generator = TestCaseGenerator(db)
-    steps = generator.get_available_steps()
+    steps = await db.run_sync(lambda session: TestCaseGenerator(session).get_available_steps())
 
     return {
         "steps": steps,
@@ -1,14 +1,31 @@
 """
 Trade Template Management API Endpoints - SQLite Version
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
+import asyncio
 import jinja2
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.trade_template import TradeTemplate, TemplateNodeType
+from app.models.template_validation import TemplateValidationJob, TemplateValidationResult
+from app.services.batch_renderer import (
+    NDJSON_MEDIA_TYPE, BodyStreamingResponse, is_ndjson, ndjson_stream, render_batch, streaming_render_response, variable_sets, zip_stream,
+)
+from app.services.template_analysis import analyze, referenced_templates, required_variables, variables_report
+from app.services.template_loader import dependency_graph, dependents, find_cycle
+from app.services.template_renderer import template_renderer
+from app.services.job_queue import enqueue_validation
+from app.services.template_validator import is_xml_like, schema_for, validate_template
+from app.services.tree_cache import tree_cache
+from app.services.tree_service import subtree_cte, build_tree, deactivate_subtree, move_error
+from app.utils.conditional import collection_validator, row_validator
+from app.utils.pagination import PageParams, paginate
+from app.utils.projection import FieldSet, ProjectionParams, iso
 
 router = APIRouter()
 
@@ -19,6 +36,7 @@ class TradeTemplateCreate(BaseModel):
     parent_id: Optional[int] = None
     jinja2_content: Optional[str] = ""
     template_variables: Optional[Dict[str, Any]] = {}
+    xml_schema: Optional[str] = None
     creator_id: int = 1
 
 class TradeTemplateUpdate(BaseModel):
@@ -26,8 +44,10 @@ class TradeTemplateUpdate(BaseModel):
     description: Optional[str] = None
     jinja2_content: Optional[str] = None
     template_variables: Optional[Dict[str, Any]] = None
+    xml_schema: Optional[str] = None
     is_active: Optional[bool] = None
     sort_order: Optional[int] = None
+    parent_id: Optional[int] = None  # Move under this node (null: to the root) when given
 
 class TradeTemplateResponse(BaseModel):
     id: int
@@ -38,6 +58,7 @@ class TradeTemplateResponse(BaseModel):
     sort_order: int = 0
     jinja2_content: str = None
     template_variables: Dict[str, Any] = {}
+    xml_schema: Optional[str] = None
 
     creator_id: int
     is_active: bool = True
@@ -54,92 +75,163 @@ class TradeTemplateResponse(BaseModel):
 TradeTemplateResponse.model_rebuild()
 
 
+# 列表和树默认不返回模板正文，需要时用 include=jinja2_content
+TRADE_TEMPLATE_FIELDS = FieldSet(TradeTemplate, {
+    "id": None,
+    "name": None,
+    "description": None,
+    "node_type": lambda t: t.node_type.value,
+    "parent_id": None,
+    "sort_order": None,
+    "jinja2_content": lambda t: t.jinja2_content or "",
+    "template_variables": lambda t: t.template_variables or {},
+    "xml_schema": None,
+    "creator_id": None,
+    "is_active": None,
+    "version": None,
+    "full_path": None,
+    "created_at": lambda t: iso(t.created_at),
+    "updated_at": lambda t: iso(t.updated_at),
+}, default=[
+    "name", "description", "node_type", "parent_id", "sort_order", "template_variables",
+    "creator_id", "is_active", "version", "full_path", "created_at", "updated_at",
+])
+
+
 @router.get("/")
-async def get_trade_templates(db: Session = Depends(get_db)):
-    """Get all trade templates"""
-    templates = db.query(TradeTemplate).filter(TradeTemplate.is_active == True).all()
-
-    result = []
-    for template in templates:
-        result.append({
-            "id": template.id,
-            "name": template.name,
-            "description": template.description,
-            "node_type": template.node_type.value,
-            "parent_id": template.parent_id,
-            "jinja2_content": template.jinja2_content or "",
-            "template_variables": template.template_variables or {},
-            "creator_id": template.creator_id,
-            "is_active": template.is_active,
-            "sort_order": template.sort_order,
-            "created_at": template.created_at.isoformat() if template.created_at else None,
-            "updated_at": template.updated_at.isoformat() if template.updated_at else None,
-        })
-
-    return result
+async def get_trade_templates(
+    response: Response,
+    page: PageParams = Depends(),
+    projection: ProjectionParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all trade templates, optionally keyset paginated and projected"""
+    selected = TRADE_TEMPLATE_FIELDS.resolve(projection)
+    query = select(TradeTemplate).where(TradeTemplate.is_active == True).options(
+        TRADE_TEMPLATE_FIELDS.load_only(selected)
+    )
+    templates = await paginate(db, query, TradeTemplate, page, response)
+
+    return [TRADE_TEMPLATE_FIELDS.serialize(template, selected) for template in templates]
 
 
 @router.get("/tree")
 async def get_trade_templates_tree(
+    request: Request,
+    response: Response,
     parent_id: Optional[int] = Query(None, description="Parent node ID, null for root nodes"),
-    db: Session = Depends(get_db)
+    projection: ProjectionParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get trade templates tree structure"""
-    query = db.query(TradeTemplate).filter(TradeTemplate.is_active == True)
-
-    if parent_id is None:
-        query = query.filter(TradeTemplate.parent_id.is_(None))
-    else:
-        query = query.filter(TradeTemplate.parent_id == parent_id)
+    """Get trade templates tree structure, projected like the list"""
+    selected = TRADE_TEMPLATE_FIELDS.resolve(projection)
+
+    validator = await collection_validator(db, request, TradeTemplate)
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    async def load_tree():
+        # Active subtree in one recursive query, assembled in memory
+        tree = subtree_cte(TradeTemplate, parent_id, TradeTemplate.is_active == True)
+        templates = (await db.scalars(
+            select(TradeTemplate).join(tree, TradeTemplate.id == tree.c.id).options(
+                TRADE_TEMPLATE_FIELDS.load_only(selected, "parent_id")
+            ).order_by(TradeTemplate.sort_order)
+        )).all()
+        return build_tree(templates, lambda template: TRADE_TEMPLATE_FIELDS.serialize(template, selected), parent_id)
+
+    return await tree_cache.response(
+        ("trade_templates", parent_id, tuple(selected)), (TradeTemplate.__tablename__,), load_tree,
+        headers=validator.headers,
+    )
 
-    templates = query.order_by(TradeTemplate.sort_order).all()
 
-    def build_tree_node(template):
-        children = db.query(TradeTemplate).filter(
-            TradeTemplate.parent_id == template.id,
-            TradeTemplate.is_active == True
-        ).order_by(TradeTemplate.sort_order).all()
+@router.get("/variables/report")
+async def get_template_variables_report(
+    request: Request,
+    response: Response,
+    parent_id: Optional[int] = Query(None, description="Only templates under this node, null for all"),
+    only_missing: bool = Query(False, description="Only templates with missing variables or syntax errors"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Required vs provided variables of every template, by static analysis (nothing is rendered)"""
+    root = None
+    if parent_id is not None:
+        root = await db.get(TradeTemplate, parent_id)
+        if not root:
+            raise HTTPException(status_code=404, detail="Template not found")
+
+    validator = await collection_validator(db, request, TradeTemplate)
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    async def build_report():
+        # 全部模板都参与分析：子树中的模板可能引用子树外的模板
+        rows = (await db.execute(
+            select(
+                TradeTemplate.id, TradeTemplate.full_path, TradeTemplate.path,
+                TradeTemplate.jinja2_content, TradeTemplate.template_variables,
+            ).where(
+                TradeTemplate.node_type == TemplateNodeType.TEMPLATE,
+                TradeTemplate.is_active == True,
+                TradeTemplate.jinja2_content.isnot(None),
+            ).order_by(TradeTemplate.path)
+        )).all()
+
+        analyses, errors = {}, {}
+        for row in rows:
+            try:
+                analyses[row.full_path] = analyze(row.jinja2_content)
+            except jinja2.TemplateSyntaxError as e:
+                errors[row.id] = f"Jinja2 syntax error: {str(e)}"
+
+        templates = []
+        for row in rows:
+            if root is not None and not (row.path or "").startswith(root.path):
+                continue
+            if row.id in errors:
+                templates.append({"id": row.id, "full_path": row.full_path, "error": errors[row.id]})
+                continue
+            report = variables_report(
+                required_variables(row.full_path, analyses), (row.template_variables or {}).keys()
+            )
+            if only_missing and not report["missing"]:
+                continue
+            templates.append({"id": row.id, "full_path": row.full_path, **report, "error": None})
 
         return {
-            "id": template.id,
-            "name": template.name,
-            "description": template.description,
-            "node_type": template.node_type.value,
-            "parent_id": template.parent_id,
-            "sort_order": template.sort_order,
-            "jinja2_content": template.jinja2_content,
-            "template_variables": template.template_variables or {},
-
-            "creator_id": template.creator_id,
-            "is_active": template.is_active,
-            "version": template.version,
-            "full_path": template.full_path,
-            "children": [build_tree_node(child) for child in children],
-            "created_at": template.created_at.isoformat() if template.created_at else None,
-            "updated_at": template.updated_at.isoformat() if template.updated_at else None,
+            "total": len(templates),
+            "with_missing": sum(bool(t.get("missing")) for t in templates),
+            "with_errors": sum(t["error"] is not None for t in templates),
+            "templates": templates,
         }
 
-    return [build_tree_node(template) for template in templates]
+    return await tree_cache.response(
+        ("trade_template_variables", parent_id, only_missing), (TradeTemplate.__tablename__,), build_report,
+        headers=validator.headers,
+    )
 
 
 @router.post("/")
-async def create_trade_template(template: TradeTemplateCreate, db: Session = Depends(get_db)):
+async def create_trade_template(template: TradeTemplateCreate, db: AsyncSession = Depends(get_async_db)):
     """Create new trade template"""
 
     # Validate parent if specified
     if template.parent_id:
-        parent = db.query(TradeTemplate).filter(TradeTemplate.id == template.parent_id).first()
+        parent = await db.get(TradeTemplate, template.parent_id)
         if not parent:
             raise HTTPException(status_code=404, detail="Parent node not found")
         if parent.node_type != TemplateNodeType.FOLDER:
             raise HTTPException(status_code=400, detail="Parent must be a folder node")
 
     # Check name conflict at same level
-    existing = db.query(TradeTemplate).filter(
+    existing = await db.scalar(select(TradeTemplate).where(
         TradeTemplate.name == template.name,
         TradeTemplate.parent_id == template.parent_id,
         TradeTemplate.is_active == True
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="Template name already exists at this level")
 
@@ -162,12 +254,13 @@ async def create_trade_template(template: TradeTemplateCreate, db: Session = Dep
         parent_id=template.parent_id,
         jinja2_content=template.jinja2_content,
         template_variables=template.template_variables,
+        xml_schema=template.xml_schema,
         creator_id=template.creator_id,
     )
 
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
 
     return {
         "id": db_template.id,
@@ -178,6 +271,7 @@ async def create_trade_template(template: TradeTemplateCreate, db: Session = Dep
         "sort_order": db_template.sort_order,
         "jinja2_content": db_template.jinja2_content,
         "template_variables": db_template.template_variables or {},
+        "xml_schema": db_template.xml_schema,
 
         "creator_id": db_template.creator_id,
         "is_active": db_template.is_active,
@@ -190,12 +284,16 @@ async def create_trade_template(template: TradeTemplateCreate, db: Session = Dep
 
 
 @router.get("/{template_id}")
-async def get_trade_template(template_id: int, db: Session = Depends(get_db)):
+async def get_trade_template(template_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get trade template details"""
-    template = db.query(TradeTemplate).filter(TradeTemplate.id == template_id).first()
-
-    if not template:
+    validator = await row_validator(db, request, TradeTemplate, template_id)
+    if not validator:
         raise HTTPException(status_code=404, detail="Template not found")
+    not_modified = validator.respond(response)
+    if not_modified:
+        return not_modified
+
+    template = await db.get(TradeTemplate, template_id)
 
     return {
         "id": template.id,
@@ -206,6 +304,7 @@ async def get_trade_template(template_id: int, db: Session = Depends(get_db)):
         "sort_order": template.sort_order,
         "jinja2_content": template.jinja2_content,
         "template_variables": template.template_variables or {},
+        "xml_schema": template.xml_schema,
         "creator_id": template.creator_id,
         "is_active": template.is_active,
         "version": template.version,
@@ -217,21 +316,28 @@ async def get_trade_template(template_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{template_id}")
-async def update_trade_template(template_id: int, template: TradeTemplateUpdate, db: Session = Depends(get_db)):
+async def update_trade_template(template_id: int, template: TradeTemplateUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update trade template"""
-    db_template = db.query(TradeTemplate).filter(TradeTemplate.id == template_id).first()
+    db_template = await db.get(TradeTemplate, template_id)
 
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    # Check name conflict if name is being updated
-    if template.name and template.name != db_template.name:
-        existing = db.query(TradeTemplate).filter(
-            TradeTemplate.name == template.name,
+    moved = "parent_id" in template.model_fields_set and template.parent_id != db_template.parent_id
+    if moved:
+        error = await move_error(db, TradeTemplate, db_template, template.parent_id)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        db_template.parent_id = template.parent_id
+
+    # Check name conflict if name is being updated (or at the new level when moved)
+    if (template.name and template.name != db_template.name) or moved:
+        existing = await db.scalar(select(TradeTemplate).where(
+            TradeTemplate.name == (template.name or db_template.name),
             TradeTemplate.parent_id == db_template.parent_id,
             TradeTemplate.id != template_id,
             TradeTemplate.is_active == True
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Template name already exists at this level")
 
@@ -250,6 +356,9 @@ async def update_trade_template(template_id: int, template: TradeTemplateUpdate,
     if template.template_variables is not None:
         print(f"Updating template_variables: {template.template_variables}")
         db_template.template_variables = template.template_variables
+    if template.xml_schema is not None:
+        # 空字符串清除 XSD
+        db_template.xml_schema = template.xml_schema or None
     if template.is_active is not None:
         print(f"Updating is_active: {template.is_active}")
         db_template.is_active = template.is_active
@@ -258,8 +367,8 @@ async def update_trade_template(template_id: int, template: TradeTemplateUpdate,
         db_template.sort_order = template.sort_order
 
     print(f"Before commit - jinja2_content: {db_template.jinja2_content}")
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     print(f"After commit - jinja2_content: {db_template.jinja2_content}")
 
     return {
@@ -271,6 +380,7 @@ async def update_trade_template(template_id: int, template: TradeTemplateUpdate,
         "sort_order": db_template.sort_order,
         "jinja2_content": db_template.jinja2_content,
         "template_variables": db_template.template_variables or {},
+        "xml_schema": db_template.xml_schema,
         "creator_id": db_template.creator_id,
         "is_active": db_template.is_active,
         "version": db_template.version,
@@ -282,41 +392,27 @@ async def update_trade_template(template_id: int, template: TradeTemplateUpdate,
 
 
 @router.delete("/{template_id}")
-async def delete_trade_template(template_id: int, db: Session = Depends(get_db)):
+async def delete_trade_template(template_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete trade template"""
-    template = db.query(TradeTemplate).filter(TradeTemplate.id == template_id).first()
+    template = await db.get(TradeTemplate, template_id)
 
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    def delete_template_recursive(template_id: int):
-        """Recursively delete template and all its children"""
-        # Get all children
-        children = db.query(TradeTemplate).filter(
-            TradeTemplate.parent_id == template_id,
-            TradeTemplate.is_active == True
-        ).all()
-
-        # Recursively delete children first
-        for child in children:
-            delete_template_recursive(child.id)
+    # Deactivate the template and its whole subtree in one statement
+    deactivated_count = await db.run_sync(deactivate_subtree, TradeTemplate, template_id)
+    await db.commit()
 
-        # Delete the template itself
-        template_to_delete = db.query(TradeTemplate).filter(TradeTemplate.id == template_id).first()
-        if template_to_delete:
-            template_to_delete.is_active = False
-
-    # Start recursive deletion
-    delete_template_recursive(template_id)
-    db.commit()
-
-    return {"message": "Template and all children deleted successfully"}
+    return {
+        "message": "Template and all children deleted successfully",
+        "deactivated_count": deactivated_count
+    }
 
 
 @router.post("/render")
 async def render_template_content(
     request: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Render template content with variables"""
     template_content = request.get("template_content", "")
@@ -326,9 +422,8 @@ async def render_template_content(
         raise HTTPException(status_code=400, detail="template_content is required")
 
     try:
-        import jinja2
-        jinja_template = jinja2.Template(template_content)
-        rendered_content = jinja_template.render(**variables)
+        # include/import 的模板按需从数据库加载，在线程中渲染
+        rendered_content = await asyncio.to_thread(template_renderer.render, template_content, variables)
 
         return {
             "rendered_content": rendered_content,
@@ -342,11 +437,13 @@ async def render_template_content(
 @router.post("/{template_id}/render")
 async def render_trade_template(
     template_id: int,
+    request: Request,
     variables: Dict[str, Any] = {},
-    db: Session = Depends(get_db)
+    stream: bool = Query(False, description="Stream the rendered output only (gzip when accepted) instead of the JSON envelope"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Render Jinja2 template"""
-    template = db.query(TradeTemplate).filter(TradeTemplate.id == template_id).first()
+    template = await db.get(TradeTemplate, template_id)
 
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
@@ -355,11 +452,11 @@ async def render_trade_template(
         raise HTTPException(status_code=400, detail="Node is not a template or has no template content")
 
     try:
-        jinja_template = jinja2.Template(template.jinja2_content)
-
         # Merge template variables with request variables
         render_vars = {**(template.template_variables or {}), **variables}
-        rendered_content = jinja_template.render(**render_vars)
+        if stream:
+            return streaming_render_response(request, template.jinja2_content, render_vars)
+        rendered_content = await asyncio.to_thread(template_renderer.render, template.jinja2_content, render_vars)
 
         return {
             "rendered_content": rendered_content,
@@ -370,10 +467,55 @@ async def render_trade_template(
         raise HTTPException(status_code=400, detail=f"Template rendering error: {str(e)}")
 
 
+@router.post("/{template_id}/render/batch")
+async def render_trade_template_batch(
+    template_id: int,
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$", description="ndjson: one result line per item; zip: one file per item"),
+    workers: int = Query(0, ge=0, le=64, description="Chunks rendered in parallel in the process pool, 0 renders in a thread"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Render one template for many variable sets.
+
+    The body is a JSON array of variable objects, or NDJSON
+    (Content-Type: application/x-ndjson) read while the results stream.
+    Results are streamed in input order, chunk by chunk as they render; a failing item is reported with its index
+    instead of failing the batch.
+    """
+    template = await db.get(TradeTemplate, template_id)
+
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    if template.node_type != TemplateNodeType.TEMPLATE or not template.jinja2_content:
+        raise HTTPException(status_code=400, detail="Node is not a template or has no template content")
+
+    source = template.jinja2_content
+    try:
+        template_renderer.get_template(source)
+        items = await variable_sets(request)
+    except jinja2.TemplateSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Jinja2 syntax error: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = render_batch(source, template.template_variables or {}, items, workers=workers)
+    response_class = BodyStreamingResponse if is_ndjson(request) else StreamingResponse
+    if format == "zip":
+        extension = "xml" if source.lstrip().startswith("<") else "txt"
+        return response_class(
+            zip_stream(results, extension),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="template-{template_id}-batch.zip"'},
+        )
+    return response_class(ndjson_stream(results), media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.post("/{template_id}/validate")
-async def validate_template_content(template_id: int, db: Session = Depends(get_db)):
+async def validate_template_content(template_id: int, db: AsyncSession = Depends(get_async_db)):
     """Validate template content (XML and Jinja2)"""
-    template = db.query(TradeTemplate).filter(TradeTemplate.id == template_id).first()
+    template = await db.get(TradeTemplate, template_id)
 
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
@@ -384,42 +526,167 @@ async def validate_template_content(template_id: int, db: Session = Depends(get_
     validation_result = {"valid": True, "errors": [], "warnings": []}
     content = template.jinja2_content
 
-    # Check if content looks like XML
-    is_xml_like = content.strip().startswith('<') and content.strip().endswith('>')
-
-    if is_xml_like:
-        # XML validation
-        try:
-            import xml.etree.ElementTree as ET
-            # Try to parse as XML (ignoring Jinja2 variables for now)
-            xml_content = content
-            # Simple validation - just check if it's well-formed XML structure
-            if '<' in xml_content and '>' in xml_content:
-                validation_result["warnings"].append("XML structure detected - ensure proper XML syntax")
-        except Exception as e:
+    # Referenced templates ({% include/import/extends "Folder/Name" %}) must exist and not loop
+    try:
+        references = tuple(name for name in referenced_templates(content) if name)
+    except jinja2.TemplateSyntaxError:
+        references = ()  # reported below
+    if references:
+        graph = await dependency_graph(db)
+        graph[template.full_path] = references
+        for name in references:
+            if name not in graph:
+                validation_result["valid"] = False
+                validation_result["errors"].append(f"Referenced template not found: {name}")
+        cycle = find_cycle(graph, template.full_path)
+        if cycle:
             validation_result["valid"] = False
-            validation_result["errors"].append(f"XML parsing error: {str(e)}")
+            validation_result["errors"].append(f"Circular template reference: {' -> '.join(cycle)}")
 
-    # Jinja2 validation
-    try:
-        import jinja2
-        jinja_template = jinja2.Template(content)
-        validation_result["warnings"].append("Jinja2 template syntax is valid")
-    except jinja2.TemplateSyntaxError as e:
-        validation_result["valid"] = False
-        validation_result["errors"].append(f"Jinja2 syntax error: {str(e)}")
-    except Exception as e:
-        validation_result["valid"] = False
-        validation_result["errors"].append(f"Template validation error: {str(e)}")
+    # Render with the template variables and stream-parse the output (XML + optional XSD)
+    if validation_result["valid"]:
+        xml_schema = await schema_for(db, template)
+        validation_result = await asyncio.to_thread(
+            validate_template, content, template.template_variables or {}, xml_schema
+        )
+        if not any(error.startswith("Jinja2 syntax error") for error in validation_result["errors"]):
+            validation_result["warnings"].append("Jinja2 template syntax is valid")
 
     # Check for common Jinja2 patterns
     jinja_patterns = ['{%', '{{', '{#']
     has_jinja = any(pattern in content for pattern in jinja_patterns)
 
-    if not has_jinja and not is_xml_like:
+    if not has_jinja and not is_xml_like(content):
         validation_result["warnings"].append("No Jinja2 template syntax detected - this appears to be plain text")
 
     return validation_result
 
 
+@router.get("/{template_id}/dependencies")
+async def get_template_dependencies(template_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Templates this template references and the templates affected when it is edited"""
+    template = await db.get(TradeTemplate, template_id)
+
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    graph = await dependency_graph(db)
+    references = graph.get(template.full_path, ())
+    return {
+        "id": template.id,
+        "full_path": template.full_path,
+        "references": list(references),
+        "missing_references": [name for name in references if name not in graph],
+        "dependents": dependents(graph, template.full_path),
+        "cycle": find_cycle(graph, template.full_path),
+    }
+
+
+def _validation_job_dict(job: TemplateValidationJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "root_id": job.root_id,
+        "status": job.status.value,
+        "total": job.total,
+        "valid_count": job.valid_count,
+        "invalid_count": job.invalid_count,
+        "error": job.error,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+    }
+
+
+@router.post("/{template_id}/validate/subtree", status_code=202)
+async def validate_template_subtree(
+    template_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue a validation of every template under a node (render + XML/XSD parse)"""
+    root = await db.get(TradeTemplate, template_id)
+
+    if not root:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    job = TemplateValidationJob(root_id=template_id)
+    db.add(job)
+    await db.commit()
+
+    # 经执行队列运行：独立会话，租约过期（进程重启）后重新执行
+    await db.run_sync(lambda session: enqueue_validation(session, job.id))
+    return _validation_job_dict(job)
+
 
+@router.get("/validation-jobs/{job_id}")
+async def get_validation_job(
+    job_id: int,
+    only_invalid: bool = Query(True, description="Only return results of invalid templates"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Progress and stored results of a subtree validation job"""
+    job = await db.get(TemplateValidationJob, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Validation job not found")
+
+    query = select(
+        TemplateValidationResult.template_id, TradeTemplate.full_path, TemplateValidationResult.valid,
+        TemplateValidationResult.errors, TemplateValidationResult.warnings, TemplateValidationResult.duration_ms,
+    ).join(TradeTemplate, TradeTemplate.id == TemplateValidationResult.template_id).where(
+        TemplateValidationResult.job_id == job_id
+    ).order_by(TradeTemplate.path)
+    if only_invalid:
+        query = query.where(TemplateValidationResult.valid == False)
+
+    rows = await db.execute(query)
+    return {
+        **_validation_job_dict(job),
+        "results": [dict(row._mapping) for row in rows],
+    }
+
+
+@router.get("/{template_id}/variables")
+async def get_template_variables(template_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Variables the template needs (including included templates) vs its template_variables"""
+    template = await db.get(TradeTemplate, template_id)
+
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    if template.node_type != TemplateNodeType.TEMPLATE or not template.jinja2_content:
+        raise HTTPException(status_code=400, detail="Node is not a template or has no template content")
+
+    try:
+        analyses = {template.full_path: analyze(template.jinja2_content)}
+    except jinja2.TemplateSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Jinja2 syntax error: {str(e)}")
+
+    # 按层加载 include/extends 引用的模板（共享渲染上下文），找不到的引用忽略
+    seen = {template.full_path}
+    pending = set(analyses[template.full_path].context_references) - seen
+    while pending:
+        seen |= pending
+        rows = await db.execute(
+            select(TradeTemplate.full_path, TradeTemplate.jinja2_content).where(
+                TradeTemplate.full_path.in_(pending),
+                TradeTemplate.node_type == TemplateNodeType.TEMPLATE,
+                TradeTemplate.is_active == True,
+            )
+        )
+        pending = set()
+        for full_path, content in rows:
+            try:
+                analyses[full_path] = analyze(content or "")
+            except jinja2.TemplateSyntaxError:
+                continue
+            pending.update(analyses[full_path].context_references)
+        pending -= seen
+
+    return {
+        "id": template.id,
+        "full_path": template.full_path,
+        **variables_report(
+            required_variables(template.full_path, analyses), (template.template_variables or {}).keys()
+        ),
+        "includes": sorted(name for name in analyses if name != template.full_path),
+    }
@@ -1,7 +1,8 @@
 """
 应用配置设置
 """
-from typing import List
+import os
+from typing import List, Optional
 
 
 class Settings:
@@ -14,6 +15,15 @@ class Settings:
 
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./qa_management.db"
+    # 异步驱动（aiosqlite），供API端点使用，避免阻塞事件循环
+    ASYNC_DATABASE_URL: str = "sqlite+aiosqlite:///./qa_management.db"
+    # 数据库配置档: default（SQLite默认设置）或 production（WAL + 单写连接 + 只读连接池）
+    DATABASE_PROFILE: str = os.getenv("DATABASE_PROFILE", "default")
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 256MB
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # 64MB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # 写连接的排队等待时间（秒）
+    SQLITE_WRITER_TIMEOUT: int = 30
 
     # 执行引擎配置
     EXECUTION_ENGINE_PATH: str = "D:/AugmentProjects/StudentManagement/tests"
@@ -40,6 +50,32 @@ class Settings:
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
 
+    # 树形接口的进程内缓存，按序列化后的字节数限制内存，0 表示关闭
+    TREE_CACHE_MAX_BYTES: int = int(os.getenv("TREE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # 多worker间通过数据库文件同步缓存失效和WebSocket消息的轮询间隔（秒），0 表示关闭
+    CHANGE_FEED_POLL_INTERVAL: float = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", 0.5))
+
+    # Jinja2模板渲染：已编译模板的LRU大小，以及可选的磁盘字节码缓存目录
+    TEMPLATE_CACHE_SIZE: int = int(os.getenv("TEMPLATE_CACHE_SIZE", 512))
+    TEMPLATE_BYTECODE_CACHE_DIR: Optional[str] = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")
+    # 批量渲染：进程池大小和每个任务的条数
+    RENDER_POOL_WORKERS: int = int(os.getenv("RENDER_POOL_WORKERS", os.cpu_count() or 2))
+    RENDER_BATCH_CHUNK_SIZE: int = 200
+
+    # 测试执行队列：本进程的执行worker数（0 表示不在本进程执行）、租约时长和空闲轮询间隔（秒）
+    EXECUTION_WORKERS: int = int(os.getenv("EXECUTION_WORKERS", 2))
+    EXECUTION_LEASE_SECONDS: int = int(os.getenv("EXECUTION_LEASE_SECONDS", 60))
+    EXECUTION_POLL_INTERVAL: float = float(os.getenv("EXECUTION_POLL_INTERVAL", 1.0))
+    # 常驻pytest worker（已导入harness并启动浏览器）：进程数（0 表示每次执行启动新进程）、
+    # 每个worker执行多少次后替换、常驻浏览器类型（空表示不启动）
+    PYTEST_WARM_WORKERS: int = int(os.getenv("PYTEST_WARM_WORKERS", 0))
+    PYTEST_WORKER_MAX_RUNS: int = int(os.getenv("PYTEST_WORKER_MAX_RUNS", 20))
+    PYTEST_WARM_BROWSER: str = os.getenv("PYTEST_WARM_BROWSER", "chromium")
+    # 共享浏览器服务：启动的浏览器类型（逗号分隔，空表示不启动）、每个服务的并发会话上限、健康检查间隔（秒）
+    BROWSER_SERVERS: str = os.getenv("BROWSER_SERVERS", "")
+    BROWSER_SERVER_MAX_CONTEXTS: int = int(os.getenv("BROWSER_SERVER_MAX_CONTEXTS", 8))
+    BROWSER_SERVER_HEALTH_INTERVAL: float = float(os.getenv("BROWSER_SERVER_HEALTH_INTERVAL", 10.0))
+
 
 # 创建全局设置实例
 settings = Settings()
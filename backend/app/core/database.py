@@ -1,19 +1,109 @@
 """
 数据库连接和会话管理
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, Insert, Update, Delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
 
-# 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # SQLite特定配置
-)
 
-# 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def sqlite_pragmas(query_only: bool = False):
+    """
+    生产配置档的连接初始化：WAL、synchronous=NORMAL、mmap、页缓存、忙等待。
+
+    WAL模式下读不阻塞写、写不阻塞读；只读连接额外打开query_only，
+    误写会直接报错而不会去争抢写锁。
+    """
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return on_connect
+
+
+def create_sqlite_engines(url: str, factory=create_engine, **kwargs):
+    """
+    创建生产配置档的 (写引擎, 读引擎)。
+
+    写引擎的连接池只有一个连接，所有写事务在连接池上排队串行执行，
+    不会在SQLite层面互相等待写锁（"database is locked"）；读引擎使用
+    普通连接池，在WAL快照上并发读取。
+    """
+    writer = factory(url, pool_size=1, max_overflow=0, pool_timeout=settings.SQLITE_WRITER_TIMEOUT, **kwargs)
+    reader = factory(url, **kwargs)
+    event.listen(getattr(writer, "sync_engine", writer), "connect", sqlite_pragmas())
+    event.listen(getattr(reader, "sync_engine", reader), "connect", sqlite_pragmas(query_only=True))
+    return writer, reader
+
+
+class RoutingSession(Session):
+    """
+    读写分离会话：flush 和 INSERT/UPDATE/DELETE 使用写引擎，其余查询使用读引擎。
+
+    一旦当前事务用过写引擎，后续查询也留在写引擎上，保证能读到本事务
+    尚未提交的修改；事务结束后恢复为读引擎。
+    """
+
+    def __init__(self, *args, writer=None, reader=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.reader = reader
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)) or self.info.get("uses_writer"):
+            self.info["uses_writer"] = True
+            return self.writer
+        return self.reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_writer_binding(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("uses_writer", None)
+
+
+if settings.DATABASE_PROFILE == "production":
+    # 生产配置档：WAL + 单写连接 + 只读连接池
+    engine, read_engine = create_sqlite_engines(
+        settings.DATABASE_URL, connect_args={"check_same_thread": False}
+    )
+    SessionLocal = sessionmaker(
+        class_=RoutingSession, writer=engine, reader=read_engine, autocommit=False, autoflush=False
+    )
+
+    async_engine, async_read_engine = create_sqlite_engines(settings.ASYNC_DATABASE_URL, factory=create_async_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        writer=async_engine.sync_engine,
+        reader=async_read_engine.sync_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+else:
+    # 创建数据库引擎
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False}  # SQLite特定配置
+    )
+    read_engine = engine
+
+    # 创建会话工厂
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # 异步引擎和会话工厂（API端点使用）
+    async_engine = create_async_engine(settings.ASYNC_DATABASE_URL)
+    async_read_engine = async_engine
+    # expire_on_commit=False: 提交后仍可读取属性，避免在事件循环中触发隐式加载
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # 创建基础模型类
 Base = declarative_base()
@@ -25,3 +115,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """获取异步数据库会话的依赖注入函数"""
+    async with AsyncSessionLocal() as db:
+        yield db
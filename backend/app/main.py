@@ -1,17 +1,43 @@
 """
 QA管理系统主应用入口
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.api_v1.api import api_router
+from app.services.batch_renderer import shutdown_process_pool
+from app.services.change_feed import change_feed
+from app.services.browser_servers import browser_servers
+from app.services.job_queue import job_pool
+from app.services.pytest_pool import pytest_pool
+from app.services.template_renderer import template_renderer
+from app.services.tree_cache import tree_cache
+from app.utils.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动/停止跨进程变更通知轮询、共享浏览器服务、常驻pytest worker和测试执行队列worker，退出时关闭批量渲染进程池"""
+    if change_feed:
+        await change_feed.start()
+    await browser_servers.start()
+    await pytest_pool.start()
+    await job_pool.start()
+    yield
+    await job_pool.stop()
+    await pytest_pool.stop()
+    await browser_servers.stop()
+    if change_feed:
+        await change_feed.stop()
+    shutdown_process_pool()
 
 # 创建FastAPI应用实例
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="Lightweight QA Management System designed for single applications",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # 配置CORS
@@ -21,6 +47,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
 )
 
 # 包含API路由
@@ -40,6 +67,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "qa-management-api"}
 
+@app.get("/health/cache")
+async def cache_stats():
+    """Tree cache and compiled template cache hit/miss metrics"""
+    return {**tree_cache.stats(), "templates": template_renderer.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
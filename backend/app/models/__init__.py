@@ -6,6 +6,7 @@ from app.models.project import Project, ProjectStatus
 from app.models.test_step import TestStep, StepType
 from app.models.test_data import TestData, TestDataNode, DataNodeType
 from app.models.trade_template import TradeTemplate, TemplateNodeType
+from app.models.template_validation import TemplateValidationJob, TemplateValidationResult, ValidationJobStatus
 from app.models.test_case_file import TestCaseFile, FileType
 from app.models.test_case import (
     TestCase,
@@ -15,6 +16,9 @@ from app.models.test_case import (
     Priority,
     TestCaseStatus
 )
+from app.models.tag import Tag, test_case_tags
+from app.models.search import rebuild_search_index  # 注册FTS索引的建表事件
+from app.models.change_feed import cache_revisions, broadcast_messages
 from app.models.test_execution import (
     TestExecution,
     TestStepResult,
@@ -22,6 +26,8 @@ from app.models.test_execution import (
     ExecutionStatus,
     StepResult
 )
+from app.models.execution_job import ExecutionJob, JobStatus
+from app.models.scenario_duration import ScenarioDuration
 
 # 导出所有模型
 __all__ = [
@@ -30,9 +36,14 @@ __all__ = [
     "TestStep", "StepType",
     "TestData", "TestDataNode", "DataNodeType",
     "TradeTemplate", "TemplateNodeType",
+    "TemplateValidationJob", "TemplateValidationResult", "ValidationJobStatus",
     "TestCaseFile", "FileType",
     "TestCase", "TestCaseStep", "TestCaseReview", "TestCaseHistory",
     "Priority", "TestCaseStatus",
+    "Tag", "test_case_tags",
+    "cache_revisions", "broadcast_messages",
     "TestExecution", "TestStepResult", "TestReport",
-    "ExecutionStatus", "StepResult"
+    "ExecutionStatus", "StepResult",
+    "ExecutionJob", "JobStatus",
+    "ScenarioDuration"
 ]
@@ -12,8 +12,10 @@ class BaseModel(Base):
     __abstract__ = True
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # 索引（隐含rowid）支持列表接口按 (created_at, id) 的键集分页
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # 索引支持条件GET按 max(updated_at) 计算 ETag / Last-Modified
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     @declared_attr
     def __tablename__(cls):
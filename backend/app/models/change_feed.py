@@ -0,0 +1,69 @@
+"""
+变更通知表 - 多进程（多个uvicorn worker）间的缓存失效与消息广播
+
+cache_revisions 每张被缓存的表一行，由该表上的触发器在每次写入时递增，
+因此ORM、批量UPDATE、直接SQL以及其他进程的写入都会反映出来。
+
+broadcast_messages 是只追加的消息表，各进程按自增ID读取新消息后推送给
+本进程的WebSocket连接。
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, Text, event, inspect
+from app.core.database import Base
+
+# 树形接口缓存依赖的表
+REVISION_TABLES = ("test_cases", "test_case_files", "trade_templates", "test_data_nodes")
+
+cache_revisions = Table(
+    "cache_revisions",
+    Base.metadata,
+    Column("table_name", String(100), primary_key=True),
+    Column("revision", Integer, nullable=False, default=0),
+)
+
+broadcast_messages = Table(
+    "broadcast_messages",
+    Base.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("channel", String(100), nullable=False),
+    Column("payload", Text, nullable=False, comment="JSON"),
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow, index=True),
+)
+
+
+def revision_trigger_ddl(tables=None):
+    """递增 cache_revisions 的触发器DDL（可重复执行），tables 限定只为哪些表建触发器"""
+    statements = []
+    for table in REVISION_TABLES:
+        if tables is not None and table not in tables:
+            continue
+        statements.append(f"INSERT OR IGNORE INTO cache_revisions(table_name, revision) VALUES ('{table}', 0)")
+        bump = f"UPDATE cache_revisions SET revision = revision + 1 WHERE table_name = '{table}';"
+        for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_revision_{suffix} AFTER {operation} ON {table} "
+                f"BEGIN {bump} END"
+            )
+    return statements
+
+
+def drop_revision_triggers(connection):
+    for table in REVISION_TABLES:
+        for suffix in ("ai", "au", "ad"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_revision_{suffix}")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_revision_triggers(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in revision_trigger_ddl(set(inspect(connection).get_table_names())):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_revision_triggers(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    drop_revision_triggers(connection)
@@ -0,0 +1,56 @@
+"""
+测试执行任务队列模型
+"""
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, DateTime, Index
+from app.models.base import BaseModel
+from datetime import datetime
+import enum
+
+
+class JobStatus(enum.Enum):
+    """队列任务状态枚举"""
+    QUEUED = "queued"        # 等待领取
+    RUNNING = "running"      # 已被worker领取（租约有效期内）
+    SUCCEEDED = "succeeded"  # 执行完成
+    FAILED = "failed"        # 重试次数用尽
+
+
+class ExecutionJob(BaseModel):
+    """
+    Durable queue entry for one test execution run (or, for the
+    ``template_validation`` kind, one template subtree validation).
+
+    A worker claims the highest priority queued job with a single
+    UPDATE ... RETURNING and holds it under a lease it renews while the
+    run is in progress; a job whose lease expired (worker or process
+    crashed) is put back in the queue.
+    """
+    __tablename__ = "execution_jobs"
+    __table_args__ = (
+        # 领取顺序：状态 -> 优先级(高优先) -> 先进先出
+        Index("ix_execution_jobs_claim", "status", "priority", "id"),
+    )
+
+    execution_id = Column(Integer, ForeignKey("test_executions.id", ondelete="CASCADE"), index=True,
+                          comment="Execution to run")
+    validation_job_id = Column(Integer, ForeignKey("template_validation_jobs.id", ondelete="CASCADE"), index=True,
+                               comment="Template validation job to run")
+    kind = Column(String(50), nullable=False, comment="Handler: playwright, engine or template_validation")
+    priority = Column(Integer, default=0, nullable=False, comment="Higher runs first")
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False, comment="Job status")
+    attempts = Column(Integer, default=0, nullable=False, comment="Times claimed")
+    max_attempts = Column(Integer, default=3, nullable=False, comment="Give up after this many attempts")
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="Not claimed before (retry backoff)")
+    worker_id = Column(String(200), comment="Worker holding the lease")
+    lease_expires_at = Column(DateTime, comment="Lease end, renewed by the worker's heartbeat")
+    last_error = Column(Text, comment="Error of the last failed attempt")
+    started_at = Column(DateTime, comment="Start of the last attempt")
+    finished_at = Column(DateTime, comment="Completion time")
+
+    @property
+    def target_id(self) -> int:
+        """处理函数的参数：执行ID，或模板校验任务ID"""
+        return self.execution_id if self.execution_id is not None else self.validation_job_id
+
+    def __repr__(self):
+        return f"<ExecutionJob(id={self.id}, execution_id={self.execution_id}, status='{self.status.value}')>"
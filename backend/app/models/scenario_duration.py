@@ -0,0 +1,22 @@
+"""
+场景执行时长历史模型
+"""
+from sqlalchemy import Column, String, Integer, Float
+from app.models.base import BaseModel
+
+
+class ScenarioDuration(BaseModel):
+    """
+    Historical run time of one pytest node (scenario), recorded from every
+    finished execution. Sharded executions balance their partitions with
+    ``avg_duration``.
+    """
+    __tablename__ = "scenario_durations"
+
+    nodeid = Column(String(500), nullable=False, unique=True, comment="pytest node id")
+    avg_duration = Column(Float, nullable=False, comment="Moving average run time (seconds)")
+    last_duration = Column(Float, nullable=False, comment="Run time of the last execution (seconds)")
+    samples = Column(Integer, default=1, nullable=False, comment="Recorded runs")
+
+    def __repr__(self):
+        return f"<ScenarioDuration(nodeid='{self.nodeid}', avg_duration={self.avg_duration:.2f})>"
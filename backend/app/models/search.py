@@ -0,0 +1,92 @@
+"""
+全文检索索引 - SQLite FTS5
+
+search_index 是一张 FTS5 虚拟表，由各源表上的触发器维护，因此 ORM
+写入、批量 UPDATE（如模板子树软删除）和直接 SQL 修改都会同步到索引。
+
+rowid 编码为 ``源表ID * 8 + 类型编号``，触发器按 rowid 删除旧条目，
+无需扫描整个索引。
+"""
+from sqlalchemy import event, inspect
+from app.core.database import Base
+
+SEARCH_TABLE = "search_index"
+ROWID_FACTOR = 8
+
+# (类型, 类型编号, 源表, 标题列, 正文列, 入索引条件)
+SEARCH_SOURCES = (
+    ("test_case", 1, "test_cases", "name", "gherkin_content", None),
+    ("test_case_file", 2, "test_case_files", "name", "content", None),
+    ("test_step", 3, "test_steps", "name", "usage_example", None),
+    ("trade_template", 4, "trade_templates", "name", "jinja2_content", "is_active"),
+)
+KIND_CODES = {kind: code for kind, code, *_ in SEARCH_SOURCES}
+KIND_NAMES = {code: kind for kind, code, *_ in SEARCH_SOURCES}
+
+# 标题命中的权重高于正文
+RANK_FUNCTION = "bm25(10.0, 1.0)"
+
+
+def decode_rowid(rowid: int):
+    """rowid -> (类型, 源表ID)"""
+    return KIND_NAMES[rowid % ROWID_FACTOR], rowid // ROWID_FACTOR
+
+
+def _insert_sql(kind, code, title, body, condition, row="new", source=None):
+    sql = (
+        f"INSERT INTO {SEARCH_TABLE}(rowid, kind, title, body) "
+        f"SELECT {row}.id * {ROWID_FACTOR} + {code}, '{kind}', {row}.{title}, coalesce({row}.{body}, '')"
+    )
+    if source:
+        sql += f" FROM {source}"
+    if condition:
+        sql += f" WHERE {row}.{condition}"
+    return sql
+
+
+def search_index_ddl(tables=None):
+    """创建FTS5表和触发器的DDL语句（可重复执行），tables 限定只为哪些源表建触发器"""
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        "title, body, kind UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')",
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES('rank', '{RANK_FUNCTION}')",
+    ]
+    for kind, code, table, title, body, condition in SEARCH_SOURCES:
+        if tables is not None and table not in tables:
+            continue
+        delete_old = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * {ROWID_FACTOR} + {code};"
+        watched = ", ".join(column for column in (title, body, condition) if column)
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN "
+            f"{_insert_sql(kind, code, title, body, condition)}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {watched} ON {table} BEGIN "
+            f"{delete_old} {_insert_sql(kind, code, title, body, condition)}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        ]
+    return statements
+
+
+def rebuild_search_index(connection):
+    """清空并从源表重新填充索引"""
+    connection.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE}")
+    for kind, code, table, title, body, condition in SEARCH_SOURCES:
+        connection.exec_driver_sql(_insert_sql(kind, code, title, body, condition, row=table, source=table))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    existing_tables = set(inspect(connection).get_table_names())
+    for statement in search_index_ddl(existing_tables):
+        connection.exec_driver_sql(statement)
+    if SEARCH_TABLE not in existing_tables:
+        # 已有数据的库首次建索引时补齐历史数据
+        rebuild_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
@@ -0,0 +1,103 @@
+"""
+标签模型 - 测试用例标签索引
+"""
+from sqlalchemy import Column, String, Integer, ForeignKey, Table, Index, event, select, insert, delete, inspect
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from app.models.base import BaseModel
+from app.models.test_case import TestCase
+
+
+# 用例 <-> 标签 关联表；(tag_id, test_case_id) 索引支持按标签查用例
+test_case_tags = Table(
+    "test_case_tags",
+    Base.metadata,
+    Column("test_case_id", Integer, ForeignKey("test_cases.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_test_case_tags_tag_id", "tag_id", "test_case_id"),
+)
+
+
+class Tag(BaseModel):
+    """标签模型"""
+    __tablename__ = "tags"
+
+    name = Column(String(100), nullable=False, unique=True, index=True, comment="Tag name")
+
+    test_cases = relationship("TestCase", secondary=test_case_tags, viewonly=True)
+
+    def __repr__(self):
+        return f"<Tag(id={self.id}, name='{self.name}')>"
+
+
+def parse_tags(value):
+    """
+    解析逗号分隔的标签字符串。
+
+    去掉空白和Gherkin风格的前导"@"，去重并保持原有顺序。
+    """
+    names = []
+    for part in (value or "").split(","):
+        name = part.strip().lstrip("@").strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def normalize_tags(names):
+    """按 parse_tags 的规则规范化标签列表（如请求中的 "@smoke" -> "smoke"）"""
+    return parse_tags(",".join(names or []))
+
+
+def case_ids_with_any_tag(names):
+    """带有任一指定标签的用例ID子查询（走 tags.name 唯一索引和关联表索引）"""
+    return (
+        select(test_case_tags.c.test_case_id)
+        .join(Tag.__table__, Tag.id == test_case_tags.c.tag_id)
+        .where(Tag.name.in_(normalize_tags(names)))
+    )
+
+
+def sync_case_tags(connection, case_id, tags_value, replace=True):
+    """按标签字符串重写某个用例的关联行，缺失的标签自动创建"""
+    tag_table = Tag.__table__
+    if replace:
+        connection.execute(delete(test_case_tags).where(test_case_tags.c.test_case_id == case_id))
+
+    names = parse_tags(tags_value)
+    if not names:
+        return
+
+    def lookup():
+        return dict(connection.execute(
+            select(tag_table.c.name, tag_table.c.id).where(tag_table.c.name.in_(names))
+        ).all())
+
+    tag_ids = lookup()
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        connection.execute(insert(tag_table), [{"name": name} for name in missing])
+        tag_ids = lookup()
+
+    connection.execute(
+        insert(test_case_tags),
+        [{"test_case_id": case_id, "tag_id": tag_ids[name]} for name in names],
+    )
+
+
+@event.listens_for(TestCase, "after_insert")
+def _insert_case_tags(mapper, connection, target):
+    if target.tags:
+        sync_case_tags(connection, target.id, target.tags, replace=False)
+
+
+@event.listens_for(TestCase, "after_update")
+def _update_case_tags(mapper, connection, target):
+    if inspect(target).attrs.tags.history.has_changes():
+        sync_case_tags(connection, target.id, target.tags)
+
+
+@event.listens_for(TestCase, "after_delete")
+def _delete_case_tags(mapper, connection, target):
+    # SQLite默认不启用外键约束，ON DELETE CASCADE 不生效，这里显式清理
+    connection.execute(delete(test_case_tags).where(test_case_tags.c.test_case_id == target.id))
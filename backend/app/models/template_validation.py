@@ -0,0 +1,45 @@
+"""
+交易模板批量校验任务和结果
+"""
+from sqlalchemy import Column, Integer, ForeignKey, Enum, Float, DateTime, JSON, Boolean, Text
+from app.models.base import BaseModel
+import enum
+
+
+class ValidationJobStatus(enum.Enum):
+    """校验任务状态枚举"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class TemplateValidationJob(BaseModel):
+    """一次子树校验：校验根节点下的全部模板"""
+    __tablename__ = "template_validation_jobs"
+
+    root_id = Column(Integer, ForeignKey("trade_templates.id", ondelete="CASCADE"), nullable=False, index=True,
+                     comment="Root node of the validated subtree")
+    status = Column(Enum(ValidationJobStatus), default=ValidationJobStatus.PENDING, nullable=False,
+                    comment="Job status")
+    total = Column(Integer, default=0, comment="Templates to validate")
+    valid_count = Column(Integer, default=0, comment="Valid templates so far")
+    invalid_count = Column(Integer, default=0, comment="Invalid templates so far")
+    error = Column(Text, comment="Why the job failed")
+    started_at = Column(DateTime, comment="Start time")
+    completed_at = Column(DateTime, comment="Completion time")
+
+    def __repr__(self):
+        return f"<TemplateValidationJob(id={self.id}, root_id={self.root_id}, status='{self.status.value}')>"
+
+
+class TemplateValidationResult(BaseModel):
+    """单个模板的校验结果"""
+    __tablename__ = "template_validation_results"
+
+    job_id = Column(Integer, ForeignKey("template_validation_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    template_id = Column(Integer, ForeignKey("trade_templates.id", ondelete="CASCADE"), nullable=False, index=True)
+    valid = Column(Boolean, nullable=False, comment="Rendered and parsed without errors")
+    errors = Column(JSON, default=list, comment="Error messages")
+    warnings = Column(JSON, default=list, comment="Warning messages")
+    duration_ms = Column(Float, comment="Render + parse time")
@@ -4,6 +4,7 @@
 from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, Boolean
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
+from app.models.tree import TreeNodeMixin
 import enum
 
 
@@ -22,7 +23,7 @@ class TestCaseStatus(enum.Enum):
     REJECTED = "rejected"  # 已拒绝
 
 
-class TestCase(BaseModel):
+class TestCase(TreeNodeMixin, BaseModel):
     """测试用例模型"""
     __tablename__ = "test_cases"
 
@@ -62,21 +63,6 @@ class TestCase(BaseModel):
     def __repr__(self):
         return f"<TestCase(id={self.id}, name='{self.name}', status='{self.status.value}')>"
 
-    @property
-    def full_path(self):
-        """获取测试用例的完整路径"""
-        if self.parent:
-            return f"{self.parent.full_path}/{self.name}"
-        return self.name
-
-    def get_all_children(self):
-        """递归获取所有子用例"""
-        result = []
-        for child in self.children:
-            result.append(child)
-            result.extend(child.get_all_children())
-        return result
-
 
 class TestCaseStep(BaseModel):
     """测试用例步骤关联模型"""
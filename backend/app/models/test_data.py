@@ -4,6 +4,7 @@
 from sqlalchemy import Column, String, Text, Integer, ForeignKey, JSON, Boolean
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
+from app.models.tree import TreeNodeMixin
 import enum
 
 
@@ -14,7 +15,7 @@ class DataNodeType(enum.Enum):
     DATA = "data"         # 普通数据节点
 
 
-class TestDataNode(BaseModel):
+class TestDataNode(TreeNodeMixin, BaseModel):
     """测试数据树形节点模型"""
     __tablename__ = "test_data_nodes"
 
@@ -44,21 +45,6 @@ class TestDataNode(BaseModel):
     def __repr__(self):
         return f"<TestDataNode(id={self.id}, name='{self.name}', type='{self.node_type}')>"
 
-    @property
-    def full_path(self):
-        """获取节点的完整路径"""
-        if self.parent:
-            return f"{self.parent.full_path}/{self.name}"
-        return self.name
-
-    def get_all_children(self):
-        """递归获取所有子节点"""
-        result = []
-        for child in self.children:
-            result.append(child)
-            result.extend(child.get_all_children())
-        return result
-
 
 # 保留原有的TestData模型作为兼容性支持
 class TestData(BaseModel):
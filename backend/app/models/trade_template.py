@@ -4,6 +4,7 @@ Trade Template Models for SQLite
 from sqlalchemy import Column, String, Text, Integer, ForeignKey, JSON, Boolean, Enum
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
+from app.models.tree import TreeNodeMixin
 import enum
 
 
@@ -13,7 +14,7 @@ class TemplateNodeType(enum.Enum):
     TEMPLATE = "template"
 
 
-class TradeTemplate(BaseModel):
+class TradeTemplate(TreeNodeMixin, BaseModel):
     """Trade Template Tree Node Model"""
     __tablename__ = "trade_templates"
 
@@ -32,6 +33,7 @@ class TradeTemplate(BaseModel):
     # Template content (only for template nodes)
     jinja2_content = Column(Text, comment="Jinja2 template content")
     template_variables = Column(JSON, default=dict, comment="Template variables definition")
+    xml_schema = Column(Text, comment="XSD the rendered output must conform to (inherited by descendants)")
 
     # Metadata
     creator_id = Column(Integer, default=1, comment="Creator ID")
@@ -43,21 +45,3 @@ class TradeTemplate(BaseModel):
 
     def __repr__(self):
         return f"<TradeTemplate(id={self.id}, name='{self.name}', type='{self.node_type.value}')>"
-
-    @property
-    def full_path(self):
-        """Get full path of the template"""
-        if self.parent:
-            return f"{self.parent.full_path}/{self.name}"
-        return self.name
-
-    def get_all_children(self):
-        """Recursively get all children"""
-        result = []
-        for child in self.children:
-            result.append(child)
-            result.extend(child.get_all_children())
-        return result
-
-
-
@@ -0,0 +1,137 @@
+"""
+树形节点公共字段 - 物化路径
+"""
+from sqlalchemy import Column, String, event, inspect, literal, func, select
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class TreeNodeMixin:
+    """
+    Materialized path for self-referencing tree models.
+
+    ``path`` holds the ancestor ids including the node itself ("/1/5/9/"),
+    ``full_path`` the ancestor names ("Folder/Sub/Name"). Both are indexed
+    and maintained by mapper events on insert and on parent/name change, so
+    subtree reads, path lookups and ancestry checks never walk ``parent``.
+    Deleting a node removes its row (children are cascade-deleted by the
+    ORM), so no other paths need rewriting.
+    """
+
+    path = Column(String(1000), index=True, comment="Materialized id path, e.g. /1/5/9/")
+    full_path = Column(String(2000), index=True, comment="Materialized name path, e.g. Folder/Sub/Name")
+
+    @property
+    def ancestor_ids(self):
+        """祖先节点ID列表（从根到父节点）"""
+        if not self.path:
+            return []
+        return [int(part) for part in self.path.strip("/").split("/")[:-1]]
+
+    def is_descendant_of(self, other) -> bool:
+        """判断当前节点是否位于other的子树中"""
+        return bool(self.path and other.path) and self.path != other.path and self.path.startswith(other.path)
+
+    @classmethod
+    def subtree_filter(cls, path: str, include_self: bool = True):
+        """
+        Index range condition selecting the subtree rooted at ``path``.
+
+        Every descendant path starts with ``path`` (which ends with "/"), so
+        it sorts between ``path`` and ``path`` with the trailing "/" bumped
+        to "0" - a plain B-tree range scan, unlike LIKE.
+        """
+        lower = cls.path >= path if include_self else cls.path > path
+        return lower & (cls.path < path[:-1] + "0")
+
+    def get_all_children(self):
+        """获取所有子孙节点（一次索引查询）"""
+        cls = type(self)
+        return object_session(self).query(cls).filter(
+            cls.subtree_filter(self.path, include_self=False)
+        ).order_by(cls.path).all()
+
+
+def _parent_paths(connection, table, parent_id):
+    """读取父节点的物化路径；父节点还没有路径时沿父链补算并写回"""
+    if parent_id is None:
+        return "/", ""
+    row = connection.execute(
+        select(table.c.path, table.c.full_path, table.c.parent_id, table.c.name).where(table.c.id == parent_id)
+    ).first()
+    if row is None:
+        raise ValueError(f"Parent node {parent_id} not found")
+    if row.path is None:
+        # 迁移回填之前的行，或绕过ORM事件批量插入的行
+        grand_path, grand_full_path = _parent_paths(connection, table, row.parent_id)
+        path, full_path = f"{grand_path}{parent_id}/", _join_name(grand_full_path, row.name)
+        connection.execute(
+            table.update().where(table.c.id == parent_id).values(
+                path=path, full_path=full_path, updated_at=table.c.updated_at
+            )
+        )
+        return path, full_path
+    return row.path, row.full_path
+
+
+def _join_name(parent_full_path, name):
+    return f"{parent_full_path}/{name}" if parent_full_path else name
+
+
+@event.listens_for(TreeNodeMixin, "after_insert", propagate=True)
+def _set_paths_after_insert(mapper, connection, target):
+    """插入后写入物化路径（需要自身ID，因此在INSERT之后执行）"""
+    table = mapper.local_table
+    parent_path, parent_full_path = _parent_paths(connection, table, target.parent_id)
+    path = f"{parent_path}{target.id}/"
+    full_path = _join_name(parent_full_path, target.name)
+
+    connection.execute(
+        table.update().where(table.c.id == target.id).values(
+            path=path, full_path=full_path, updated_at=table.c.updated_at
+        )
+    )
+    set_committed_value(target, "path", path)
+    set_committed_value(target, "full_path", full_path)
+
+
+@event.listens_for(TreeNodeMixin, "after_update", propagate=True)
+def _rewrite_paths_after_update(mapper, connection, target):
+    """移动或重命名后，用一条UPDATE重写自身及全部子孙的路径"""
+    if target.path is None or target.full_path is None:
+        # 还没有物化路径的行：按当前父节点补算（与插入时相同）
+        _set_paths_after_insert(mapper, connection, target)
+        return
+
+    state = inspect(target)
+    if not (state.attrs.parent_id.history.has_changes() or state.attrs.name.history.has_changes()):
+        return
+
+    table = mapper.local_table
+    old_path, old_full_path = target.path, target.full_path
+    parent_path, parent_full_path = _parent_paths(connection, table, target.parent_id)
+    if parent_path.startswith(old_path):
+        raise ValueError("Cannot move a node under itself or its own descendant")
+
+    new_path = f"{parent_path}{target.id}/"
+    new_full_path = _join_name(parent_full_path, target.name)
+
+    connection.execute(
+        table.update().where(
+            table.c.path >= old_path, table.c.path < old_path[:-1] + "0"
+        ).values(
+            path=literal(new_path) + func.substr(table.c.path, len(old_path) + 1),
+            full_path=literal(new_full_path) + func.substr(table.c.full_path, len(old_full_path) + 1),
+        )
+    )
+
+    # 同步会话中已加载的子孙对象，避免读取到旧路径
+    session = object_session(target)
+    for obj in list(session.identity_map.values()) if session else [target]:
+        if not isinstance(obj, mapper.class_):
+            continue
+        loaded = inspect(obj).dict
+        obj_path = loaded.get("path")
+        if obj_path and obj_path.startswith(old_path) and "full_path" in loaded:
+            set_committed_value(obj, "path", new_path + obj_path[len(old_path):])
+            set_committed_value(obj, "full_path", new_full_path + loaded["full_path"][len(old_full_path):])
@@ -0,0 +1,138 @@
+"""
+Execution queue operations for remote agents
+
+Remote agents (``qa_agent.py``) take jobs from the same queue as the
+in-process workers, over HTTP. An agent holds the job's lease as worker
+``agent:<agent_id>``: claiming returns the files of the run (features,
+pytest.ini, step definitions) for the agent to write locally, results
+streamed back while pytest runs update the execution's progress (and
+renew the lease), and completion records the report and finishes the job.
+
+Every call after the claim checks that the agent still holds the lease;
+if it expired and the job was recovered, ``LeaseLost`` is raised and the
+agent abandons the run.
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.execution_job import ExecutionJob, JobStatus
+from app.models.test_execution import TestExecution, ExecutionStatus
+from app.services.execution_updates import execution_state, execution_updates
+from app.services.job_queue import claim, finish, recover_expired, renew_lease
+from app.services.test_executor import PlaywrightTestExecutor
+
+# 可以交给远程agent执行的任务类型
+REMOTE_KINDS = ("playwright",)
+
+
+class LeaseLost(Exception):
+    """agent不再持有任务租约（已过期被回收或任务已结束）"""
+
+
+def worker_id(agent_id: str) -> str:
+    return f"agent:{agent_id}"
+
+
+def _owned_job(db: Session, job_id: int, agent_id: str) -> ExecutionJob:
+    job = db.get(ExecutionJob, job_id)
+    if job is None or job.status != JobStatus.RUNNING or job.worker_id != worker_id(agent_id):
+        raise LeaseLost(f"Job {job_id} is not leased to agent {agent_id}")
+    return job
+
+
+def claim_for_agent(
+    db: Session, agent_id: str, kinds: List[str], lease_seconds: int
+) -> Optional[Dict[str, Any]]:
+    """领取任务并生成执行文件；没有可执行任务时返回None"""
+    kinds = [kind for kind in kinds if kind in REMOTE_KINDS]
+    if not kinds:
+        return None
+    # 只有agent执行任务时（EXECUTION_WORKERS=0）服务端没有恢复循环，领取前回收过期租约
+    recover_expired(db)
+    job = claim(db, worker_id(agent_id), lease_seconds, kinds)
+    if job is None:
+        return None
+
+    execution = db.get(TestExecution, job.execution_id)
+    config = execution.execution_config or {}
+    executor = PlaywrightTestExecutor(db)
+    try:
+        files = executor.build_bundle(
+            execution,
+            test_case_ids=config.get("test_case_ids") or None,
+            tags=config.get("tags") or None,
+            tag_expression=config.get("tag_expression"),
+        )
+        pytest_args = executor.pytest_args(execution)
+    except Exception as e:
+        db.rollback()
+        finish(db, job.id, worker_id(agent_id), f"{type(e).__name__}: {e}")
+        return None
+
+    execution.start_execution()
+    execution.execution_config = {key: value for key, value in config.items() if key != "live_results"}
+    execution.passed_cases = execution.failed_cases = execution.skipped_cases = 0
+    execution.progress = 0.0
+    db.commit()
+    execution_updates.publish(execution.id, execution_state(execution))
+    return {
+        "job_id": job.id,
+        "execution_id": job.execution_id,
+        "attempt": job.attempts,
+        "lease_seconds": lease_seconds,
+        "files": files,
+        "pytest_args": pytest_args,
+        "env": executor.pytest_env(execution),
+    }
+
+
+def heartbeat(db: Session, job_id: int, agent_id: str, lease_seconds: int):
+    if not renew_lease(db, job_id, worker_id(agent_id), lease_seconds):
+        raise LeaseLost(f"Job {job_id} is not leased to agent {agent_id}")
+
+
+def record_results(db: Session, job_id: int, agent_id: str, results: List[Dict[str, Any]], lease_seconds: int):
+    """累加已完成的测试结果并更新进度；结果回传同时续约"""
+    job = _owned_job(db, job_id, agent_id)
+    execution = db.get(TestExecution, job.execution_id)
+    outcomes = Counter(result.get("outcome") for result in results)
+    execution.passed_cases = (execution.passed_cases or 0) + outcomes["passed"]
+    execution.failed_cases = (execution.failed_cases or 0) + outcomes["failed"] + outcomes["error"]
+    execution.skipped_cases = (execution.skipped_cases or 0) + outcomes["skipped"]
+    completed = execution.passed_cases + execution.failed_cases + execution.skipped_cases
+    if (execution.total_cases or 0) < completed:
+        # total_cases 是用例数，pytest按场景计数，进度不超过100%
+        execution.total_cases = completed
+    execution.calculate_progress()
+    # 执行中的逐条结果，完成后由完整报告（test_results）取代
+    config = execution.execution_config or {}
+    execution.execution_config = {**config, "live_results": config.get("live_results", []) + results}
+    db.commit()
+    execution_updates.publish(execution.id, execution_state(execution))
+    heartbeat(db, job_id, agent_id, lease_seconds)
+
+
+def complete_for_agent(
+    db: Session, job_id: int, agent_id: str, report: Optional[Dict[str, Any]], error: Optional[str]
+) -> ExecutionJob:
+    """记录执行报告并结束任务；error 表示执行本身失败（按队列规则重试）"""
+    job = _owned_job(db, job_id, agent_id)
+    execution = db.get(TestExecution, job.execution_id)
+    if error is None:
+        execution.execution_config = {
+            key: value for key, value in (execution.execution_config or {}).items() if key != "live_results"
+        }
+        PlaywrightTestExecutor(db).process_results(execution, report or {})
+        execution.complete_execution()
+    db.commit()
+
+    finish(db, job_id, worker_id(agent_id), error)
+    db.refresh(job)
+    if error is not None:
+        # 重新排队时执行回到待执行，重试用尽时标记失败
+        execution.status = ExecutionStatus.PENDING if job.status == JobStatus.QUEUED else ExecutionStatus.FAILED
+        db.commit()
+    execution_updates.publish(execution.id, execution_state(execution))
+    return job
@@ -0,0 +1,259 @@
+"""
+Batch rendering: one trade template x N variable sets
+
+Variable sets come as a JSON array or NDJSON request body, are rendered
+in chunks against one compiled template and streamed back in input order
+as NDJSON lines or zip members, each chunk as soon as it is rendered. An
+NDJSON body is read while the response streams, so neither the input nor
+the results are held whole. Chunks run in a thread, or
+in a process pool when the caller asks for parallel workers; at most a
+few chunks are in flight at a time, so memory stays bounded whatever the
+batch size.
+
+Each item succeeds or fails on its own; failures are reported with the
+item's index.
+
+``streaming_render_response`` streams a single large render the same
+way, without building the output string.
+"""
+import asyncio
+import json
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from app.core.config import settings
+from app.services.template_renderer import render_many, template_renderer, trade_template_loader
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_render_process():
+    # 渲染进程收不到表的失效通知，被引用的模板每次都查询是否最新
+    trade_template_loader.revision = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """共享的渲染进程池（首次使用时创建，spawn 启动避免继承事件循环线程）"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.RENDER_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_process,
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+def streaming_render_response(request: Request, source: str, variables: Dict[str, Any]) -> StreamingResponse:
+    """
+    Stream the rendered template as the response body, gzip compressed
+    when the client accepts it. The inputs are not echoed back.
+
+    The template is compiled before the response starts, so syntax errors
+    still raise; an error while rendering truncates the stream.
+    """
+    template_renderer.get_template(source)
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    media_type = "application/xml" if source.lstrip().startswith("<") else "text/plain"
+    return StreamingResponse(
+        template_renderer.iter_render(source, variables, compress=compress),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body generator may keep reading the request body.
+
+    StreamingResponse listens for the client disconnect by reading the
+    receive channel while it streams, which would swallow the rest of the
+    request body. Here the generator reads it instead (``request.stream()``
+    raises ClientDisconnect when the client goes away) and a failed send
+    ends the response.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def is_ndjson(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip() == NDJSON_MEDIA_TYPE
+
+
+async def _iterate(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[Any]:
+    def parse(line: bytes):
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            return ValueError(f"Invalid JSON line: {e}")
+
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield parse(line)
+    if buffer.strip():
+        yield parse(buffer)
+
+
+async def variable_sets(request: Request) -> AsyncIterator[Any]:
+    """
+    Variable sets from the request body.
+
+    NDJSON bodies are parsed line by line as chunks arrive, lazily: the
+    response must be a ``BodyStreamingResponse`` so the body can still be
+    read while results stream. A line that is not valid JSON is reported as
+    that item's error. Any other body is parsed as one JSON array, raising
+    ValueError if it is not.
+    """
+    if is_ndjson(request):
+        return _ndjson_lines(request)
+    try:
+        items = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        raise ValueError("Body must be a JSON array of variable objects")
+    return _iterate(items)
+
+
+async def _read_chunk(iterator: AsyncIterator[Any], size: int) -> List[Any]:
+    chunk = []
+    async for item in iterator:
+        chunk.append(item)
+        if len(chunk) >= size:
+            break
+    return chunk
+
+
+async def render_batch(
+    source: str,
+    base_variables: Dict[str, Any],
+    items: AsyncIterator[Any],
+    workers: int = 0,
+    chunk_size: int = 0,
+) -> AsyncIterator[Tuple[int, bool, str]]:
+    """渲染结果按输入顺序逐条产出 (序号, 是否成功, 输出或错误)"""
+    chunk_size = chunk_size or settings.RENDER_BATCH_CHUNK_SIZE
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool() if workers else None
+    max_in_flight = max(workers, 1) * 2
+    pending: List[asyncio.Future] = []
+    index = 0
+
+    def submit(chunk):
+        if pool:
+            return loop.run_in_executor(pool, render_many, source, base_variables, chunk)
+        return asyncio.ensure_future(asyncio.to_thread(render_many, source, base_variables, chunk))
+
+    async def drain(limit):
+        # 队首的块一完成就产出（保持输入顺序）；在途块超过上限时等待队首
+        nonlocal index
+        while pending and (len(pending) > limit or pending[0].done()):
+            for ok, output in await pending.pop(0):
+                yield index, ok, output
+                index += 1
+
+    iterator = items.__aiter__()
+    reading = None
+    try:
+        while True:
+            reading = asyncio.ensure_future(_read_chunk(iterator, chunk_size))
+            # 等待下一块输入（如NDJSON请求体还在上传）期间，渲染完的块立即产出
+            while pending and not reading.done():
+                await asyncio.wait((reading, pending[0]), return_when=asyncio.FIRST_COMPLETED)
+                async for result in drain(len(pending)):
+                    yield result
+            chunk = await reading
+            if chunk:
+                pending.append(submit(chunk))
+            async for result in drain(max_in_flight - 1):
+                yield result
+            if len(chunk) < chunk_size:
+                break
+        async for result in drain(0):
+            yield result
+    finally:
+        if reading is not None:
+            reading.cancel()
+        for future in pending:
+            future.cancel()
+
+
+async def ndjson_stream(results: AsyncIterator[Tuple[int, bool, str]]) -> AsyncIterator[bytes]:
+    async for index, ok, output in results:
+        line = {"index": index, "rendered_content": output} if ok else {"index": index, "error": output}
+        yield orjson.dumps(line) + b"\n"
+
+
+class _ZipBuffer:
+    """只追加的写缓冲：zipfile 写入，生成器取走已写的字节"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+async def zip_stream(
+    results: AsyncIterator[Tuple[int, bool, str]], extension: str = "xml"
+) -> AsyncIterator[bytes]:
+    """每条成功的结果一个文件，失败的写入 errors.ndjson"""
+    buffer = _ZipBuffer()
+    errors = []
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for index, ok, output in results:
+            if ok:
+                archive.writestr(f"{index:06d}.{extension}", output)
+                yield buffer.take()
+            else:
+                errors.append(json.dumps({"index": index, "error": output}))
+        if errors:
+            archive.writestr("errors.ndjson", "\n".join(errors) + "\n")
+    yield buffer.take()
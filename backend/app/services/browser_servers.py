@@ -0,0 +1,222 @@
+"""
+Shared Playwright browser servers
+
+Every pytest session used to launch its own browser. With
+``BROWSER_SERVERS`` set (e.g. ``chromium,firefox``) the backend starts one
+``playwright launch-server`` per browser type at startup and keeps it
+running; test sessions get its endpoint in ``PW_WS_ENDPOINT`` and
+``connect`` to it instead of launching, so browser startup is paid once
+per host.
+
+- leases: each pytest run holds a lease per browser session while it
+  runs; a server serves at most ``BROWSER_SERVER_MAX_CONTEXTS`` at once
+  and further runs wait for a free slot;
+- health checks: the server process must be alive and its port must
+  accept connections, checked every ``BROWSER_SERVER_HEALTH_INTERVAL``
+  seconds; a failed server is restarted;
+- fallback: while a server is down, leases yield no endpoint and the
+  session launches its own browser as before.
+
+Only headless runs use the servers (they are launched headless).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WS_ENDPOINT = re.compile(r"wss?://\S+")
+
+
+class BrowserServer:
+    """一个 ``playwright launch-server`` 进程"""
+
+    def __init__(self, browser_type: str, headless: bool = True, start_timeout: float = 30.0):
+        self.browser_type = browser_type
+        self.headless = headless
+        self.start_timeout = start_timeout
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.ws_endpoint: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.leases = 0
+        self.restarts = 0
+        self._config_path: Optional[str] = None
+        self._drain: Optional[asyncio.Task] = None
+
+    def command(self) -> List[str]:
+        return [sys.executable, "-m", "playwright", "launch-server",
+                "--browser", self.browser_type, "--config", self._config_path]
+
+    async def start(self):
+        """启动服务进程，等待其输出ws地址"""
+        with tempfile.NamedTemporaryFile("w", suffix=".json", prefix="pw_server_", delete=False) as f:
+            json.dump({"headless": self.headless}, f)
+            self._config_path = f.name
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            self.ws_endpoint = await asyncio.wait_for(self._read_endpoint(), self.start_timeout)
+        except BaseException:
+            await self.stop()
+            raise
+        self.started_at = datetime.utcnow()
+        self._drain = asyncio.create_task(self._drain_output())
+
+    async def _read_endpoint(self) -> str:
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"{self.browser_type} browser server exited before listening")
+            match = _WS_ENDPOINT.search(line.decode(errors="replace"))
+            if match:
+                return match.group(0)
+
+    async def _drain_output(self):
+        """持续读取服务输出，避免管道写满阻塞服务进程"""
+        async for line in self.process.stdout:
+            logger.debug("%s browser server: %s", self.browser_type, line.decode(errors="replace").rstrip())
+
+    async def is_healthy(self, timeout: float = 2.0) -> bool:
+        """进程存活且端口可以连接"""
+        if self.process is None or self.process.returncode is not None or not self.ws_endpoint:
+            return False
+        url = urlparse(self.ws_endpoint)
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(url.hostname, url.port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    async def stop(self):
+        if self._drain is not None:
+            self._drain.cancel()
+            self._drain = None
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        self.process = None
+        self.ws_endpoint = None
+        if self._config_path:
+            try:
+                os.unlink(self._config_path)
+            except OSError:
+                pass
+            self._config_path = None
+
+    async def restart(self):
+        await self.stop()
+        self.restarts += 1
+        await self.start()
+
+    def stats(self) -> dict:
+        return {
+            "ws_endpoint": self.ws_endpoint,
+            "running": self.process is not None and self.process.returncode is None,
+            "leases": self.leases,
+            "restarts": self.restarts,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+        }
+
+
+class BrowserServerPool:
+    """每种浏览器一个常驻服务，按会话数限制并发"""
+
+    def __init__(
+        self,
+        browser_types: List[str],
+        max_contexts: int = 8,
+        health_interval: float = 10.0,
+        server_factory=BrowserServer,
+    ):
+        self.servers: Dict[str, BrowserServer] = {name: server_factory(name) for name in browser_types}
+        self.max_contexts = max_contexts
+        self.health_interval = health_interval
+        self._condition: Optional[asyncio.Condition] = None
+        self._monitor: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._monitor is not None
+
+    async def _start_server(self, server: BrowserServer, restart: bool = False):
+        try:
+            await (server.restart() if restart else server.start())
+            logger.info("%s browser server listening on %s", server.browser_type, server.ws_endpoint)
+        except Exception:
+            # 下一次健康检查时重试，期间执行自行启动浏览器
+            logger.exception("Failed to start %s browser server", server.browser_type)
+
+    async def _check_health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for server in self.servers.values():
+                if not await server.is_healthy():
+                    logger.warning("%s browser server is unhealthy, restarting", server.browser_type)
+                    await self._start_server(server, restart=True)
+
+    async def start(self):
+        if self.running or not self.servers:
+            return
+        self._condition = asyncio.Condition()
+        await asyncio.gather(*(self._start_server(server) for server in self.servers.values()))
+        self._monitor = asyncio.create_task(self._check_health())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._monitor.cancel()
+        await asyncio.gather(self._monitor, return_exceptions=True)
+        self._monitor = None
+        await asyncio.gather(*(server.stop() for server in self.servers.values()))
+
+    @asynccontextmanager
+    async def lease(self, browser_type: str, sessions: int = 1) -> AsyncIterator[Optional[str]]:
+        """
+        Hold ``sessions`` slots of the ``browser_type`` server for the
+        duration of a run, waiting while the server is at
+        ``max_contexts``. Yields the ws endpoint, or None when there is no
+        healthy server for that browser (the session launches its own).
+        """
+        server = self.servers.get(browser_type) if self.running else None
+        if server is None:
+            yield None
+            return
+        sessions = max(1, min(sessions, self.max_contexts))
+        async with self._condition:
+            await self._condition.wait_for(lambda: server.leases + sessions <= self.max_contexts)
+            server.leases += sessions
+        try:
+            yield server.ws_endpoint if await server.is_healthy() else None
+        finally:
+            async with self._condition:
+                server.leases -= sessions
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "max_contexts": self.max_contexts,
+            "servers": {name: server.stats() for name, server in self.servers.items()},
+        }
+
+
+browser_servers = BrowserServerPool(
+    [name.strip() for name in settings.BROWSER_SERVERS.split(",") if name.strip()],
+    max_contexts=settings.BROWSER_SERVER_MAX_CONTEXTS,
+    health_interval=settings.BROWSER_SERVER_HEALTH_INTERVAL,
+)
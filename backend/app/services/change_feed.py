@@ -0,0 +1,173 @@
+"""
+Cross-process change feed over the SQLite database file
+
+With several uvicorn workers every process has its own tree cache and its
+own WebSocket connections. The database file is the only thing they
+share, so it doubles as the notification bus:
+
+- triggers bump ``cache_revisions`` on every write to a cached table;
+- ``publish`` appends to ``broadcast_messages``.
+
+Each process polls ``PRAGMA data_version`` on a dedicated read
+connection. The value only changes when another connection committed, so
+an idle poll is one PRAGMA and no table reads. When it changes, the
+revisions are compared to invalidate the tree cache and new messages are
+dispatched to this process's subscribers.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.services.tree_cache import tree_cache
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[Any], Awaitable[None]]
+
+
+def sqlite_path(url: str) -> Optional[str]:
+    """数据库文件路径；非SQLite或内存库返回None"""
+    url = make_url(url)
+    if not url.drivername.startswith("sqlite") or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+class ChangeFeed:
+    """基于SQLite数据库文件的跨进程变更通知"""
+
+    def __init__(self, path: str, poll_interval: float = 0.5, retention: float = 300):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._subscribers: Dict[str, List[Subscriber]] = defaultdict(list)
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._data_version: Optional[int] = None
+        self._revisions: Dict[str, int] = {}
+        self._last_message_id = 0
+        self._last_prune = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute(f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}")
+        return connection
+
+    def subscribe(self, channel: str, callback: Subscriber):
+        """订阅频道，callback 在本进程的事件循环中以消息内容调用"""
+        self._subscribers[channel].append(callback)
+
+    def publish(self, channel: str, payload: Any) -> int:
+        """
+        Append a message for every process (this one included).
+
+        Synchronous and short; call it through ``asyncio.to_thread`` from
+        async code when the write lock may be contended.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            cursor = self._writer.execute(
+                "INSERT INTO broadcast_messages(channel, payload, created_at) VALUES (?, ?, datetime('now'))",
+                (channel, json.dumps(payload, default=str)),
+            )
+            if time.monotonic() - self._last_prune > self.retention:
+                self._last_prune = time.monotonic()
+                self._writer.execute(
+                    "DELETE FROM broadcast_messages WHERE created_at < datetime('now', ?)",
+                    (f"-{int(self.retention)} seconds",),
+                )
+            return cursor.lastrowid
+
+    def _read_revisions(self) -> Dict[str, int]:
+        return dict(self._reader.execute("SELECT table_name, revision FROM cache_revisions"))
+
+    def _poll(self) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """在线程中执行：返回 (变化的表, 新消息)"""
+        data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return [], []
+        self._data_version = data_version
+
+        revisions = self._read_revisions()
+        changed = [table for table, revision in revisions.items() if self._revisions.get(table) != revision]
+        self._revisions = revisions
+
+        messages = self._reader.execute(
+            "SELECT id, channel, payload FROM broadcast_messages WHERE id > ? ORDER BY id",
+            (self._last_message_id,),
+        ).fetchall()
+        if messages:
+            self._last_message_id = messages[-1][0]
+        return changed, [(channel, payload) for _, channel, payload in messages]
+
+    def open(self):
+        """打开读连接并记录当前状态，之前的消息不会重放"""
+        self._reader = self._connect()
+        self._data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+        self._revisions = self._read_revisions()
+        self._last_message_id = self._reader.execute("SELECT coalesce(max(id), 0) FROM broadcast_messages").fetchone()[0]
+
+    async def poll_once(self):
+        changed, messages = await asyncio.to_thread(self._poll)
+        if changed:
+            tree_cache.invalidate(changed)
+        for channel, payload in messages:
+            message = json.loads(payload)
+            for callback in list(self._subscribers.get(channel, ())):
+                try:
+                    await callback(message)
+                except Exception:
+                    logger.exception("Change feed subscriber failed on channel %s", channel)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # 数据库暂时不可用（如迁移中）时继续轮询
+                logger.exception("Change feed poll failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        try:
+            await asyncio.to_thread(self.open)
+        except sqlite3.Error:
+            logger.warning("Change feed disabled: tables missing in %s, run the migrations", self.path)
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for connection in (self._reader, self._writer):
+            if connection is not None:
+                connection.close()
+        self._reader = self._writer = None
+
+
+# 非SQLite数据库或轮询间隔为0时关闭，只在进程内失效和推送
+_path = sqlite_path(settings.DATABASE_URL)
+change_feed = (
+    ChangeFeed(_path, settings.CHANGE_FEED_POLL_INTERVAL)
+    if _path and settings.CHANGE_FEED_POLL_INTERVAL > 0 else None
+)
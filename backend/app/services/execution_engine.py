@@ -1,13 +1,11 @@
-import asyncio
-import subprocess
 import json
-import os
 from typing import Dict, List, Optional
 from datetime import datetime
 from pathlib import Path
 
 from app.models.test_execution import TestExecution, TestStepResult
 from app.core.config import settings
+from app.services.pytest_pool import run_pytest
 from sqlalchemy.orm import Session
 
 class PlaywrightPytestExecutor:
@@ -97,8 +95,7 @@ class PlaywrightPytestExecutor:
         report_dir.mkdir(exist_ok=True)
 
         # 直接使用pytest执行内部测试
-        cmd = [
-            "python", "-m", "pytest",
+        args = [
             str(self.base_path / "step_definitions"),
             "-v",
             "--tb=short",
@@ -108,33 +105,29 @@ class PlaywrightPytestExecutor:
             "--self-contained-html"
         ]
 
-        # 设置环境变量
-        env = os.environ.copy()
-        env.update({
-            "TEST_ENVIRONMENT": execution.environment,
+        # 设置环境变量（执行参数保存在 execution_config 中）
+        config = execution.execution_config or {}
+        headless = config.get("headless", True)
+        env = {
+            "TEST_ENVIRONMENT": config.get("environment") or "test",
             "EXECUTION_ID": str(execution.id),
-            "BROWSER": execution.browser,
-            "HEADLESS": str(execution.headless).lower(),
+            "BROWSER": config.get("browser") or "chromium",
+            "HEADLESS": "true" if headless else "false",
             "BASE_URL": "http://localhost:3001",  # 学生管理系统地址
             "QA_SYSTEM_API": "http://localhost:8000/api/v1"
-        })
+        }
 
         try:
-            # 执行测试
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-                cwd=self.base_path
+            # 执行测试（有常驻worker时不启动新进程）
+            result = await run_pytest(
+                args, str(self.base_path), env,
+                browser=env["BROWSER"] if headless else None,
             )
 
-            stdout, stderr = await process.communicate()
-
             return {
-                "exit_code": process.returncode,
-                "stdout": stdout.decode(),
-                "stderr": stderr.decode(),
+                "exit_code": result["returncode"],
+                "stdout": result["stdout"],
+                "stderr": result["stderr"],
                 "report_dir": str(report_dir)
             }
         except Exception as e:
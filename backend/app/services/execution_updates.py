@@ -0,0 +1,91 @@
+"""
+Live execution updates over WebSocket
+
+Clients connected to ``/api/v1/execution-engine/ws/executions`` get an
+``execution_update`` message whenever an execution changes: the queue
+(enqueue, lease recovery), the in-process executor and remote agents
+publish here after committing.
+
+Every uvicorn worker holds only its own connections. With the change feed
+enabled an update is appended to ``broadcast_messages`` and each worker
+pushes it to its own sockets; without it the update is pushed in-process.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket
+
+from app.services.change_feed import change_feed
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_CHANNEL = "execution_update"
+
+
+def execution_state(execution) -> Dict[str, Any]:
+    """推送给前端的执行状态字段（前端合并到当前执行上）"""
+    return {
+        "status": getattr(execution.status, "value", execution.status),
+        "progress": execution.progress,
+        "total_cases": execution.total_cases,
+        "passed_cases": execution.passed_cases,
+        "failed_cases": execution.failed_cases,
+        "skipped_cases": execution.skipped_cases,
+    }
+
+
+class ConnectionManager:
+    """
+    本进程的WebSocket连接。多worker部署时更新经 change_feed 广播，
+    每个worker推送给自己的连接。
+    """
+    def __init__(self):
+        self.active_connections: List[WebSocket] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        self._loop = asyncio.get_running_loop()
+        self.active_connections.append(websocket)
+
+    def disconnect(self, websocket: WebSocket):
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+
+    def publish(self, execution_id: int, data: Dict[str, Any]):
+        """
+        Send an update to every process's connections. Synchronous and
+        callable from any thread (queue operations and executors run in
+        threads); a failed notification is logged and never fails the
+        caller.
+        """
+        message = {"type": EXECUTION_CHANNEL, "execution_id": execution_id, "data": data}
+        try:
+            if change_feed:
+                change_feed.publish(EXECUTION_CHANNEL, message)
+            elif self._loop is not None and self.active_connections:
+                asyncio.run_coroutine_threadsafe(self.send_local(message), self._loop)
+        except Exception:
+            logger.exception("Failed to publish update of execution %s", execution_id)
+
+    async def broadcast_execution_update(self, execution_id: int, data: Dict[str, Any]):
+        await asyncio.to_thread(self.publish, execution_id, data)
+
+    async def send_local(self, message: Dict[str, Any]):
+        disconnected = []
+        for connection in self.active_connections:
+            try:
+                await connection.send_text(json.dumps(message, default=str))
+            except Exception:
+                disconnected.append(connection)
+
+        # 清理断开的连接
+        for connection in disconnected:
+            self.disconnect(connection)
+
+
+execution_updates = ConnectionManager()
+if change_feed:
+    change_feed.subscribe(EXECUTION_CHANNEL, execution_updates.send_local)
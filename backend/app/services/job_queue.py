@@ -0,0 +1,394 @@
+"""
+Durable test execution queue on SQLite
+
+Starting an execution only inserts an ``execution_jobs`` row; the web
+request returns at once and a bounded pool of workers runs the queue:
+
+- claim: one ``UPDATE ... WHERE id = (highest priority queued job)
+  RETURNING``, atomic under SQLite's single writer, so two workers (or
+  two processes) never run the same job;
+- lease: the claiming worker renews ``lease_expires_at`` while the run is
+  in progress; every run gets its own database session;
+- retry: a run that raises is re-queued with exponential backoff until
+  ``max_attempts`` is reached;
+- recovery: jobs whose lease expired (the worker or the whole process
+  died, e.g. a restart mid-run) are put back in the queue and their
+  executions reset to pending, at startup and periodically.
+
+Template subtree validations use the same queue (``template_validation``
+kind, ``validation_job_id`` instead of ``execution_id``), so they get the
+same leases, retries and recovery.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import String, case, cast, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.execution_job import ExecutionJob, JobStatus
+from app.models.template_validation import TemplateValidationJob, ValidationJobStatus
+from app.models.test_execution import TestExecution, ExecutionStatus
+from app.services.execution_updates import execution_updates
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[int, Session], Awaitable[None]]
+
+TEMPLATE_VALIDATION = "template_validation"
+
+RETRY_BACKOFF_SECONDS = 30
+
+
+async def _run_playwright(execution_id: int, db: Session):
+    from app.services.test_executor import PlaywrightTestExecutor
+
+    execution = await asyncio.to_thread(db.get, TestExecution, execution_id)
+    if execution is None:
+        raise ValueError(f"Execution {execution_id} not found")
+    config = execution.execution_config or {}
+    await PlaywrightTestExecutor(db).execute_test_cases(
+        execution_id=execution_id,
+        test_case_ids=config.get("test_case_ids") or None,
+        tags=config.get("tags") or None,
+        tag_expression=config.get("tag_expression"),
+    )
+
+
+async def _run_engine(execution_id: int, db: Session):
+    from app.services.execution_engine import ExecutionEngineService
+
+    await ExecutionEngineService(db).start_execution(execution_id)
+
+
+async def _run_template_validation(validation_job_id: int, db: Session):
+    from app.services.template_validator import run_validation_job
+
+    await run_validation_job(validation_job_id, db)
+
+
+# 任务类型 -> 执行函数(execution_id 或 validation_job_id, 独立的同步会话)；
+# 执行函数在事件循环中运行，会话上的查询和提交需通过 asyncio.to_thread 执行
+HANDLERS: Dict[str, Handler] = {
+    "playwright": _run_playwright,
+    "engine": _run_engine,
+    TEMPLATE_VALIDATION: _run_template_validation,
+}
+
+
+def _add(db: Session, job: ExecutionJob) -> ExecutionJob:
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    job_pool.wake()
+    if job.execution_id is not None:
+        execution_updates.publish(job.execution_id, {"job_id": job.id, "job_status": job.status.value})
+    return job
+
+
+def enqueue(db: Session, execution_id: int, kind: str = "playwright", priority: int = 0) -> ExecutionJob:
+    """
+    Queue a run of the execution and return its job. If the execution is
+    already queued or running, that job is returned instead.
+    """
+    if kind not in HANDLERS or kind == TEMPLATE_VALIDATION:
+        raise ValueError(f"Unknown job kind: {kind}")
+    active = db.scalar(select(ExecutionJob).where(
+        ExecutionJob.execution_id == execution_id,
+        ExecutionJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+    ))
+    if active is not None:
+        return active
+
+    return _add(db, ExecutionJob(execution_id=execution_id, kind=kind, priority=priority))
+
+
+def enqueue_validation(db: Session, validation_job_id: int, priority: int = 0) -> ExecutionJob:
+    """把模板子树校验任务放入队列"""
+    return _add(db, ExecutionJob(validation_job_id=validation_job_id, kind=TEMPLATE_VALIDATION, priority=priority))
+
+
+def claim(
+    db: Session, worker_id: str, lease_seconds: int, kinds: Optional[Sequence[str]] = None
+) -> Optional[ExecutionJob]:
+    """原子地领取优先级最高的可执行任务（可限定任务类型），没有时返回None"""
+    now = datetime.utcnow()
+    next_job = select(ExecutionJob.id).where(
+        ExecutionJob.status == JobStatus.QUEUED,
+        ExecutionJob.available_at <= now,
+        *([ExecutionJob.kind.in_(kinds)] if kinds is not None else []),
+    ).order_by(ExecutionJob.priority.desc(), ExecutionJob.id).limit(1).scalar_subquery()
+
+    job_id = db.execute(
+        update(ExecutionJob).where(
+            ExecutionJob.id == next_job,
+            ExecutionJob.status == JobStatus.QUEUED,
+        ).values(
+            status=JobStatus.RUNNING,
+            worker_id=worker_id,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=ExecutionJob.attempts + 1,
+            started_at=now,
+        ).returning(ExecutionJob.id).execution_options(synchronize_session=False)
+    ).scalar()
+    db.commit()
+    return db.get(ExecutionJob, job_id) if job_id is not None else None
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+    """延长租约；任务已不属于该worker（租约过期被回收）时返回False"""
+    renewed = db.execute(
+        update(ExecutionJob).where(
+            ExecutionJob.id == job_id,
+            ExecutionJob.worker_id == worker_id,
+            ExecutionJob.status == JobStatus.RUNNING,
+        ).values(
+            lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds)
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+def finish(db: Session, job_id: int, worker_id: str, error: Optional[str] = None) -> bool:
+    """
+    记录执行结果：成功，或按退避时间重新排队/重试用尽后失败。
+
+    一条条件UPDATE，只在任务仍由该worker执行时写入；租约已过期并被回收
+    （可能已被重新领取）时不写入，结果以新的执行为准，返回False。
+    """
+    now = datetime.utcnow()
+    if error is None:
+        values = {"status": JobStatus.SUCCEEDED, "finished_at": now}
+    else:
+        retry = ExecutionJob.attempts < ExecutionJob.max_attempts
+        # 退避 RETRY_BACKOFF_SECONDS * 2^(attempts-1) 秒，在SQLite中计算
+        backoff = literal(RETRY_BACKOFF_SECONDS) * literal(1).op("<<")(ExecutionJob.attempts - 1)
+        retry_at = func.strftime("%Y-%m-%d %H:%M:%f", now, literal("+").concat(cast(backoff, String)).concat(" seconds"))
+        values = {
+            "status": case((retry, literal(JobStatus.QUEUED, ExecutionJob.status.type)),
+                           else_=literal(JobStatus.FAILED, ExecutionJob.status.type)),
+            "available_at": case((retry, retry_at), else_=ExecutionJob.available_at),
+            "finished_at": case((retry, None), else_=now),
+            "last_error": error,
+        }
+    finished = db.execute(
+        update(ExecutionJob).where(
+            ExecutionJob.id == job_id,
+            ExecutionJob.worker_id == worker_id,
+            ExecutionJob.status == JobStatus.RUNNING,
+        ).values(worker_id=None, lease_expires_at=None, **values).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(finished)
+
+
+def release(db: Session, job_id: int, worker_id: str):
+    """worker停止时交还未完成的任务，立即重新排队"""
+    db.execute(
+        update(ExecutionJob).where(
+            ExecutionJob.id == job_id,
+            ExecutionJob.worker_id == worker_id,
+            ExecutionJob.status == JobStatus.RUNNING,
+        ).values(
+            status=JobStatus.QUEUED, worker_id=None, lease_expires_at=None, available_at=datetime.utcnow(),
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def recover_expired(db: Session) -> List[int]:
+    """
+    Re-queue jobs whose lease expired and reset their executions (or
+    template validation jobs) to pending; jobs out of attempts fail
+    instead, and so do their executions or validation jobs. Returns the
+    re-queued execution ids.
+    """
+    now = datetime.utcnow()
+    expired = (ExecutionJob.status == JobStatus.RUNNING, ExecutionJob.lease_expires_at < now)
+    error = "Lease expired: worker stopped during the run"
+
+    failed = db.execute(
+        update(ExecutionJob).where(*expired, ExecutionJob.attempts >= ExecutionJob.max_attempts).values(
+            status=JobStatus.FAILED, worker_id=None, lease_expires_at=None, finished_at=now, last_error=error,
+        ).returning(ExecutionJob.execution_id, ExecutionJob.validation_job_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    requeued = db.execute(
+        update(ExecutionJob).where(*expired).values(
+            status=JobStatus.QUEUED, worker_id=None, lease_expires_at=None, available_at=now,
+        ).returning(ExecutionJob.execution_id, ExecutionJob.validation_job_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    execution_ids = [execution_id for execution_id, _ in requeued if execution_id is not None]
+    validation_ids = [validation_id for _, validation_id in requeued if validation_id is not None]
+
+    failed_execution_ids = [execution_id for execution_id, _ in failed if execution_id is not None]
+    _set_validation_status(db, [validation_id for _, validation_id in failed if validation_id is not None],
+                           status=ValidationJobStatus.FAILED, error=error, completed_at=now)
+    _set_validation_status(db, validation_ids, status=ValidationJobStatus.PENDING)
+    if validation_ids:
+        logger.warning("Re-queued template validation jobs with expired leases: %s", validation_ids)
+    _set_execution_status(db, execution_ids, status=ExecutionStatus.PENDING)
+    _set_execution_status(db, failed_execution_ids, status=ExecutionStatus.FAILED, completed_at=now)
+    if failed_execution_ids:
+        logger.warning("Executions failed after their last attempt's lease expired: %s", failed_execution_ids)
+    db.commit()
+    for execution_id in execution_ids:
+        execution_updates.publish(execution_id, {"status": ExecutionStatus.PENDING.value})
+    for execution_id in failed_execution_ids:
+        execution_updates.publish(execution_id, {"status": ExecutionStatus.FAILED.value})
+    return execution_ids
+
+
+def _set_execution_status(db: Session, execution_ids: List[int], **values):
+    if execution_ids:
+        db.execute(
+            update(TestExecution).where(
+                TestExecution.id.in_(execution_ids), TestExecution.status == ExecutionStatus.RUNNING
+            ).values(**values).execution_options(synchronize_session=False)
+        )
+
+
+def _set_validation_status(db: Session, validation_ids: List[int], **values):
+    if validation_ids:
+        db.execute(
+            update(TemplateValidationJob).where(
+                TemplateValidationJob.id.in_(validation_ids),
+                TemplateValidationJob.status.in_([ValidationJobStatus.PENDING, ValidationJobStatus.RUNNING]),
+            ).values(**values).execution_options(synchronize_session=False)
+        )
+
+
+def queue_stats(db: Session) -> Dict[str, int]:
+    counts = dict(db.execute(select(ExecutionJob.status, func.count()).group_by(ExecutionJob.status)).all())
+    return {status.value: counts.get(status, 0) for status in JobStatus}
+
+
+class JobWorkerPool:
+    """本进程内固定数量的执行worker（asyncio任务）"""
+
+    def __init__(
+        self,
+        size: int,
+        session_factory=SessionLocal,
+        lease_seconds: int = 60,
+        poll_interval: float = 1.0,
+    ):
+        self.size = size
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.running: Dict[str, int] = {}
+
+    def _call(self, function, *args):
+        """在线程中用独立会话执行一次队列操作"""
+        def run():
+            with self.session_factory() as db:
+                return function(db, *args)
+        return asyncio.to_thread(run)
+
+    def wake(self):
+        """有新任务时唤醒空闲worker（可从任意线程调用）"""
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:  # 事件循环已关闭
+                pass
+
+    async def _idle(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _heartbeat(self, job_id: int, worker_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await self._call(renew_lease, job_id, worker_id, self.lease_seconds):
+                logger.warning("Execution job %s: lease lost by %s", job_id, worker_id)
+                return
+
+    async def run_job(self, job: ExecutionJob, worker_id: str):
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, worker_id))
+        self.running[worker_id] = job.id
+        error = None
+        try:
+            # 每次执行使用独立会话，不依赖已关闭的请求会话
+            with self.session_factory() as db:
+                await HANDLERS[job.kind](job.target_id, db)
+        except asyncio.CancelledError:
+            await asyncio.shield(self._call(release, job.id, worker_id))
+            raise
+        except Exception as e:
+            logger.exception("Execution job %s (%s %s) failed", job.id, job.kind, job.target_id)
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+            self.running.pop(worker_id, None)
+        await self._call(finish, job.id, worker_id, error)
+
+    async def _worker(self, index: int):
+        worker_id = f"{self.name}/{index}"
+        while True:
+            try:
+                job = await self._call(claim, worker_id, self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Execution queue claim failed")
+                job = None
+            if job is None:
+                await self._idle()
+                continue
+            await self.run_job(job, worker_id)
+
+    async def _recover_periodically(self):
+        while True:
+            try:
+                execution_ids = await self._call(recover_expired)
+                if execution_ids:
+                    logger.warning("Re-queued executions with expired leases: %s", execution_ids)
+                    self.wake()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Execution queue recovery failed")
+            await asyncio.sleep(self.lease_seconds)
+
+    async def start(self):
+        if self._tasks or self.size <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._recover_periodically())]
+        self._tasks += [asyncio.create_task(self._worker(index)) for index in range(self.size)]
+
+    async def stop(self):
+        """停止worker；正在执行的任务被取消并交还队列（进程崩溃时由租约过期恢复）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = self._wakeup = None
+
+    def stats(self) -> dict:
+        return {"workers": self.size if self._tasks else 0, "running": dict(self.running)}
+
+
+job_pool = JobWorkerPool(
+    settings.EXECUTION_WORKERS,
+    lease_seconds=settings.EXECUTION_LEASE_SECONDS,
+    poll_interval=settings.EXECUTION_POLL_INTERVAL,
+)
@@ -0,0 +1,262 @@
+"""
+Pool of warm pytest worker processes
+
+A fresh ``python -m pytest`` per execution re-imports playwright,
+pytest-bdd and the report plugins and relaunches the browser, several
+seconds before the first step of a short smoke run. With
+``PYTEST_WARM_WORKERS > 0`` the backend keeps that many
+``pytest_worker`` processes that did all of this once (harness imported,
+a browser server running for headless runs to connect to) and hands them
+runs over a local socket
+(``multiprocessing.connection``, unix socket + random authkey):
+
+- each run goes to an idle worker, which runs it in-process and returns
+  the exit code and output;
+- a worker retires after ``PYTEST_WORKER_MAX_RUNS`` runs (or if it dies or
+  the run is cancelled) and a replacement is started and warmed up;
+- if no worker becomes idle in time, ``run_pytest`` falls back to a
+  fresh subprocess, so runs never depend on the pool.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services import pytest_worker
+from app.services.browser_servers import browser_servers
+
+logger = logging.getLogger(__name__)
+
+# 预热时导入的测试harness（conftest、步骤定义、页面对象）
+HARNESS_DIR = Path(__file__).parent.parent / "test_execution"
+
+
+class _PooledWorker:
+    def __init__(self, pid: int, connection: Connection):
+        self.pid = pid
+        self.connection = connection
+
+
+class WarmPytestPool:
+    """常驻的已预热pytest worker进程池"""
+
+    def __init__(
+        self,
+        size: int,
+        max_runs: int = 20,
+        harness_dir: Path = HARNESS_DIR,
+        browser_name: str = "chromium",
+        ready_timeout: float = 60.0,
+    ):
+        self.size = size
+        self.max_runs = max_runs
+        self.harness_dir = harness_dir
+        self.browser_name = browser_name
+        self.ready_timeout = ready_timeout
+        self._listener: Optional[Listener] = None
+        self._address: Optional[str] = None
+        self._authkey = b""
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._processes: Dict[int, subprocess.Popen] = {}
+        self._accept_thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.recycled = 0
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None
+
+    def _spawn(self):
+        process = subprocess.Popen(
+            [sys.executable, pytest_worker.__file__, self._address, str(self.max_runs),
+             str(self.harness_dir), self.browser_name],
+            env={**os.environ, pytest_worker.AUTHKEY_ENV: self._authkey.hex()},
+        )
+        self._processes[process.pid] = process
+
+    def _accept_loop(self, listener: Listener):
+        """接受预热完成的worker连接（线程中执行）"""
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception:
+                if self._listener is None:
+                    return
+                logger.exception("Warm pytest worker failed to connect")
+                continue
+            if self._listener is None:
+                connection.close()
+                return
+            try:
+                hello = connection.recv() if connection.poll(10) else {}
+                worker = _PooledWorker(hello["ready"], connection)
+            except Exception:
+                connection.close()
+                continue
+            self._loop.call_soon_threadsafe(self._idle.put_nowait, worker)
+
+    def _retire(self, worker: _PooledWorker) -> bool:
+        """关闭worker；返回它是否还在池中（已被 _replace_dead 替换的返回False）"""
+        worker.connection.close()
+        process = self._processes.pop(worker.pid, None)
+        if process is None:
+            return False
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        return True
+
+    def _replace_dead(self):
+        """补上预热阶段就退出的worker（还没有连接到池）"""
+        for pid, process in list(self._processes.items()):
+            if process.poll() is not None:
+                del self._processes[pid]
+                logger.warning("Warm pytest worker %s exited with %s, restarting", pid, process.returncode)
+                self._spawn()
+
+    async def start(self):
+        if self.running or self.size <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        self._authkey = os.urandom(32)
+        self._address = os.path.join(tempfile.mkdtemp(prefix="qa_pytest_pool_"), "pool.sock")
+        self._listener = Listener(self._address, family="AF_UNIX", authkey=self._authkey)
+        self._accept_thread = threading.Thread(target=self._accept_loop, args=(self._listener,), daemon=True)
+        self._accept_thread.start()
+        for _ in range(self.size):
+            self._spawn()
+
+    async def run(self, args: List[str], cwd: str, env: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Run pytest with ``args`` in ``cwd`` on a warm worker, ``env`` added to
+        its environment. Returns ``{"returncode", "stdout", "stderr"}``, or
+        None if no worker became idle within ``ready_timeout``.
+        """
+        job = {"args": list(args), "cwd": cwd, "env": env or {}}
+        while True:
+            self._replace_dead()
+            try:
+                worker = await asyncio.wait_for(self._idle.get(), self.ready_timeout)
+            except asyncio.TimeoutError:
+                return None
+            try:
+                await asyncio.to_thread(worker.connection.send, job)
+                break
+            except OSError:
+                # 空闲时已退出的worker：替换后换一个
+                if await asyncio.to_thread(self._retire, worker) and self.running:
+                    self._spawn()
+
+        try:
+            result = await asyncio.to_thread(worker.connection.recv)
+        except asyncio.CancelledError:
+            # worker还在执行被取消的任务，直接替换
+            process = self._processes.get(worker.pid)
+            if process is not None:
+                process.kill()
+            if await asyncio.shield(asyncio.to_thread(self._retire, worker)) and self.running:
+                self._spawn()
+            raise
+        except (EOFError, OSError) as e:
+            result = {"returncode": -1, "stdout": "", "stderr": f"Warm pytest worker {worker.pid} died: {e}",
+                      "retiring": True}
+
+        self.runs += 1
+        if result.pop("retiring", False):
+            self.recycled += 1
+            if await asyncio.to_thread(self._retire, worker) and self.running:
+                self._spawn()
+        else:
+            self._idle.put_nowait(worker)
+        return result
+
+    async def stop(self):
+        if not self.running:
+            return
+        listener, self._listener = self._listener, None
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            try:
+                worker.connection.send(None)
+            except OSError:
+                pass
+            await asyncio.to_thread(self._retire, worker)
+        # 唤醒阻塞在accept中的线程
+        try:
+            Client(self._address, family="AF_UNIX", authkey=self._authkey).close()
+        except OSError:
+            pass
+        await asyncio.to_thread(self._accept_thread.join, 10)
+        listener.close()
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            await asyncio.to_thread(process.wait)
+        self._processes.clear()
+        shutil.rmtree(os.path.dirname(self._address), ignore_errors=True)
+
+    def stats(self) -> dict:
+        return {
+            "warm_workers": len(self._processes),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "runs": self.runs,
+            "recycled": self.recycled,
+        }
+
+
+pytest_pool = WarmPytestPool(
+    settings.PYTEST_WARM_WORKERS,
+    max_runs=settings.PYTEST_WORKER_MAX_RUNS,
+    browser_name=settings.PYTEST_WARM_BROWSER,
+)
+
+
+async def run_pytest(
+    args: List[str],
+    cwd: str,
+    env: Optional[Dict[str, str]] = None,
+    browser: Optional[str] = None,
+    sessions: int = 1,
+) -> Dict[str, Any]:
+    """
+    运行一次pytest：有空闲的常驻worker时交给它，否则启动新的子进程。
+
+    ``browser`` 为无头执行的浏览器类型时，执行期间占用共享浏览器服务的
+    ``sessions`` 个会话名额，并通过 PW_WS_ENDPOINT 把服务地址传给测试会话。
+    """
+    if browser is None:
+        return await _run_pytest(args, cwd, env)
+    async with browser_servers.lease(browser, sessions) as ws_endpoint:
+        if ws_endpoint:
+            env = {**(env or {}), "PW_WS_ENDPOINT": ws_endpoint}
+        return await _run_pytest(args, cwd, env)
+
+
+async def _run_pytest(args: List[str], cwd: str, env: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    if pytest_pool.running:
+        result = await pytest_pool.run(args, cwd, env)
+        if result is not None:
+            return result
+        logger.warning("No warm pytest worker available, starting a fresh process")
+
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "pytest", *args,
+        cwd=cwd,
+        env={**os.environ, **(env or {})},
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    return {"returncode": process.returncode, "stdout": stdout.decode(), "stderr": stderr.decode()}
@@ -0,0 +1,227 @@
+"""
+Warm pytest worker process
+
+Started by ``pytest_pool.WarmPytestPool`` (as a script, without importing
+the app). Before taking any job the worker pays the startup cost once:
+
+- a ``--collect-only`` pass over the harness (``app/test_execution``)
+  imports pytest's plugins (pytest-bdd, json-report, html, ...),
+  playwright and the harness conftest's dependencies;
+- a ``playwright launch-server`` for the pool's browser type is started
+  and kept; headless runs of that browser get its endpoint in
+  ``PW_WS_ENDPOINT`` (unless the backend already leased them a shared
+  server) and connect to it instead of launching a browser.
+
+The worker never starts Playwright itself: the sync API refuses to start
+a second instance in a thread that already runs one, so every run
+(harness ``browser`` fixture, pytest-playwright bundles) must be free to
+start its own.
+
+Jobs (``{"args", "cwd", "env"}``) then arrive over the pool's local socket
+and run in-process with ``pytest.main``. After each run the modules
+imported from the run directory and the ``sys.path`` entries pytest added
+are dropped, so the next run collects fresh test modules while the heavy
+imports stay loaded. After ``max_runs`` jobs the worker exits and the
+pool starts a new one, which bounds whatever state tests leak.
+"""
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client
+
+AUTHKEY_ENV = "QA_PYTEST_WORKER_AUTHKEY"
+
+_WS_ENDPOINT = re.compile(r"wss?://\S+")
+
+
+class BrowserServer:
+    """
+    常驻的 ``playwright launch-server`` 子进程（与 app.services.browser_servers
+    相同的命令；worker不导入应用，这里是同步实现）
+    """
+
+    def __init__(self, browser_name: str, start_timeout: float = 30.0):
+        self.browser_name = browser_name
+        self.start_timeout = start_timeout
+        self.process = None
+        self.ws_endpoint = None
+        self._config_path = None
+
+    def command(self):
+        return [sys.executable, "-m", "playwright", "launch-server",
+                "--browser", self.browser_name, "--config", self._config_path]
+
+    def start(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", prefix="pw_server_", delete=False) as f:
+            json.dump({"headless": True}, f)
+            self._config_path = f.name
+        self.process = subprocess.Popen(self.command(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        listening = threading.Event()
+
+        def read_output():
+            # 读出ws地址后继续读取，避免管道写满阻塞服务进程
+            for line in self.process.stdout:
+                match = _WS_ENDPOINT.search(line.decode(errors="replace"))
+                if match and not listening.is_set():
+                    self.ws_endpoint = match.group(0)
+                    listening.set()
+            listening.set()
+
+        threading.Thread(target=read_output, daemon=True).start()
+        if not listening.wait(self.start_timeout) or self.ws_endpoint is None:
+            self.stop()
+            raise RuntimeError(f"{self.browser_name} browser server did not start")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        self.ws_endpoint = None
+        if self._config_path:
+            with contextlib.suppress(OSError):
+                os.unlink(self._config_path)
+            self._config_path = None
+
+
+@contextlib.contextmanager
+def _captured_output():
+    """把 fd 1/2 重定向到临时文件（与子进程的输出等价），结束时取回内容"""
+    output = {"text": ""}
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with tempfile.TemporaryFile() as capture:
+        os.dup2(capture.fileno(), 1)
+        os.dup2(capture.fileno(), 2)
+        try:
+            yield output
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            capture.seek(0)
+            output["text"] = capture.read().decode(errors="replace")
+
+
+def _forget_modules_under(directory: str):
+    """删除从执行目录导入的模块（测试模块、页面对象），下次执行重新导入"""
+    root = os.path.realpath(directory) + os.sep
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.realpath(path).startswith(root):
+            del sys.modules[name]
+
+
+class Worker:
+    def __init__(self, browser_name: str = "chromium", server_factory=BrowserServer):
+        self.browser_name = browser_name
+        self.server_factory = server_factory
+        self.server = None
+
+    def warm_up(self, harness_dir: str):
+        if harness_dir and os.path.isdir(harness_dir):
+            with _captured_output():
+                self._run(["--collect-only", "-q", "-p", "no:cacheprovider", harness_dir], harness_dir, {})
+        self._start_server()
+
+    def _start_server(self):
+        if not self.browser_name:
+            return
+        server = self.server_factory(self.browser_name)
+        try:
+            server.start()
+        except Exception as e:  # 例如没有playwright或浏览器未安装：执行时自行启动浏览器
+            print(f"Warm browser server unavailable: {type(e).__name__}: {e}", file=sys.stderr)
+            server.stop()
+            return
+        self.server = server
+
+    def _endpoint_for_run(self):
+        """
+        常驻浏览器服务只用于同类型的无头执行（与harness读取相同的环境变量），
+        已经租到共享浏览器服务的执行不覆盖；服务退出时重新启动
+        """
+        if self.server is None or os.getenv("PW_WS_ENDPOINT"):
+            return None
+        if os.getenv("BROWSER", "chromium") != self.browser_name or os.getenv("HEADLESS", "false").lower() != "true":
+            return None
+        if not self.server.alive():
+            self.server.stop()
+            self.server = None
+            self._start_server()
+        return self.server.ws_endpoint if self.server is not None else None
+
+    def _run(self, args, cwd, env) -> int:
+        import pytest
+
+        saved_environ, saved_cwd, saved_path = dict(os.environ), os.getcwd(), list(sys.path)
+        os.environ.update(env)
+        os.chdir(cwd)
+        ws_endpoint = self._endpoint_for_run()
+        if ws_endpoint:
+            os.environ["PW_WS_ENDPOINT"] = ws_endpoint
+        try:
+            return int(pytest.main(list(args)))
+        finally:
+            os.chdir(saved_cwd)
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            sys.path[:] = saved_path
+            _forget_modules_under(cwd)
+
+    def run_job(self, job: dict) -> dict:
+        with _captured_output() as output:
+            try:
+                returncode = self._run(job["args"], job["cwd"], job.get("env") or {})
+            except BaseException as e:  # pytest.main 正常不会抛出，例外按内部错误处理
+                print(f"{type(e).__name__}: {e}", file=sys.stderr)
+                returncode = 3
+        return {"returncode": returncode, "stdout": output["text"], "stderr": ""}
+
+    def close(self):
+        if self.server is not None:
+            self.server.stop()
+
+
+def main():
+    address, max_runs, harness_dir, browser_name = sys.argv[1], int(sys.argv[2]), sys.argv[3], sys.argv[4]
+    authkey = bytes.fromhex(os.environ.pop(AUTHKEY_ENV))
+
+    worker = Worker(browser_name)
+    worker.warm_up(harness_dir)
+    connection = Client(address, family="AF_UNIX", authkey=authkey)
+    connection.send({"ready": os.getpid()})
+    try:
+        for runs in range(1, max_runs + 1):
+            try:
+                job = connection.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            result = worker.run_job(job)
+            result["retiring"] = runs == max_runs
+            connection.send(result)
+    finally:
+        connection.close()
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
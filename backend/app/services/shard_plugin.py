@@ -0,0 +1,61 @@
+"""
+pytest plugin for duration-balanced pytest-xdist shards
+
+This module is shipped as ``conftest.py`` into the directory of a sharded
+execution (see ``test_sharding``), next to ``shard_durations.json`` with
+the shard count and historical durations per node id. It must not import
+anything from the app: agents run it without the server code.
+
+At collection every scenario is assigned to a shard by
+longest-processing-time-first and marked ``xdist_group``; run with
+``-n <shards> --dist loadgroup`` each xdist worker (with its own browser)
+then runs one shard. Collection is deterministic, so all workers compute
+the same partition.
+"""
+import heapq
+import json
+import os
+from typing import Dict, List
+
+import pytest
+
+DURATIONS_FILE = "shard_durations.json"
+# 没有任何历史时长时的估计值（秒）
+DEFAULT_DURATION = 1.0
+
+
+def estimate(durations: Dict[str, float], nodeids: List[str]) -> Dict[str, float]:
+    """每个节点的预计时长，没有历史的取已知时长的中位数"""
+    known = sorted(durations[nodeid] for nodeid in nodeids if nodeid in durations)
+    fallback = known[len(known) // 2] if known else DEFAULT_DURATION
+    return {nodeid: durations.get(nodeid, fallback) for nodeid in nodeids}
+
+
+def partition(durations: Dict[str, float], nodeids: List[str], shards: int) -> List[List[str]]:
+    """
+    Split ``nodeids`` into ``shards`` lists of similar total duration:
+    longest first, each to the currently least loaded shard.
+    """
+    estimates = estimate(durations, nodeids)
+    heap = [(0.0, index) for index in range(shards)]
+    partitions: List[List[str]] = [[] for _ in range(shards)]
+    for nodeid in sorted(nodeids, key=lambda nodeid: (-estimates[nodeid], nodeid)):
+        load, index = heapq.heappop(heap)
+        partitions[index].append(nodeid)
+        heapq.heappush(heap, (load + estimates[nodeid], index))
+    return partitions
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    # 需在xdist把分组名追加到nodeid之前执行
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DURATIONS_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    shards = plan["shards"]
+    partitions = partition(plan["durations"], [item.nodeid for item in items], shards)
+    shard_of = {nodeid: index for index, nodeids in enumerate(partitions) for nodeid in nodeids}
+    for item in items:
+        item.add_marker(pytest.mark.xdist_group(f"shard{shard_of[item.nodeid]}"))
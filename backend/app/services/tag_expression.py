@@ -0,0 +1,207 @@
+"""
+Boolean tag expressions for execution targeting
+
+Expressions use the same grammar as pytest ``-m``::
+
+    smoke and not slow or (api and regression)
+
+``not`` binds tighter than ``and``, which binds tighter than ``or``. Tag
+names that are not plain identifiers (whitespace, parentheses, a keyword)
+are written quoted: ``"slow and flaky" or 'and'``. An
+expression is parsed once and cached; it can then be compiled to a SQL
+set operation over the tag index (UNION / INTERSECT / EXCEPT of
+per-tag index lookups) or rendered back as a canonical pytest marker
+expression.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Tuple, Union
+
+from sqlalchemy import except_, intersect, select, union
+
+from app.models.tag import Tag, test_case_tags
+from app.models.test_case import TestCase
+
+
+class TagExpressionError(ValueError):
+    """标签表达式语法错误"""
+
+
+class TagRef(NamedTuple):
+    name: str
+
+
+class Not(NamedTuple):
+    operand: "Node"
+
+
+class And(NamedTuple):
+    operands: Tuple["Node", ...]
+
+
+class Or(NamedTuple):
+    operands: Tuple["Node", ...]
+
+
+Node = Union[TagRef, Not, And, Or]
+
+# 与pytest -m 的标识符规则一致；另外支持带引号的标签名
+_IDENT = r"(?:\w|:|\+|-|\.|\[|\]|\\|/|@)+"
+_TOKEN_RE = re.compile(
+    rf"\s*(?:(\()|(\))|({_IDENT})|(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'))"
+)
+_IDENT_RE = re.compile(_IDENT)
+_ESCAPE_RE = re.compile(r"\\(.)")
+_KEYWORDS = {"and", "or", "not"}
+
+
+def _tokenize(expression: str):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match:
+            raise TagExpressionError(f"Unexpected character {expression[position]!r} at position {position}")
+        if match.group(4):
+            # 带引号的标签名直接作为TagRef，不会被当作关键字或括号
+            tokens.append(TagRef(_ESCAPE_RE.sub(r"\1", match.group(4)[1:-1])))
+        else:
+            tokens.append(match.group(1) or match.group(2) or match.group(3))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """递归下降解析器: or_expr := and_expr ('or' and_expr)*, and_expr := not_expr ('and' not_expr)*"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.index += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise TagExpressionError("Empty tag expression")
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise TagExpressionError(f"Unexpected token {self.peek()!r}")
+        return node
+
+    def or_expr(self):
+        operands = [self.and_expr()]
+        while self.peek() == "or":
+            self.take()
+            operands.append(self.and_expr())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def and_expr(self):
+        operands = [self.not_expr()]
+        while self.peek() == "and":
+            self.take()
+            operands.append(self.not_expr())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def not_expr(self):
+        token = self.take()
+        if isinstance(token, TagRef):
+            return token
+        if token == "not":
+            return Not(self.not_expr())
+        if token == "(":
+            node = self.or_expr()
+            if self.take() != ")":
+                raise TagExpressionError("Missing closing parenthesis")
+            return node
+        if token is None:
+            raise TagExpressionError("Unexpected end of expression")
+        if token == ")" or token in _KEYWORDS:
+            raise TagExpressionError(f"Unexpected token {token!r}")
+        return TagRef(token.lstrip("@"))
+
+
+@lru_cache(maxsize=256)
+def parse_tag_expression(expression: str) -> Node:
+    """解析标签表达式，语法错误时抛出 TagExpressionError"""
+    return _Parser(_tokenize(expression)).parse()
+
+
+def to_pytest_expression(node: Node) -> str:
+    """渲染为规范化的 pytest -m 表达式（子表达式加括号，避免优先级歧义）"""
+    if isinstance(node, TagRef):
+        if not _is_identifier(node.name):
+            raise TagExpressionError(f"Tag {node.name!r} cannot be used as a pytest marker")
+        return node.name
+    if isinstance(node, Not):
+        return f"not {to_pytest_expression(node.operand)}"
+    joiner = " and " if isinstance(node, And) else " or "
+    return "(" + joiner.join(to_pytest_expression(operand) for operand in node.operands) + ")"
+
+
+def _tag_case_ids(name: str):
+    return (
+        select(test_case_tags.c.test_case_id.label("id"))
+        .join(Tag.__table__, Tag.id == test_case_tags.c.tag_id)
+        .where(Tag.name == name)
+    )
+
+
+def _wrap(compound):
+    # SQLite不允许给复合查询的成员加括号，嵌套时先包成子查询
+    subquery = compound.subquery()
+    return select(subquery.c.id)
+
+
+@lru_cache(maxsize=1024)
+def _compile(node: Node):
+    if isinstance(node, TagRef):
+        return _tag_case_ids(node.name)
+    if isinstance(node, Not):
+        return _wrap(except_(select(TestCase.id.label("id")), _compile(node.operand)))
+    if isinstance(node, Or):
+        return _wrap(union(*(_compile(operand) for operand in node.operands)))
+
+    # And: 正向条件取交集，再减去取反的条件（a and not b -> a EXCEPT b）
+    positive = [_compile(operand) for operand in node.operands if not isinstance(operand, Not)]
+    negative = [_compile(operand.operand) for operand in node.operands if isinstance(operand, Not)]
+    if not positive:
+        positive = [select(TestCase.id.label("id"))]
+    result = positive[0] if len(positive) == 1 else _wrap(intersect(*positive))
+    for operand in negative:
+        result = _wrap(except_(result, operand))
+    return result
+
+
+def compile_tag_expression(expression: str):
+    """
+    编译为匹配用例ID的SELECT。
+
+    解析结果和编译结果都按语法树缓存，只有空白不同的表达式共用同一条SQL。
+
+    每个标签是一次 tags.name + test_case_tags(tag_id) 的索引查找，
+    and/or/not 对应 INTERSECT/UNION/EXCEPT，不扫描 test_cases.tags 字符串。
+    """
+    return _compile(parse_tag_expression(expression))
+
+
+def _is_identifier(name: str) -> bool:
+    return bool(_IDENT_RE.fullmatch(name)) and name not in _KEYWORDS and not name.startswith("@")
+
+
+def quote_tag(name: str) -> str:
+    """标签名写入表达式的形式：普通标识符原样，其余加引号转义"""
+    if _is_identifier(name):
+        return name
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def tags_to_expression(tags) -> str:
+    """把标签列表转换为等价的 or 表达式（标签名按需加引号）"""
+    return " or ".join(quote_tag(tag) for tag in tags)
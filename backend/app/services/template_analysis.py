@@ -0,0 +1,116 @@
+"""
+Static analysis of trade template sources
+
+Parsing a template (no rendering) gives the variables it reads from the
+render context (``jinja2.meta.find_undeclared_variables``) and the
+templates it references by name. Results are cached per content hash,
+so a report over thousands of templates only parses the ones edited
+since the last run.
+
+Included templates and ``extends`` parents see the caller's context
+(as do imports ``with context``), so their variables are required by the
+including template too; ``required_variables`` follows those references.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple
+
+from jinja2 import Environment, meta, nodes
+
+# 只用于解析（语法与渲染环境相同，沙箱只影响执行）
+_parser = Environment()
+
+
+class TemplateAnalysis(NamedTuple):
+    """模板源码的静态分析结果"""
+    variables: FrozenSet[str]
+    references: Tuple[Optional[str], ...]
+    context_references: Tuple[str, ...]
+
+
+def _template_names(node) -> Iterable[str]:
+    if isinstance(node, nodes.Const) and isinstance(node.value, str):
+        yield node.value
+    elif isinstance(node, (nodes.Tuple, nodes.List)):
+        for item in node.items:
+            yield from _template_names(item)
+
+
+class _AnalysisCache:
+    """按内容哈希缓存的分析结果（LRU）"""
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._entries: "OrderedDict[str, TemplateAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: str) -> TemplateAnalysis:
+        """语法错误抛出 jinja2.TemplateSyntaxError（不缓存）"""
+        key = hashlib.sha256(source.encode()).hexdigest()
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+                return analysis
+
+        ast = _parser.parse(source)
+        context_references = []
+        for node in ast.find_all((nodes.Include, nodes.Extends, nodes.Import)):
+            if isinstance(node, nodes.Extends) or node.with_context:
+                context_references.extend(_template_names(node.template))
+        analysis = TemplateAnalysis(
+            frozenset(meta.find_undeclared_variables(ast)),
+            tuple(meta.find_referenced_templates(ast)),
+            tuple(dict.fromkeys(context_references)),
+        )
+
+        with self._lock:
+            self._entries[key] = analysis
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return analysis
+
+
+_cache = _AnalysisCache()
+
+
+def analyze(source: str) -> TemplateAnalysis:
+    return _cache.get(source)
+
+
+def referenced_templates(source: str) -> Tuple[Optional[str], ...]:
+    """模板直接引用的模板名（include/import/extends），动态名称为None"""
+    return analyze(source).references
+
+
+def required_variables(full_path: str, analyses: Dict[str, TemplateAnalysis]) -> FrozenSet[str]:
+    """
+    Variables the template at ``full_path`` needs from the render context,
+    including those of the templates it includes / extends (transitively).
+    ``analyses`` maps full paths to analyses; unknown names are skipped.
+    """
+    required, seen, stack = set(), {full_path}, [full_path]
+    while stack:
+        analysis = analyses.get(stack.pop())
+        if analysis is None:
+            continue
+        required |= analysis.variables
+        for name in analysis.context_references:
+            if name not in seen:
+                seen.add(name)
+                stack.append(name)
+    return frozenset(required)
+
+
+def variables_report(
+    required: Iterable[str], provided: Iterable[str]
+) -> Dict[str, list]:
+    """需要的变量与 template_variables 的对照"""
+    required, provided = set(required), set(provided)
+    return {
+        "required": sorted(required),
+        "provided": sorted(provided),
+        "missing": sorted(required - provided),
+        "unused": sorted(provided - required),
+    }
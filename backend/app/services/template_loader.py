@@ -0,0 +1,136 @@
+"""
+Trade templates referencing each other by full path
+
+``{% include "Common/Header" %}``, ``{% import %}`` and ``{% extends %}``
+name another trade template by its ``full_path``. ``TradeTemplateLoader``
+resolves those names against the ``trade_templates`` table; its
+``uptodate`` callback compares the row's ``updated_at``, so after an edit
+(or rename, move, deactivation) only that template is reloaded and
+recompiled - templates including it resolve the include at render time
+and need no recompilation.
+
+Loading queries the database, so renders that may resolve includes run
+in a thread, never on the event loop. ``uptodate`` first compares an
+in-memory revision (the tree cache generation of ``trade_templates``,
+bumped on every ORM commit to the table and by the change feed for other
+processes) and only queries the row when that has moved, so repeated
+renders cost no query while the templates are unchanged.
+
+``dependency_graph`` maps every template to the templates it references,
+so the ones affected by an edit (its transitive dependents) can be found
+and re-validated.
+"""
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from jinja2 import BaseLoader, TemplateNotFound, TemplateSyntaxError
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.trade_template import TradeTemplate, TemplateNodeType
+from app.services.template_analysis import referenced_templates
+
+
+def _lookup(full_path: str):
+    return select(TradeTemplate.id, TradeTemplate.jinja2_content, TradeTemplate.updated_at).where(
+        TradeTemplate.full_path == full_path,
+        TradeTemplate.node_type == TemplateNodeType.TEMPLATE,
+        TradeTemplate.is_active == True,
+    ).order_by(TradeTemplate.id).limit(1)
+
+
+class TradeTemplateLoader(BaseLoader):
+    """
+    按 full_path 从 trade_templates 表加载被引用的模板。
+
+    ``revision`` 返回 trade_templates 可能变化时就会改变的计数；
+    为None时（收不到失效通知的进程，如渲染进程池）每次检查都查询。
+    """
+
+    def __init__(self, engine: Engine, revision: Optional[Callable[[], int]] = None):
+        self.engine = engine
+        self.revision = revision
+
+    def _fetch(self, full_path: str):
+        with self.engine.connect() as connection:
+            return connection.execute(_lookup(full_path)).first()
+
+    def get_source(self, environment, template):
+        row = self._fetch(template)
+        if row is None or row.jinja2_content is None:
+            raise TemplateNotFound(template)
+        version = (row.id, row.updated_at)
+        checked = self.revision() if self.revision else None
+
+        def uptodate():
+            nonlocal checked
+            revision = self.revision() if self.revision else None
+            if revision is not None and revision == checked:
+                return True
+            # 表可能有变化：一次索引查询确认同一路径下仍是同一行且未被修改
+            current = self._fetch(template)
+            if current is None or (current.id, current.updated_at) != version:
+                return False
+            checked = revision
+            return True
+
+        return row.jinja2_content, template, uptodate
+
+
+async def dependency_graph(db: AsyncSession) -> Dict[str, Tuple[str, ...]]:
+    """
+    ``{full_path: referenced full paths}`` for every active template.
+
+    Only literal template names are recorded; dynamic ones (a variable) are
+    resolved at render time and cannot be tracked. Templates with syntax
+    errors have no edges.
+    """
+    rows = await db.execute(
+        select(TradeTemplate.full_path, TradeTemplate.jinja2_content).where(
+            TradeTemplate.node_type == TemplateNodeType.TEMPLATE,
+            TradeTemplate.is_active == True,
+            TradeTemplate.jinja2_content.isnot(None),
+        )
+    )
+    graph = {}
+    for full_path, content in rows:
+        try:
+            graph[full_path] = tuple(name for name in referenced_templates(content) if name)
+        except TemplateSyntaxError:
+            graph[full_path] = ()
+    return graph
+
+
+def dependents(graph: Dict[str, Tuple[str, ...]], full_path: str) -> List[str]:
+    """直接或间接引用 full_path 的全部模板（编辑后需要重新校验的模板）"""
+    reverse: Dict[str, List[str]] = {}
+    for name, references in graph.items():
+        for reference in references:
+            reverse.setdefault(reference, []).append(name)
+
+    seen, queue = set(), deque([full_path])
+    while queue:
+        for name in reverse.get(queue.popleft(), ()):
+            if name not in seen and name != full_path:
+                seen.add(name)
+                queue.append(name)
+    return sorted(seen)
+
+
+def find_cycle(graph: Dict[str, Tuple[str, ...]], full_path: str) -> Optional[List[str]]:
+    """从 full_path 出发的引用环（如 A -> B -> A），没有时返回None"""
+    on_path, done = [full_path], set()
+    iterators = [iter(graph.get(full_path, ()))]
+    while iterators:
+        reference = next(iterators[-1], None)
+        if reference is None:
+            iterators.pop()
+            done.add(on_path.pop())
+            continue
+        if reference in on_path:
+            return on_path[on_path.index(reference):] + [reference]
+        if reference not in done:
+            on_path.append(reference)
+            iterators.append(iter(graph.get(reference, ())))
+    return None
@@ -0,0 +1,175 @@
+"""
+Shared Jinja2 rendering for trade templates and test data templates
+
+Templates are compiled once per distinct source: compiled ``Template``
+objects are kept in an LRU keyed by the SHA-256 of the source, so
+rendering the same trade template again skips lexing, parsing and code
+generation. Editing a template changes its hash and simply misses.
+
+Templates included by name (``{% include "Folder/Header" %}``) are
+loaded from the database by ``TradeTemplateLoader`` and kept in Jinja's
+own cache, which reloads one when its ``updated_at`` changes.
+
+The environment is sandboxed (template sources are user supplied).
+With ``TEMPLATE_BYTECODE_CACHE_DIR`` set, compiled bytecode is also
+stored on disk and shared by worker processes and restarts.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jinja2 import BaseLoader, FileSystemBytecodeCache, Template, TemplateNotFound
+from jinja2.sandbox import SandboxedEnvironment
+
+from app.core.config import settings
+from app.core.database import read_engine
+from app.services.template_loader import TradeTemplateLoader
+from app.services.tree_cache import tree_cache
+
+
+class _SourceLoader(BaseLoader):
+    """
+    以内容哈希为模板名的加载器，源码在编译时临时登记；
+    其他名称（include/import/extends 引用的模板）交给 ``named`` 加载器
+    """
+
+    def __init__(self, named: Optional[BaseLoader] = None):
+        self.pending: Dict[str, str] = {}
+        self.named = named
+
+    def get_source(self, environment, template):
+        source = self.pending.get(template)
+        if source is not None:
+            # 名称即内容哈希，已编译的模板永远是最新的
+            return source, None, lambda: True
+        if self.named is None:
+            raise TemplateNotFound(template)
+        return self.named.get_source(environment, template)
+
+
+class TemplateRenderer:
+    """沙箱化的Jinja2环境 + 按内容哈希缓存的已编译模板"""
+
+    def __init__(
+        self,
+        cache_size: int = 512,
+        bytecode_cache_dir: Optional[str] = None,
+        named_loader: Optional[BaseLoader] = None,
+    ):
+        self.loader = _SourceLoader(named_loader)
+        self.environment = SandboxedEnvironment(
+            loader=self.loader,
+            # Jinja自带的缓存只存按名称引用的模板（auto_reload 检查 uptodate），
+            # 按内容哈希的模板由下面的LRU缓存
+            cache_size=cache_size,
+            auto_reload=True,
+            bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir) if bytecode_cache_dir else None,
+        )
+        self.cache_size = cache_size
+        self._templates: "OrderedDict[str, Template]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def source_hash(source: str) -> str:
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def get_template(self, source: str) -> Template:
+        """已编译的模板；语法错误抛出 jinja2.TemplateSyntaxError"""
+        key = self.source_hash(source)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+
+            self.misses += 1
+            self.loader.pending[key] = source
+            try:
+                # 直接经加载器编译，不进入Jinja的按名称缓存
+                template = self.loader.load(self.environment, key, self.environment.make_globals(None))
+            finally:
+                del self.loader.pending[key]
+
+            self._templates[key] = template
+            if len(self._templates) > self.cache_size:
+                self._templates.popitem(last=False)
+            return template
+
+    def render(self, source: str, variables: Dict[str, Any]) -> str:
+        return self.get_template(source).render(**variables)
+
+    def iter_render(
+        self, source: str, variables: Dict[str, Any], compress: bool = False, chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """
+        Render with ``Template.generate()``, yielding encoded chunks of about
+        ``chunk_size`` bytes (gzip compressed with ``compress``).
+
+        The output is never held whole, so memory does not grow with the
+        size of the rendered document.
+        """
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        buffer, size = [], 0
+        for piece in self.get_template(source).generate(**variables):
+            data = piece.encode()
+            buffer.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                data, buffer, size = b"".join(buffer), [], 0
+                data = compressor.compress(data) if compressor else data
+                if data:
+                    yield data
+        data = b"".join(buffer)
+        if compressor:
+            data = compressor.compress(data) + compressor.flush()
+        if data:
+            yield data
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._templates),
+            "max_entries": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "named_entries": len(self.environment.cache or ()),
+            "bytecode_cache": self.environment.bytecode_cache is not None,
+        }
+
+
+trade_template_loader = TradeTemplateLoader(read_engine, revision=partial(tree_cache.generation, "trade_templates"))
+template_renderer = TemplateRenderer(
+    settings.TEMPLATE_CACHE_SIZE, settings.TEMPLATE_BYTECODE_CACHE_DIR, trade_template_loader
+)
+
+
+def render_many(source: str, base_variables: Dict[str, Any], items: List[Any]) -> List[Tuple[bool, str]]:
+    """
+    Render one template for each variable set: ``(True, output)`` or
+    ``(False, error)`` per item, so one bad item does not fail the rest.
+
+    Module level so it can run in a process pool worker, which keeps its
+    own compiled-template cache.
+    """
+    template = template_renderer.get_template(source)
+    results = []
+    for variables in items:
+        if isinstance(variables, Exception):
+            results.append((False, str(variables)))
+            continue
+        if not isinstance(variables, dict):
+            results.append((False, "Variables must be a JSON object"))
+            continue
+        try:
+            results.append((True, template.render(**{**base_variables, **variables})))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
@@ -0,0 +1,224 @@
+"""
+Validation of rendered trade templates
+
+A template is rendered with its own ``template_variables`` and the output
+is fed piece by piece (``Template.generate()``) into an incremental XML
+parser, so well-formedness is checked on the real document without ever
+holding the whole output. Finished elements are cleared as they close.
+
+Templates (or folders, inherited by everything below them) may store an
+XSD in ``xml_schema``; with lxml installed the same incremental parse also
+validates against it. Without lxml the schema is skipped with a warning.
+
+``run_validation_job`` validates a whole subtree: templates are split
+into chunks validated in the shared render process pool, and the results
+are stored per template as the chunks finish. It runs as a
+``template_validation`` job of the execution queue, with its own session
+and the queue's lease and recovery.
+"""
+import asyncio
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from jinja2 import TemplateSyntaxError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.template_validation import TemplateValidationJob, TemplateValidationResult, ValidationJobStatus
+from app.models.trade_template import TradeTemplate, TemplateNodeType
+from app.services.batch_renderer import get_process_pool
+from app.services.template_renderer import template_renderer
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # XSD校验为可选功能
+    lxml_etree = None
+
+VALIDATION_CHUNK_SIZE = 50
+
+_PARSE_ERRORS = (ET.ParseError,) + ((lxml_etree.XMLSyntaxError,) if lxml_etree else ())
+
+
+def is_xml_like(source: str) -> bool:
+    stripped = source.strip()
+    return stripped.startswith("<") and stripped.endswith(">")
+
+
+@lru_cache(maxsize=64)
+def _xml_schema(xsd: str):
+    return lxml_etree.XMLSchema(lxml_etree.fromstring(xsd.encode()))
+
+
+def _pull_parser(xml_schema: Optional[str], result: Dict[str, Any]):
+    if xml_schema and lxml_etree is not None:
+        try:
+            return lxml_etree.XMLPullParser(events=("end",), schema=_xml_schema(xml_schema))
+        except (lxml_etree.XMLSyntaxError, lxml_etree.XMLSchemaParseError) as e:
+            result["valid"] = False
+            result["errors"].append(f"Invalid XML schema: {e}")
+    elif xml_schema:
+        result["warnings"].append("XSD validation skipped: lxml is not installed")
+    return ET.XMLPullParser(events=("end",))
+
+
+def validate_template(source: str, variables: Dict[str, Any], xml_schema: Optional[str] = None) -> Dict[str, Any]:
+    """渲染模板并流式解析输出：{"valid", "errors", "warnings"}"""
+    result = {"valid": True, "errors": [], "warnings": []}
+    try:
+        template = template_renderer.get_template(source)
+    except TemplateSyntaxError as e:
+        result["valid"] = False
+        result["errors"].append(f"Jinja2 syntax error: {e}")
+        return result
+
+    if not is_xml_like(source):
+        if xml_schema:
+            result["warnings"].append("Template output is not XML - schema validation skipped")
+        return result
+
+    parser = _pull_parser(xml_schema, result)
+    try:
+        for piece in template.generate(**variables):
+            parser.feed(piece.encode())
+            for _, element in parser.read_events():
+                element.clear()
+        parser.close()
+        for _, element in parser.read_events():
+            element.clear()
+    except _PARSE_ERRORS as e:
+        result["valid"] = False
+        result["errors"].append(f"XML parsing error: {e}")
+    except Exception as e:
+        result["valid"] = False
+        result["errors"].append(f"Template rendering error: {type(e).__name__}: {e}")
+    return result
+
+
+def validate_many(
+    items: List[Tuple[int, str, Dict[str, Any], Optional[str]]]
+) -> List[Tuple[int, Dict[str, Any], float]]:
+    """
+    Validate ``(template_id, source, variables, xml_schema)`` items, returning
+    ``(template_id, result, duration_ms)``. Module level so it can run in a
+    process pool worker.
+    """
+    results = []
+    for template_id, source, variables, xml_schema in items:
+        started = time.perf_counter()
+        result = validate_template(source, variables, xml_schema)
+        results.append((template_id, result, (time.perf_counter() - started) * 1000))
+    return results
+
+
+def _nearest_schema(path: str, schemas: Dict[int, str]) -> Optional[str]:
+    """path 上最近的（自身优先）带 xml_schema 的节点的 XSD"""
+    for node_id in reversed([int(part) for part in path.strip("/").split("/") if part]):
+        if node_id in schemas:
+            return schemas[node_id]
+    return None
+
+
+async def schema_for(db: AsyncSession, template: TradeTemplate) -> Optional[str]:
+    """模板生效的 XSD（自身或最近的祖先节点）"""
+    if not template.path:
+        return template.xml_schema
+    ids = template.ancestor_ids + [template.id]
+    rows = await db.execute(
+        select(TradeTemplate.id, TradeTemplate.xml_schema).where(
+            TradeTemplate.id.in_(ids), TradeTemplate.xml_schema.isnot(None)
+        )
+    )
+    return _nearest_schema(template.path, dict(rows.all()))
+
+
+def _start_validation(job_id: int, db: Session, chunk_size: int) -> List[List[tuple]]:
+    """读取子树模板和XSD，清掉上次的结果并把任务置为执行中；返回分块后的校验输入"""
+    job = db.get(TemplateValidationJob, job_id)
+    root = db.get(TradeTemplate, job.root_id)
+    templates = db.execute(
+        select(TradeTemplate.id, TradeTemplate.path, TradeTemplate.jinja2_content, TradeTemplate.template_variables)
+        .where(
+            TradeTemplate.subtree_filter(root.path),
+            TradeTemplate.node_type == TemplateNodeType.TEMPLATE,
+            TradeTemplate.is_active == True,
+            TradeTemplate.jinja2_content.isnot(None),
+        ).order_by(TradeTemplate.path)
+    ).all()
+    # 子树及其祖先上定义的 XSD，一次查询
+    schemas = dict(db.execute(
+        select(TradeTemplate.id, TradeTemplate.xml_schema).where(
+            TradeTemplate.subtree_filter(root.path) | TradeTemplate.id.in_(root.ancestor_ids),
+            TradeTemplate.xml_schema.isnot(None),
+        )
+    ).all())
+
+    db.execute(delete(TemplateValidationResult).where(TemplateValidationResult.job_id == job_id))
+    job.status = ValidationJobStatus.RUNNING
+    job.started_at = datetime.utcnow()
+    job.total = len(templates)
+    job.valid_count = job.invalid_count = 0
+    job.error = None
+    db.commit()
+
+    items = [
+        (row.id, row.jinja2_content, row.template_variables or {}, _nearest_schema(row.path, schemas))
+        for row in templates
+    ]
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def _save_results(job_id: int, db: Session, results: List[tuple]):
+    """写入一块校验结果并更新任务计数"""
+    db.execute(insert(TemplateValidationResult), [
+        {
+            "job_id": job_id, "template_id": template_id, "valid": result["valid"],
+            "errors": result["errors"], "warnings": result["warnings"], "duration_ms": duration_ms,
+        }
+        for template_id, result, duration_ms in results
+    ])
+    job = db.get(TemplateValidationJob, job_id)
+    valid = sum(result["valid"] for _, result, _ in results)
+    job.valid_count += valid
+    job.invalid_count += len(results) - valid
+    db.commit()
+
+
+def _finish_validation(job_id: int, db: Session, error: Optional[str]):
+    if error is not None:
+        db.rollback()
+    job = db.get(TemplateValidationJob, job_id)
+    job.status = ValidationJobStatus.COMPLETED if error is None else ValidationJobStatus.FAILED
+    job.error = error
+    job.completed_at = datetime.utcnow()
+    db.commit()
+
+
+async def run_validation_job(job_id: int, db: Session, chunk_size: int = VALIDATION_CHUNK_SIZE):
+    """
+    执行子树校验任务，结果按块写入 template_validation_results。
+
+    由执行队列调用（``template_validation`` 任务），``db`` 是该任务独立的会话；
+    租约过期后重新执行时，先清掉上次未完成的结果。数据库读写在线程中执行，
+    不阻塞事件循环（会话同一时间只在一个线程中使用）。
+    """
+    if await asyncio.to_thread(db.get, TemplateValidationJob, job_id) is None:
+        raise ValueError(f"Template validation job {job_id} not found")
+    try:
+        chunks = await asyncio.to_thread(_start_validation, job_id, db, chunk_size)
+        loop = asyncio.get_running_loop()
+        if len(chunks) > 1:
+            pool = get_process_pool()
+            futures = [loop.run_in_executor(pool, validate_many, chunk) for chunk in chunks]
+        else:
+            futures = [asyncio.to_thread(validate_many, chunk) for chunk in chunks]
+
+        for future in asyncio.as_completed(futures):
+            await asyncio.to_thread(_save_results, job_id, db, await future)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    await asyncio.to_thread(_finish_validation, job_id, db, error)
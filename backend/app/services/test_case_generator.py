@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from app.models.test_step import TestStep, StepType
 from app.models.test_case import TestCase
 from app.models.test_case_file import TestCaseFile
-from app.models.test_case_step import TestCaseStep
+from app.models.test_case import TestCaseStep
 
 
 class TestCaseGenerator:
@@ -10,12 +10,113 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.test_execution import TestExecution, ExecutionStatus
 from app.models.test_case import TestCase
+from app.models.tag import case_ids_with_any_tag
+from app.services.tag_expression import (
+    compile_tag_expression,
+    parse_tag_expression,
+    tags_to_expression,
+    to_pytest_expression,
+)
+from app.services.execution_updates import execution_state, execution_updates
+from app.services.pytest_pool import run_pytest
+from app.services.test_sharding import record_durations, shard_args, shard_count, shard_files
 from app.models.test_case_file import TestCaseFile
 from app.core.database import get_db
 import tempfile
 import shutil
 
 
+PYTEST_INI = """
+[tool:pytest]
+addopts = 
+    --strict-markers
+    --strict-config
+    --verbose
+    --tb=short
+    --gherkin-terminal-reporter
+    --json-report
+    --json-report-file=test_results.json
+    
+markers =
+    smoke: Smoke tests
+    regression: Regression tests
+    api: API tests
+    ui: UI tests
+    
+bdd_features_base_dir = features/
+"""
+
+# 这里可以从数据库中的Test Steps生成步骤定义，或者使用预定义的步骤定义文件
+STEP_DEFINITIONS = '''
+"""
+Generated step definitions for QA Management System
+"""
+from pytest_bdd import given, when, then, parsers
+from playwright.sync_api import Page, expect
+
+
+@given(parsers.parse('I am on the {page_name} page'))
+def navigate_to_page(page: Page, page_name: str):
+    """Navigate to specified page"""
+    # Implementation based on page_name
+    pass
+
+
+@when(parsers.parse('I {action} {element}'))
+def perform_action(page: Page, action: str, element: str):
+    """Perform action on element"""
+    # Implementation based on action and element
+    pass
+
+
+@then(parsers.parse('I should see {expected_result}'))
+def verify_result(page: Page, expected_result: str):
+    """Verify expected result"""
+    # Implementation based on expected_result
+    pass
+'''
+
+# pytest-playwright 的 fixture 读取与harness相同的环境变量：BROWSER/HEADLESS 决定浏览器，
+# connect_options 不为空时连接浏览器服务而不是启动浏览器
+BUNDLE_CONFTEST = '''
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def browser_name():
+    """Browser type of the execution"""
+    return os.getenv("BROWSER", "chromium")
+
+
+@pytest.fixture(scope="session")
+def browser_type_launch_args(browser_type_launch_args):
+    if "HEADLESS" not in os.environ:
+        return browser_type_launch_args
+    return {**browser_type_launch_args, "headless": os.environ["HEADLESS"].lower() == "true"}
+
+
+@pytest.fixture(scope="session")
+def connect_options():
+    """Connect to the shared browser server when the backend provides one"""
+    ws_endpoint = os.getenv("PW_WS_ENDPOINT")
+    return {"ws_endpoint": ws_endpoint} if ws_endpoint else None
+'''
+
+
+def write_bundle(directory: str, files: Dict[str, str]):
+    """把执行文件写入目录（拒绝目录外的路径）"""
+    root = os.path.realpath(directory)
+    for relative_path, content in files.items():
+        path = os.path.realpath(os.path.join(root, relative_path))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Bundle path escapes the work directory: {relative_path}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
 class PlaywrightTestExecutor:
     """Playwright + pytest-bdd 测试执行器"""
     
@@ -27,7 +128,8 @@ class PlaywrightTestExecutor:
         self, 
         execution_id: int, 
         test_case_ids: List[int] = None,
-        tags: List[str] = None
+        tags: List[str] = None,
+        tag_expression: str = None
     ) -> Dict[str, Any]:
         """
         执行测试用例
@@ -36,175 +138,140 @@ class PlaywrightTestExecutor:
             execution_id: 执行ID
             test_case_ids: 要执行的测试用例ID列表
             tags: 要执行的标签列表
+            tag_expression: 标签表达式（如 "smoke and not slow"），优先于tags
             
         Returns:
             执行结果字典
         """
-        execution = self.db.query(TestExecution).filter(TestExecution.id == execution_id).first()
-        if not execution:
-            raise ValueError(f"Execution {execution_id} not found")
+        # 数据库读写在线程中执行，不阻塞事件循环（会话同一时间只在一个线程中使用）
+        execution = await asyncio.to_thread(self._start_execution, execution_id)
             
         try:
-            # 开始执行
-            execution.start_execution()
-            self.db.commit()
-            
             # 准备测试环境
-            await self._prepare_test_environment(execution, test_case_ids, tags)
+            await asyncio.to_thread(self._prepare_test_environment, execution, test_case_ids, tags, tag_expression)
             
             # 执行测试
             result = await self._run_pytest(execution)
             
-            # 处理结果
-            await self._process_results(execution, result)
-            
-            # 完成执行
-            execution.complete_execution()
-            self.db.commit()
-            
-            return {
-                "status": "success",
-                "execution_id": execution_id,
-                "total_cases": execution.total_cases,
-                "passed": execution.passed_cases,
-                "failed": execution.failed_cases,
-                "skipped": execution.skipped_cases,
-                "duration": execution.duration
-            }
+            # 处理结果并完成执行
+            return await asyncio.to_thread(self._complete_execution, execution, result)
             
         except Exception as e:
-            execution.status = ExecutionStatus.FAILED
-            self.db.commit()
+            await asyncio.to_thread(self._fail_execution, execution)
             raise e
         finally:
             # 清理临时文件
             self._cleanup()
+
+    def _start_execution(self, execution_id: int) -> TestExecution:
+        execution = self.db.query(TestExecution).filter(TestExecution.id == execution_id).first()
+        if not execution:
+            raise ValueError(f"Execution {execution_id} not found")
+        execution.start_execution()
+        self.db.commit()
+        # 提交后重新加载，之后在事件循环中读取属性不触发查询
+        self.db.refresh(execution)
+        execution_updates.publish(execution.id, execution_state(execution))
+        return execution
+
+    def _complete_execution(self, execution: TestExecution, result: Dict[str, Any]) -> Dict[str, Any]:
+        self.process_results(execution, result)
+        execution.complete_execution()
+        self.db.commit()
+        execution_updates.publish(execution.id, execution_state(execution))
+        return {
+            "status": "success",
+            "execution_id": execution.id,
+            "total_cases": execution.total_cases,
+            "passed": execution.passed_cases,
+            "failed": execution.failed_cases,
+            "skipped": execution.skipped_cases,
+            "duration": execution.duration
+        }
+
+    def _fail_execution(self, execution: TestExecution):
+        self.db.rollback()
+        execution.status = ExecutionStatus.FAILED
+        self.db.commit()
+        execution_updates.publish(execution.id, execution_state(execution))
             
-    async def _prepare_test_environment(
+    def _prepare_test_environment(
         self, 
         execution: TestExecution, 
         test_case_ids: List[int] = None,
-        tags: List[str] = None
+        tags: List[str] = None,
+        tag_expression: str = None
     ):
-        """准备测试环境"""
-        # 创建临时目录
+        """准备测试环境：在临时目录中生成执行文件"""
         self.temp_dir = tempfile.mkdtemp(prefix="qa_test_")
-        
-        # 创建features目录
-        features_dir = os.path.join(self.temp_dir, "features")
-        os.makedirs(features_dir, exist_ok=True)
-        
-        # 创建step_definitions目录
-        steps_dir = os.path.join(self.temp_dir, "step_definitions")
-        os.makedirs(steps_dir, exist_ok=True)
-        
+        write_bundle(self.temp_dir, self.build_bundle(execution, test_case_ids, tags, tag_expression))
+
+    def build_bundle(
+        self,
+        execution: TestExecution,
+        test_case_ids: List[int] = None,
+        tags: List[str] = None,
+        tag_expression: str = None
+    ) -> Dict[str, str]:
+        """
+        执行所需的文件 {相对路径: 内容}：feature文件、pytest.ini 和步骤定义。
+
+        本地执行写入临时目录；远程执行agent领取任务时收到同样的文件，在本机生成。
+        """
         # 获取要执行的测试用例
-        query = self.db.query(TestCase).filter(TestCase.is_active == True)
-        
+        query = self.db.query(TestCase.id)
+
         if test_case_ids:
             query = query.filter(TestCase.id.in_(test_case_ids))
+        elif tag_expression:
+            # 根据标签表达式过滤（标签索引上的集合运算）
+            query = query.filter(TestCase.id.in_(compile_tag_expression(tag_expression)))
         elif tags:
-            # 根据标签过滤
-            tag_conditions = []
-            for tag in tags:
-                tag_conditions.append(TestCase.tags.like(f"%{tag}%"))
-            query = query.filter(db.or_(*tag_conditions))
-            
-        test_cases = query.all()
-        execution.total_cases = len(test_cases)
-        
-        # 生成feature文件
-        for test_case in test_cases:
-            await self._generate_feature_files(test_case, features_dir)
-            
-        # 生成pytest配置
-        await self._generate_pytest_config()
-        
-        # 生成步骤定义文件
-        await self._generate_step_definitions(steps_dir)
-        
-    async def _generate_feature_files(self, test_case: TestCase, features_dir: str):
-        """生成feature文件"""
-        # 获取测试用例的feature文件
+            # 根据标签过滤（标签索引精确匹配）
+            query = query.filter(TestCase.id.in_(case_ids_with_any_tag(tags)))
+
+        case_ids = [case_id for case_id, in query.all()]
+        execution.total_cases = len(case_ids)
+
+        # 测试用例的feature文件（一次查询）
         feature_files = self.db.query(TestCaseFile).filter(
-            TestCaseFile.test_case_id == test_case.id,
+            TestCaseFile.test_case_id.in_(case_ids),
             TestCaseFile.file_type == 'feature',
             TestCaseFile.is_active == True
         ).all()
-        
-        for feature_file in feature_files:
-            file_path = os.path.join(features_dir, feature_file.full_name)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(feature_file.content or '')
-                
-    async def _generate_pytest_config(self):
-        """生成pytest配置文件"""
-        config_content = """
-[tool:pytest]
-addopts = 
-    --strict-markers
-    --strict-config
-    --verbose
-    --tb=short
-    --gherkin-terminal-reporter
-    --json-report
-    --json-report-file=test_results.json
-    
-markers =
-    smoke: Smoke tests
-    regression: Regression tests
-    api: API tests
-    ui: UI tests
-    
-bdd_features_base_dir = features/
-"""
-        
-        config_path = os.path.join(self.temp_dir, "pytest.ini")
-        with open(config_path, 'w', encoding='utf-8') as f:
-            f.write(config_content)
-            
-    async def _generate_step_definitions(self, steps_dir: str):
-        """生成步骤定义文件"""
-        # 这里可以从数据库中的Test Steps生成步骤定义
-        # 或者使用预定义的步骤定义文件
-        
-        step_content = '''
-"""
-Generated step definitions for QA Management System
-"""
-from pytest_bdd import given, when, then, parsers
-from playwright.sync_api import Page, expect
-
-
-@given(parsers.parse('I am on the {page_name} page'))
-def navigate_to_page(page: Page, page_name: str):
-    """Navigate to specified page"""
-    # Implementation based on page_name
-    pass
 
+        files = {f"features/{feature_file.full_name}": feature_file.content or '' for feature_file in feature_files}
+        files["pytest.ini"] = PYTEST_INI
+        files["step_definitions/test_steps.py"] = STEP_DEFINITIONS
+        files["step_definitions/conftest.py"] = BUNDLE_CONFTEST
+        shards = shard_count(execution.execution_config)
+        if shards > 1:
+            files.update(shard_files(self.db, shards))
+        return files
 
-@when(parsers.parse('I {action} {element}'))
-def perform_action(page: Page, action: str, element: str):
-    """Perform action on element"""
-    # Implementation based on action and element
-    pass
+    @staticmethod
+    def pytest_args(execution: TestExecution) -> List[str]:
+        """标签过滤和分片参数：pytest只认最后一个 -m，因此合并成一个表达式传入"""
+        args = shard_args(shard_count(execution.execution_config))
+        marker_expression = execution.execution_config.get('tag_expression')
+        if not marker_expression and execution.execution_config.get('tags'):
+            marker_expression = tags_to_expression(execution.execution_config['tags'])
+        if marker_expression:
+            args += ["-m", to_pytest_expression(parse_tag_expression(marker_expression))]
+        return args
 
+    @staticmethod
+    def pytest_env(execution: TestExecution) -> Dict[str, str]:
+        """浏览器类型和无头模式，以harness和执行包conftest读取的环境变量传入"""
+        config = execution.execution_config or {}
+        return {
+            "BROWSER": config.get("browser") or "chromium",
+            "HEADLESS": "true" if config.get("headless", True) else "false",
+        }
 
-@then(parsers.parse('I should see {expected_result}'))
-def verify_result(page: Page, expected_result: str):
-    """Verify expected result"""
-    # Implementation based on expected_result
-    pass
-'''
-        
-        step_file_path = os.path.join(steps_dir, "test_steps.py")
-        with open(step_file_path, 'w', encoding='utf-8') as f:
-            f.write(step_content)
-            
     async def _run_pytest(self, execution: TestExecution) -> Dict[str, Any]:
         """运行pytest"""
-        cmd = [
-            "python", "-m", "pytest",
+        args = [
             "--json-report",
             "--json-report-file=test_results.json",
             "-v",
@@ -212,21 +279,17 @@ def verify_result(page: Page, expected_result: str):
         ]
         
         # 添加标签过滤
-        if execution.execution_config.get('tags'):
-            tags = execution.execution_config['tags']
-            for tag in tags:
-                cmd.extend(["-m", tag])
-                
-        # 运行pytest
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            cwd=self.temp_dir,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        args.extend(self.pytest_args(execution))
+
+        # 运行pytest（有常驻worker时不启动新进程）
+        config = execution.execution_config or {}
+        env = self.pytest_env(execution)
+        result = await run_pytest(
+            args, cwd=self.temp_dir, env=env,
+            browser=env["BROWSER"] if env["HEADLESS"] == "true" else None,
+            sessions=shard_count(config),
         )
         
-        stdout, stderr = await process.communicate()
-        
         # 读取JSON报告
         results_file = os.path.join(self.temp_dir, "test_results.json")
         if os.path.exists(results_file):
@@ -236,11 +299,11 @@ def verify_result(page: Page, expected_result: str):
             return {
                 "summary": {"total": 0, "passed": 0, "failed": 0, "skipped": 0},
                 "tests": [],
-                "stdout": stdout.decode(),
-                "stderr": stderr.decode()
+                "stdout": result["stdout"],
+                "stderr": result["stderr"]
             }
             
-    async def _process_results(self, execution: TestExecution, result: Dict[str, Any]):
+    def process_results(self, execution: TestExecution, result: Dict[str, Any]):
         """处理测试结果"""
         summary = result.get("summary", {})
         
@@ -248,6 +311,9 @@ def verify_result(page: Page, expected_result: str):
         execution.passed_cases = summary.get("passed", 0)
         execution.failed_cases = summary.get("failed", 0)
         execution.skipped_cases = summary.get("skipped", 0)
+
+        # 各场景时长计入历史，供之后的分片执行均衡分配
+        record_durations(self.db, result.get("tests") or [])
         
         # 保存详细结果到execution_config
         execution.execution_config = {
@@ -0,0 +1,100 @@
+"""
+Sharding one execution across pytest-xdist workers
+
+An execution with ``execution_config["shards"] > 1`` runs as a single
+``pytest -n <shards> --dist loadgroup``: every xdist worker gets its own
+browser and one shard of the scenarios, and the results still come back
+as one report for the one ``TestExecution``.
+
+Shards are balanced with the per-scenario durations recorded from earlier
+runs (``scenario_durations``): the bundle carries them to
+``shard_plugin``, which partitions the collected scenarios at collection
+time, so no separate collection pass is needed (locally or on an agent).
+
+Without pytest-xdist installed (``-n`` is not a pytest option then) a
+sharded execution runs serially as one shard.
+"""
+import importlib.util
+import json
+import re
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.models.scenario_duration import ScenarioDuration
+from app.services import shard_plugin
+
+MAX_SHARDS = 32
+# 移动平均中最新一次执行的权重
+DURATION_WEIGHT = 0.3
+# 随执行文件下发的历史时长条数上限（最近更新的优先）
+MAX_BUNDLED_DURATIONS = 20000
+
+# --dist loadgroup 在报告的nodeid后追加 "@分组名"
+_GROUP_SUFFIX = re.compile(r"@shard\d+$")
+
+XDIST_AVAILABLE = importlib.util.find_spec("xdist") is not None
+
+
+def shard_count(config: Dict[str, Any]) -> int:
+    """执行的分片数；没有安装 pytest-xdist 时为1（串行执行）"""
+    if not XDIST_AVAILABLE:
+        return 1
+    return max(1, min(int((config or {}).get("shards") or 1), MAX_SHARDS))
+
+
+def shard_args(shards: int) -> List[str]:
+    """pytest-xdist 参数：每个worker一个分片"""
+    return ["-n", str(shards), "--dist", "loadgroup"] if shards > 1 else []
+
+
+def shard_files(db: Session, shards: int) -> Dict[str, str]:
+    """分片执行额外需要的文件：分片插件（conftest.py）和历史时长"""
+    with open(shard_plugin.__file__, encoding="utf-8") as f:
+        plugin_source = f.read()
+    rows = db.execute(
+        select(ScenarioDuration.nodeid, ScenarioDuration.avg_duration)
+        .order_by(ScenarioDuration.updated_at.desc())
+        .limit(MAX_BUNDLED_DURATIONS)
+    ).all()
+    return {
+        "conftest.py": plugin_source,
+        shard_plugin.DURATIONS_FILE: json.dumps({"shards": shards, "durations": dict(rows)}),
+    }
+
+
+def test_duration(test: Dict[str, Any]) -> float:
+    """报告中一个测试的时长：agent报告的 duration，或 pytest-json-report 各阶段之和"""
+    if test.get("duration") is not None:
+        return float(test["duration"])
+    return sum(float((test.get(phase) or {}).get("duration") or 0) for phase in ("setup", "call", "teardown"))
+
+
+def record_durations(db: Session, tests: Iterable[Dict[str, Any]]):
+    """把执行报告中通过/失败测试的时长计入移动平均（跳过的测试不计）"""
+    durations = {
+        _GROUP_SUFFIX.sub("", test["nodeid"]): test_duration(test)
+        for test in tests
+        if test.get("nodeid") and test.get("outcome") in ("passed", "failed")
+    }
+    if not durations:
+        return
+    statement = insert(ScenarioDuration)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ScenarioDuration.nodeid],
+            set_={
+                "avg_duration": ScenarioDuration.avg_duration * (1 - DURATION_WEIGHT)
+                + statement.excluded.last_duration * DURATION_WEIGHT,
+                "last_duration": statement.excluded.last_duration,
+                "samples": ScenarioDuration.samples + 1,
+                "updated_at": statement.excluded.updated_at,
+            },
+        ),
+        [
+            {"nodeid": nodeid, "avg_duration": duration, "last_duration": duration}
+            for nodeid, duration in durations.items()
+        ],
+    )
@@ -0,0 +1,217 @@
+"""
+In-process cache of serialized tree payloads
+
+Tree endpoints cache the JSON bytes of a response under
+``(resource, root, filters, projection)``. The cache is an LRU bounded by
+the total size of the payloads, shared by all requests of the process.
+
+Invalidation is write driven: Session events record which watched tables
+a transaction flushed (or bulk updated / deleted through the ORM), and
+on commit every entry built from those tables is dropped. Each table
+also has a generation counter; a build that overlapped a commit on one
+of its tables is returned but not stored, so a stale tree never enters
+the cache.
+
+Concurrent misses for the same key are coalesced: the first request
+builds the payload, the others await its result (singleflight).
+
+Writes that bypass the ORM Session (raw SQL, other processes) are picked
+up by the change feed (``app.services.change_feed``).
+"""
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from itertools import chain
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.change_feed import REVISION_TABLES
+from app.utils.serialization import dumps
+
+WATCHED_TABLES = frozenset(REVISION_TABLES)
+_PENDING_KEY = "tree_cache_tables"
+
+
+class TreeCache:
+    """按字节数限制的LRU缓存，按表失效"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_table: Dict[str, set] = defaultdict(set)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # 失效可能来自线程池中的同步会话
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = self.misses = self.coalesced = self.evictions = self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key: Hashable, payload: bytes, tables: Tuple[str, ...], generations: Tuple[int, ...]):
+        with self._lock:
+            if len(payload) > self.max_bytes or generations != self._generation_of(tables):
+                return
+            self._discard(key)
+            self._entries[key] = (payload, tables)
+            self.size += len(payload)
+            for table in tables:
+                self._keys_by_table[table].add(key)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        payload, tables = entry
+        self.size -= len(payload)
+        for table in tables:
+            self._keys_by_table[table].discard(key)
+
+    def _generation_of(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations[table] for table in tables)
+
+    def generation(self, table: str) -> int:
+        """表的失效计数：本进程提交或变更通知每次使该表失效时加一"""
+        return self._generations[table]
+
+    def invalidate(self, tables: Iterable[str]):
+        """丢弃依赖这些表的全部条目"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+                for key in list(self._keys_by_table.pop(table, ())):
+                    self._discard(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for table in list(self._generations):
+                self._generations[table] += 1
+            self._entries.clear()
+            self._keys_by_table.clear()
+            self.size = 0
+
+    async def get_or_build(
+        self, key: Hashable, tables: Iterable[str], build: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """
+        Return the cached payload of ``key`` or build it once.
+
+        ``tables`` are the tables the payload is read from; ``build`` returns
+        the serialized payload.
+        """
+        tables = tuple(sorted(tables))
+        while True:
+            payload = self.get(key)
+            if payload is not None:
+                self.hits += 1
+                return payload
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 构建请求被取消时由等待者重新构建；自身被取消则继续抛出
+                if not future.cancelled():
+                    raise
+
+        self.misses += 1
+        if self.max_bytes <= 0:
+            return await build()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        with self._lock:
+            generations = self._generation_of(tables)
+        try:
+            payload = await build()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # 没有等待者时不产生未读取异常的警告
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        self._put(key, payload, tables, generations)
+        future.set_result(payload)
+        return payload
+
+    async def response(
+        self, key: Hashable, tables: Iterable[str], build: Callable[[], Awaitable], headers=None
+    ) -> Response:
+        """缓存的JSON响应；build 返回未序列化的数据"""
+        async def build_payload():
+            return dumps(await build())
+
+        payload = await self.get_or_build(key, tables, build_payload)
+        return Response(content=payload, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+        }
+
+
+tree_cache = TreeCache(settings.TREE_CACHE_MAX_BYTES)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_tables(session, flush_context):
+    tables = {
+        obj.__table__.name
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if getattr(obj, "__table__", None) is not None and obj.__table__.name in WATCHED_TABLES
+    }
+    if tables:
+        session.info.setdefault(_PENDING_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_tables(orm_execute_state):
+    # ORM批量UPDATE/DELETE（如 deactivate_subtree）不经过flush
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in WATCHED_TABLES:
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tables(session):
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        tree_cache.invalidate(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_tables(session):
+    session.info.pop(_PENDING_KEY, None)
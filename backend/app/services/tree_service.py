@@ -0,0 +1,122 @@
+"""
+Tree loading helpers for self-referencing models (TestCase, TradeTemplate, TestDataNode)
+
+A whole subtree is fetched with one recursive CTE and assembled in memory
+from a parent -> children index, instead of issuing one query per node.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def subtree_cte(model, parent_id: Optional[int] = None, *criteria, name: str = "subtree", nesting: bool = False):
+    """
+    Build a recursive CTE selecting the ids of every node below ``parent_id``.
+
+    Args:
+        model: Mapped class with ``id`` and ``parent_id`` columns
+        parent_id: Parent node ID, None for the whole forest
+        criteria: Extra filters applied at every level (e.g. ``is_active``);
+            a node that fails them also hides its descendants
+        nesting: Render the CTE inside the enclosing subquery instead of
+            as a statement-level WITH prefix
+
+    Returns:
+        CTE with a single ``id`` column
+    """
+    if parent_id is None:
+        anchor_filter = model.parent_id.is_(None)
+    else:
+        anchor_filter = model.parent_id == parent_id
+
+    tree = select(model.id).where(anchor_filter, *criteria).cte(name, recursive=True, nesting=nesting)
+    tree = tree.union_all(
+        select(model.id).join(tree, model.parent_id == tree.c.id).where(*criteria)
+    )
+    return tree
+
+
+def load_subtree(db: Session, model, parent_id: Optional[int] = None, *criteria, order_by=()) -> List[Any]:
+    """Load all nodes below ``parent_id`` with a single query"""
+    tree = subtree_cte(model, parent_id, *criteria)
+    query = db.query(model).join(tree, model.id == tree.c.id)
+    if order_by:
+        query = query.order_by(*order_by)
+    return query.all()
+
+
+def build_tree(
+    nodes: List[Any],
+    serialize: Callable[[Any], Dict[str, Any]],
+    parent_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Assemble nested dicts from a flat node list.
+
+    ``nodes`` must already be in sibling order; each serialized node gets a
+    ``children`` list filled from the parent -> children index.
+    """
+    children_index = defaultdict(list)
+    for node in nodes:
+        children_index[node.parent_id].append(node)
+
+    def build_node(node):
+        node_dict = serialize(node)
+        node_dict["children"] = [build_node(child) for child in children_index.get(node.id, [])]
+        return node_dict
+
+    return [build_node(node) for node in children_index.get(parent_id, [])]
+
+
+def deactivate_subtree(db: Session, model, node_id: int) -> int:
+    """
+    Soft delete a node and its active descendants with one UPDATE.
+
+    Descendants are collected by a recursive CTE that only descends through
+    active nodes, so the cost does not depend on the depth of the tree. The
+    CTE is nested in the IN subquery so the statement still starts with
+    UPDATE and the driver reports its rowcount. ``updated_at`` is set
+    explicitly: ORM onupdate defaults do not apply to bulk UPDATEs, and
+    the conditional GET validators depend on it.
+
+    Returns:
+        Number of rows switched from active to inactive
+    """
+    tree = subtree_cte(model, node_id, model.is_active == True, nesting=True)
+    result = db.execute(
+        update(model)
+        .where(
+            or_(model.id == node_id, model.id.in_(select(tree.c.id))),
+            model.is_active == True,
+        )
+        .values(is_active=False, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def move_error(db: AsyncSession, model, node, parent_id: Optional[int]) -> Optional[str]:
+    """
+    Reason why ``node`` cannot be moved under ``parent_id``, or None.
+
+    The parent must exist and must not be the node itself or one of its
+    descendants: the materialized path would loop, and the ``after_update``
+    path listener refuses such a move inside the flush. Checked on the
+    indexed paths; rows without a path yet are checked up the parent chain.
+    """
+    if parent_id is None:
+        return None
+    ancestor = await db.get(model, parent_id)
+    if ancestor is None:
+        return f"Parent node {parent_id} not found"
+    if node.path and ancestor.path:
+        looped = ancestor.path.startswith(node.path)
+    else:
+        while ancestor is not None and ancestor.id != node.id:
+            ancestor = await db.get(model, ancestor.parent_id) if ancestor.parent_id is not None else None
+        looped = ancestor is not None
+    return "Cannot move a node under itself or its own descendant" if looped else None
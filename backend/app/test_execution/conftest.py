@@ -13,10 +13,16 @@ load_dotenv()
 def browser():
     """Create a browser instance for the entire test session."""
     with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=os.getenv("HEADLESS", "false").lower() == "true",
-            slow_mo=int(os.getenv("SLOW_MO", "0"))
-        )
+        ws_endpoint = os.getenv("PW_WS_ENDPOINT")
+        if ws_endpoint:
+            # 连接后端的共享浏览器服务或常驻pytest worker的浏览器服务（按BROWSER类型）；
+            # close() 只断开连接，服务继续运行
+            browser = getattr(p, os.getenv("BROWSER", "chromium")).connect(ws_endpoint)
+        else:
+            browser = p.chromium.launch(
+                headless=os.getenv("HEADLESS", "false").lower() == "true",
+                slow_mo=int(os.getenv("SLOW_MO", "0"))
+            )
         yield browser
         browser.close()
 
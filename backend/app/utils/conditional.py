@@ -0,0 +1,93 @@
+"""
+Conditional GET (ETag / Last-Modified) for tree and detail endpoints
+
+The validator of a response is computed from one aggregate query, not
+from the response body: ``count(*)`` and ``max(updated_at)`` over every
+table the response is built from (plus the request path and query
+string, since projection and filters change the representation). When
+the client's ``If-None-Match`` / ``If-Modified-Since`` still matches, the
+endpoint returns 304 before loading or serializing any ORM objects.
+
+Inserts and updates move ``max(updated_at)``; deletes change the count.
+Bulk UPDATEs must therefore set ``updated_at`` themselves (see
+``deactivate_subtree``).
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+
+class Validator:
+    """一个响应的 ETag 和 Last-Modified"""
+
+    def __init__(self, request: Request, parts, last_modified: Optional[datetime]):
+        digest = hashlib.sha1(
+            "|".join([settings.VERSION, request.url.path, str(request.query_params), *map(str, parts)]).encode()
+        ).hexdigest()
+        self.etag = f'W/"{digest[:32]}"'
+        self.last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc) if last_modified else None
+        self.request = request
+
+    @property
+    def headers(self):
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def is_not_modified(self) -> bool:
+        if_none_match = self.request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match 优先；弱比较，忽略 W/ 前缀
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+
+        if_modified_since = self.request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def respond(self, response: Response) -> Optional[Response]:
+        """客户端缓存仍有效时返回304响应，否则把校验头写入 response 并返回 None"""
+        if self.is_not_modified():
+            return Response(status_code=304, headers=self.headers)
+        response.headers.update(self.headers)
+        return None
+
+
+async def collection_validator(db: AsyncSession, request: Request, *scopes) -> Validator:
+    """
+    Validator over one or more table scopes, in a single query.
+
+    Each scope is a model, or a ``(model, criteria...)`` tuple restricting
+    the rows it covers.
+    """
+    columns = []
+    for scope in scopes:
+        model, *criteria = scope if isinstance(scope, tuple) else (scope,)
+        columns.append(select(func.count()).select_from(model).where(*criteria).scalar_subquery())
+        columns.append(select(func.max(model.updated_at)).where(*criteria).scalar_subquery())
+
+    row = (await db.execute(select(*columns))).one()
+    stamps = [value for value in row[1::2] if value is not None]
+    # 聚合值由SQLite以字符串返回时转换为datetime
+    stamps = [datetime.fromisoformat(value) if isinstance(value, str) else value for value in stamps]
+    return Validator(request, row, max(stamps) if stamps else None)
+
+
+async def row_validator(db: AsyncSession, request: Request, model, row_id: int) -> Optional[Validator]:
+    """Validator of a single row from its updated_at; None when the row does not exist"""
+    updated_at = (await db.execute(select(model.updated_at).where(model.id == row_id))).first()
+    if updated_at is None:
+        return None
+    return Validator(request, (model.__tablename__, row_id, updated_at[0]), updated_at[0])
@@ -0,0 +1,101 @@
+"""
+Keyset pagination helpers for list endpoints
+
+List endpoints keep returning a plain JSON array so existing clients work
+unchanged. Paging is opt-in: passing ``limit`` or ``cursor`` returns one
+page ordered by ``(created_at, id)`` newest first, with the token for the
+next page in the ``X-Next-Cursor`` response header. ``include_total=true``
+adds ``X-Total-Count``; the COUNT only runs when asked for.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(*values) -> str:
+    """把排序键编码为不透明的游标字符串"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """解码游标，格式不对时返回400"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+class PageParams:
+    """分页查询参数（作为依赖注入使用）"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE, description="Page size, enables paging"),
+        cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+        include_total: bool = Query(False, description="Return the total row count in X-Total-Count"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.include_total = include_total
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit is not None or self.cursor is not None
+
+
+async def paginate(
+    db: AsyncSession, query: Select, model, page: PageParams, response: Response, rows: bool = False
+) -> List[Any]:
+    """
+    Run ``query`` ordered by (created_at, id) descending, one page at a time.
+
+    The next page starts strictly after the last row of this one, so the
+    cost of a page does not grow with its position and rows inserted in
+    between do not shift pages the way OFFSET does.
+
+    With ``rows=True`` the query selects columns instead of an entity and
+    tuples are returned; it must select ``created_at`` and ``id`` under
+    those labels.
+    """
+    fetch = db.execute if rows else db.scalars
+    if page.include_total:
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if not page.enabled:
+        return (await fetch(query)).all()
+
+    if not rows:
+        # 游标需要created_at，即使字段投影没有选中它
+        query = query.options(undefer(model.created_at))
+    if page.cursor:
+        created_at, row_id = decode_cursor(page.cursor, 2)
+        try:
+            after = (datetime.fromisoformat(created_at), int(row_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(model.created_at, model.id) < after)
+
+    limit = page.limit or settings.DEFAULT_PAGE_SIZE
+    results = (await fetch(query.limit(limit + 1))).all()
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at.isoformat(), last.id)
+    return results
@@ -0,0 +1,106 @@
+"""
+Response field projection for list and tree endpoints
+
+A ``FieldSet`` describes the response fields of one resource: how each
+field is computed from the ORM object and which columns it reads. From
+the ``fields=`` / ``include=`` query parameters it derives both the
+``load_only`` option for the SQL query and the dict returned per row, so
+a field that is not requested is neither selected nor serialized.
+
+- ``fields=a,b``   return exactly these fields (``id`` is always kept)
+- ``include=c,d``  return the lightweight defaults plus these fields
+
+Nested resources use a prefix, e.g. ``include=files.content`` on the
+test case tree.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Query
+from sqlalchemy.orm import load_only
+
+FieldSpec = Union[None, Callable[[Any], Any], Tuple[Callable[[Any], Any], Tuple[str, ...]]]
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def parse_field_list(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class ProjectionParams:
+    """字段投影查询参数（作为依赖注入使用）"""
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma separated fields to return instead of the defaults"),
+        include: Optional[str] = Query(None, description="Comma separated fields to add to the defaults"),
+    ):
+        self.fields = parse_field_list(fields)
+        self.include = parse_field_list(include) or []
+
+    def nested(self, prefix: str) -> "ProjectionParams":
+        """取出带前缀（如 "files."）的字段，作为嵌套资源的投影参数"""
+        nested = ProjectionParams.__new__(ProjectionParams)
+        marker = prefix + "."
+        nested.fields = None
+        if self.fields is not None:
+            nested.fields = [name[len(marker):] for name in self.fields if name.startswith(marker)] or None
+        nested.include = [name[len(marker):] for name in self.include if name.startswith(marker)]
+        return nested
+
+    def own(self, prefixes: Iterable[str] = ()) -> "ProjectionParams":
+        """去掉嵌套资源的字段，只保留本资源的"""
+        markers = tuple(prefix + "." for prefix in prefixes)
+        own = ProjectionParams.__new__(ProjectionParams)
+        own.fields = None if self.fields is None else [name for name in self.fields if not name.startswith(markers)]
+        own.include = [name for name in self.include if not name.startswith(markers)]
+        return own
+
+
+class FieldSet:
+    """
+    Response fields of one resource.
+
+    ``fields`` maps a response field to ``None`` (plain column of the same
+    name), a getter (reads the column of the same name) or
+    ``(getter, columns)`` for computed fields.
+    """
+
+    def __init__(self, model, fields: Dict[str, FieldSpec], default: Iterable[str]):
+        self.model = model
+        self.getters = {}
+        self.columns = {}
+        for name, spec in fields.items():
+            if spec is None:
+                self.getters[name] = lambda obj, name=name: getattr(obj, name)
+                self.columns[name] = (name,)
+            elif callable(spec):
+                self.getters[name] = spec
+                self.columns[name] = (name,)
+            else:
+                self.getters[name], self.columns[name] = spec
+        self.default = list(default)
+
+    def resolve(self, params: ProjectionParams) -> List[str]:
+        """根据查询参数确定返回字段，未知字段返回400"""
+        requested = params.fields if params.fields else self.default + params.include
+        unknown = [name for name in requested if name not in self.getters]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        selected = ["id"] if "id" in self.getters else []
+        selected += [name for name in self.getters if name in requested and name not in selected]
+        return selected
+
+    def load_only(self, selected: Iterable[str], *extra_columns: str):
+        """只加载所选字段需要的列，其余列延迟加载"""
+        names = {"id", *extra_columns}
+        for field in selected:
+            names.update(self.columns[field])
+        return load_only(*(getattr(self.model, name) for name in sorted(names)))
+
+    def serialize(self, obj, selected: Iterable[str]) -> Dict[str, Any]:
+        return {name: self.getters[name](obj) for name in selected}
@@ -0,0 +1,106 @@
+"""
+列表响应序列化测试 - ORM对象逐行构建字典 vs 列元组 + orjson
+
+生成指定数量的执行记录，比较 GET /test-executions/ 全量列表的查询+序列化耗时：
+
+- dict:  select(TestExecution) 加载ORM对象，逐行构建字典（isoformat/.value），
+         再经 jsonable_encoder + json.dumps（FastAPI 默认 JSONResponse 的路径）
+- rows:  TEST_EXECUTION_ROWS 按列取元组，zip 成字典后由 orjson 序列化
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api.api_v1.endpoints.test_executions_simplified import TEST_EXECUTION_ROWS
+from app.core.database import Base
+from app.models import ExecutionStatus, TestExecution
+from app.utils.serialization import dumps
+
+
+def seed_database(engine, rows: int):
+    Base.metadata.create_all(bind=engine)
+    base = datetime(2024, 1, 1)
+    statuses = list(ExecutionStatus)
+    with engine.begin() as connection:
+        connection.execute(insert(TestExecution), [
+            {
+                "name": f"execution-{i}",
+                "description": "nightly regression" if i % 3 else None,
+                "status": statuses[i % len(statuses)],
+                "progress": i % 100,
+                "executor_id": 1,
+                "execution_config": {"environment": "staging", "browser": "chromium", "headless": True},
+                "created_at": base + timedelta(seconds=i),
+                "updated_at": base + timedelta(seconds=i),
+            }
+            for i in range(rows)
+        ])
+
+
+def dict_path(db) -> bytes:
+    result = []
+    for execution in db.scalars(select(TestExecution)).all():
+        config = execution.execution_config or {}
+        result.append({
+            "id": execution.id,
+            "name": execution.name,
+            "description": execution.description or "",
+            "test_case_ids": [],
+            "status": execution.status.value if hasattr(execution.status, "value") else str(execution.status),
+            "progress": execution.progress or 0,
+            "pass_rate": 0,
+            "environment": config.get("environment", "test"),
+            "browser": config.get("browser", "chromium"),
+            "headless": config.get("headless", True),
+            "executor": "system",
+            "executed_at": execution.created_at.isoformat() if execution.created_at else None,
+            "created_at": execution.created_at.isoformat() if execution.created_at else None,
+            "updated_at": execution.updated_at.isoformat() if execution.updated_at else None,
+        })
+    return json.dumps(jsonable_encoder(result), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def rows_path(db) -> bytes:
+    return dumps(TEST_EXECUTION_ROWS.to_dicts(db.execute(TEST_EXECUTION_ROWS.select()).all()))
+
+
+def timed(session_factory, path, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        with session_factory() as db:
+            started = time.perf_counter()
+            body = path(db)
+            samples.append((time.perf_counter() - started) * 1000)
+    return len(body), round(statistics.median(samples), 2)
+
+
+def main(rows: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'serialization.db'}")
+        seed_database(engine, rows)
+        session_factory = sessionmaker(bind=engine)
+        with session_factory() as db:
+            assert json.loads(dict_path(db)) == json.loads(rows_path(db))
+        for label, path in (("dict", dict_path), ("rows", rows_path)):
+            size, median_ms = timed(session_factory, path, repeat)
+            print(f"{label:>4}: bytes={size} median_ms={median_ms}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List serialization: ORM dicts vs column tuples + orjson")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,125 @@
+"""
+并发读写测试 - SQLite默认配置 vs 生产配置档
+
+多个写线程模拟执行结果回写（插入用例并提交），多个读线程同时加载
+用例树，统计两种配置下的吞吐、延迟和 "database is locked" 错误数：
+
+- default:    create_engine 默认设置（回滚日志，写线程直接争抢文件锁）
+- production: WAL + synchronous=NORMAL + 单写连接 + query_only 读连接池
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_sqlite_profile --seconds 5 --writers 4 --readers 4
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, RoutingSession, create_sqlite_engines
+from app.models import TestCase
+from app.services.tree_service import subtree_cte
+
+
+def seed_database(engine, nodes: int):
+    """生成初始用例数据"""
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        root = TestCase(name="root", is_folder=True, creator_id=1)
+        db.add(root)
+        db.flush()
+        db.add_all(TestCase(name=f"case-{i}", parent_id=root.id, creator_id=1) for i in range(nodes))
+        db.commit()
+
+
+def make_session_factory(profile: str, url: str):
+    if profile == "production":
+        writer, reader = create_sqlite_engines(url, connect_args={"check_same_thread": False})
+        return sessionmaker(class_=RoutingSession, writer=writer, reader=reader), [writer, reader]
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return sessionmaker(bind=engine), [engine]
+
+
+def run_profile(profile: str, url: str, seconds: float, writers: int, readers: int):
+    Session, engines = make_session_factory(profile, url)
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"write": [], "read": [], "errors": 0}
+
+    def record(kind, started):
+        with lock:
+            stats[kind].append((time.perf_counter() - started) * 1000)
+
+    def writer_loop(worker_id):
+        n = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.add(TestCase(name=f"result-{worker_id}-{n}", creator_id=1))
+                    db.commit()
+                record("write", started)
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+            n += 1
+
+    def reader_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    tree = subtree_cte(TestCase)
+                    db.execute(select(TestCase.id, TestCase.name).join(tree, TestCase.id == tree.c.id)).all()
+                record("read", started)
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+
+    threads = [threading.Thread(target=writer_loop, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader_loop) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for engine in engines:
+        engine.dispose()
+
+    def summary(samples):
+        samples.sort()
+        if not samples:
+            return {"ops_per_s": 0}
+        return {
+            "ops_per_s": round(len(samples) / seconds, 1),
+            "p50_ms": round(statistics.median(samples), 2),
+            "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 2),
+        }
+
+    return {"writes": summary(stats["write"]), "reads": summary(stats["read"]), "locked_errors": stats["errors"]}
+
+
+def main(seconds: float, writers: int, readers: int, nodes: int):
+    for profile in ("default", "production"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            url = f"sqlite:///{Path(tmp_dir) / 'profile.db'}"
+            seed_engine = create_engine(url)
+            seed_database(seed_engine, nodes)
+            seed_engine.dispose()
+            print(f"{profile:>10}: {run_profile(profile, url, seconds, writers, readers)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent read/write: default SQLite vs production profile")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--nodes", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.seconds, args.writers, args.readers, args.nodes)
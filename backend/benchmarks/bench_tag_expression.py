@@ -0,0 +1,74 @@
+"""
+标签表达式选择测试 - LIKE 扫描 vs 标签索引集合运算
+
+生成指定数量的带标签用例，比较按标签表达式选取用例的耗时：
+
+- like:  在 test_cases.tags 字符串上做 LIKE '%tag%'（旧实现方式，全表扫描且会误匹配）
+- index: compile_tag_expression 编译出的 INTERSECT/UNION/EXCEPT 索引查询
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_tag_expression --cases 20000
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import and_, create_engine, not_, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import TestCase
+from app.services.tag_expression import compile_tag_expression
+
+EXPRESSION = "smoke and not slow or (api and regression)"
+VOCABULARY = ["smoke", "slow", "api", "regression", "ui", "nosmoke", "payments", "login", "search", "checkout"]
+
+
+def seed_database(engine, cases: int):
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    with sessionmaker(bind=engine)() as db:
+        for i in range(cases):
+            tags = ",".join(rng.sample(VOCABULARY, rng.randint(0, 4)))
+            db.add(TestCase(name=f"case-{i}", tags=tags, creator_id=1))
+        db.commit()
+
+
+def like_query():
+    def has(tag):
+        return TestCase.tags.like(f"%{tag}%")
+    return select(TestCase.id).where(or_(
+        and_(has("smoke"), not_(has("slow"))),
+        and_(has("api"), has("regression")),
+    ))
+
+
+def timed(db, query, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        ids = db.scalars(query).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return len(ids), round(statistics.median(samples), 2)
+
+
+def main(cases: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'tags.db'}")
+        seed_database(engine, cases)
+        with sessionmaker(bind=engine)() as db:
+            for label, query in (("like", like_query()), ("index", compile_tag_expression(EXPRESSION))):
+                matched, median_ms = timed(db, query, repeat)
+                print(f"{label:>5}: matched={matched} median_ms={median_ms}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag expression selection: LIKE scan vs tag index")
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.cases, args.repeat)
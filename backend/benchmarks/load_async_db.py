@@ -0,0 +1,155 @@
+"""
+并发负载测试 - 同步会话 vs 异步会话
+
+在同一个事件循环中并发发起树形查询，同时按固定节拍请求 /health，
+比较两种数据库访问方式下轻量请求的延迟（从计划发送时刻算起）：
+
+- sync:  async def 端点内直接使用同步 Session（旧实现方式，查询阻塞事件循环）
+- async: 使用 AsyncSession 的 /test-cases/tree 端点
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.load_async_db --nodes 5000 --concurrency 8
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, get_async_db
+from app.models import TestCase
+from app.api.api_v1.endpoints import test_cases_simplified
+from app.services.tree_service import subtree_cte, build_tree
+
+
+def seed_database(db_path: Path, nodes: int, fanout: int = 10):
+    """生成指定数量节点的测试用例树"""
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        level = [None]
+        created = 0
+        while created < nodes:
+            next_level = []
+            for parent in level:
+                for i in range(fanout):
+                    if created >= nodes:
+                        break
+                    case = TestCase(
+                        name=f"case-{created}",
+                        parent_id=parent.id if parent else None,
+                        is_folder=True,
+                        gherkin_content="Feature: demo\n  Scenario: demo\n    Given a step\n",
+                        creator_id=1,
+                    )
+                    db.add(case)
+                    next_level.append(case)
+                    created += 1
+            db.flush()
+            level = next_level
+        db.commit()
+    return engine
+
+
+def build_app(db_path: Path, sync_engine):
+    """组装测试应用：真实的异步树端点 + 同步会话对照端点"""
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    AsyncTestSession = async_sessionmaker(async_engine, expire_on_commit=False)
+    SyncTestSession = sessionmaker(bind=sync_engine)
+
+    app = FastAPI()
+    app.include_router(test_cases_simplified.router, prefix="/async")
+
+    async def override_get_async_db():
+        async with AsyncTestSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    @app.get("/sync/tree")
+    async def sync_tree():
+        # 旧实现方式：在 async def 中调用同步 Session
+        with SyncTestSession() as db:
+            tree = subtree_cte(TestCase)
+            cases = db.scalars(
+                select(TestCase).join(tree, TestCase.id == tree.c.id).order_by(TestCase.sort_order)
+            ).all()
+            return build_tree(cases, lambda c: {"id": c.id, "name": c.name, "gherkin_content": c.gherkin_content})
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app, async_engine
+
+
+async def measure(client: httpx.AsyncClient, tree_url: str, concurrency: int, rounds: int):
+    """并发请求树形端点，同时测量 /health 的延迟"""
+    done = asyncio.Event()
+    ping_latencies = []
+
+    async def pinger():
+        # 按固定节拍发送请求，延迟从计划发送时刻算起，事件循环被阻塞的时间也会计入
+        interval = 0.01
+        scheduled = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await client.get("/health")
+            ping_latencies.append((time.perf_counter() - scheduled) * 1000)
+            scheduled = max(scheduled + interval, time.perf_counter())
+
+    async def tree_worker():
+        for _ in range(rounds):
+            response = await client.get(tree_url)
+            response.raise_for_status()
+
+    ping_task = asyncio.create_task(pinger())
+    started = time.perf_counter()
+    await asyncio.gather(*(tree_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ping_task
+
+    ping_latencies.sort()
+    return {
+        "tree_requests": concurrency * rounds,
+        "elapsed_s": round(elapsed, 2),
+        "health_samples": len(ping_latencies),
+        "health_p50_ms": round(statistics.median(ping_latencies), 2) if ping_latencies else None,
+        "health_p95_ms": round(ping_latencies[int(len(ping_latencies) * 0.95) - 1], 2) if ping_latencies else None,
+        "health_max_ms": round(ping_latencies[-1], 2) if ping_latencies else None,
+    }
+
+
+async def main(nodes: int, concurrency: int, rounds: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "load_test.db"
+        sync_engine = seed_database(db_path, nodes)
+        app, async_engine = build_app(db_path, sync_engine)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, url in (("sync", "/sync/tree"), ("async", "/async/tree")):
+                await client.get(url)  # 预热
+                result = await measure(client, url, concurrency, rounds)
+                print(f"{label:>5}: {result}")
+
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent latency: sync Session vs AsyncSession")
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.nodes, args.concurrency, args.rounds))
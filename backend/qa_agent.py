@@ -0,0 +1,293 @@
+"""
+远程执行agent
+
+Runs queued playwright executions of the QA management server on this
+machine, so runs scale across machines instead of one API process:
+
+1. claim the next job over HTTP (``POST /agents/claim``), holding its lease;
+2. write the job's files (features, pytest.ini, step definitions) into a
+   fresh temp directory;
+3. run pytest there, sending each finished test back as it completes and
+   heartbeating the lease in between;
+4. complete the job with the run report (or an error, which is retried).
+
+If the lease is lost (the agent stalled longer than the lease and the job
+was given to someone else), pytest is stopped and the result discarded.
+Only the standard library is used; the machine needs pytest and the test
+dependencies (pytest-bdd, playwright) but not the server code.
+
+Usage::
+
+    python qa_agent.py --api http://qa-server:8000/api/v1
+
+Start it several times (on one machine or many) to run jobs in parallel.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("qa_agent")
+
+# 写入工作目录的pytest插件：每个测试结束时把结果追加到 $QA_AGENT_RESULTS（每行一个JSON）
+RESULTS_PLUGIN = '''
+import json
+import os
+
+
+def pytest_runtest_logreport(report):
+    # call阶段的结果；setup失败/跳过和teardown失败单独计入
+    if report.when == "call" or (report.when == "setup" and not report.passed) or (
+        report.when == "teardown" and report.failed
+    ):
+        outcome = "error" if report.when != "call" and report.failed else report.outcome
+        line = json.dumps({
+            "nodeid": report.nodeid,
+            "outcome": outcome,
+            "duration": report.duration,
+            "longrepr": str(report.longrepr) if report.longrepr else None,
+        })
+        with open(os.environ["QA_AGENT_RESULTS"], "a", encoding="utf-8") as f:
+            f.write(line + "\\n")
+'''
+
+# pytest退出码：0 全部通过，1 有失败，5 没有收集到测试 —— 都是完成的执行
+COMPLETED_EXIT_CODES = (0, 1, 5)
+
+
+class LeaseLost(Exception):
+    """服务端返回409：任务已不属于本agent"""
+
+
+class _Response:
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _HttpClient:
+    """标准库实现的JSON POST（与 requests/httpx 的 post 接口相同）"""
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+
+    def post(self, url: str, json: Dict[str, Any] = None) -> _Response:
+        request = urllib.request.Request(
+            url,
+            data=_dumps(json),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return _Response(response.status, response.read())
+        except urllib.error.HTTPError as e:
+            return _Response(e.code, e.read())
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload or {}).encode()
+
+
+def write_files(directory: str, files: Dict[str, str]):
+    """把任务文件写入目录（拒绝目录外的路径）"""
+    root = os.path.realpath(directory)
+    for relative_path, content in files.items():
+        path = os.path.realpath(os.path.join(root, relative_path))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Bundle path escapes the work directory: {relative_path}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def run_pytest(
+    directory: str,
+    args: List[str],
+    on_results: Callable[[List[Dict[str, Any]]], None],
+    on_idle: Callable[[], None] = lambda: None,
+    poll_interval: float = 0.5,
+    extra_env: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Run pytest in ``directory`` and return the report
+    ``{"summary", "tests", "exitcode"}``. Finished tests are passed to
+    ``on_results`` as they come in, ``on_idle`` is called when a poll found
+    nothing new. ``extra_env`` (browser type, headless) is added to the
+    environment. If a callback raises, pytest is terminated and the
+    exception propagates.
+    """
+    write_files(directory, {"qa_agent_results.py": RESULTS_PLUGIN})
+    results_path = os.path.join(directory, ".qa_agent_results.ndjson")
+    log_path = os.path.join(directory, ".qa_agent_pytest.log")
+    open(results_path, "w").close()
+    env = {
+        **os.environ,
+        **(extra_env or {}),
+        "QA_AGENT_RESULTS": results_path,
+        "PYTHONPATH": os.pathsep.join(filter(None, [directory, os.environ.get("PYTHONPATH")])),
+    }
+
+    tests: List[Dict[str, Any]] = []
+    with open(log_path, "wb") as log, open(results_path, encoding="utf-8") as results:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "pytest", "-p", "qa_agent_results", *args, directory],
+            cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        pending = ""
+        try:
+            while True:
+                exitcode = process.poll()
+                # 只处理完整的行，写了一半的行留到下一轮
+                pending += results.read()
+                *lines, pending = pending.split("\n")
+                batch = [json.loads(line) for line in lines if line.strip()]
+                if batch:
+                    tests.extend(batch)
+                    on_results(batch)
+                elif exitcode is None:
+                    on_idle()
+                if exitcode is not None:
+                    break
+                time.sleep(poll_interval)
+        finally:
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+
+    outcomes = [test["outcome"] for test in tests]
+    report = {
+        "summary": {
+            "total": len(tests),
+            "passed": outcomes.count("passed"),
+            "failed": outcomes.count("failed") + outcomes.count("error"),
+            "skipped": outcomes.count("skipped"),
+        },
+        "tests": tests,
+        "exitcode": exitcode,
+    }
+    if exitcode not in COMPLETED_EXIT_CODES:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            report["output"] = f.read()[-4000:]
+    return report
+
+
+class Agent:
+    """从服务端领取并执行任务的agent"""
+
+    def __init__(
+        self,
+        api_url: str,
+        agent_id: Optional[str] = None,
+        http=None,
+        lease_seconds: int = 60,
+        poll_interval: float = 5.0,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.agent_id = agent_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.http = http or _HttpClient()
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._last_contact = 0.0
+
+    def _post(self, path: str, payload: Dict[str, Any]):
+        response = self.http.post(f"{self.api_url}{path}", json={"agent_id": self.agent_id, **payload})
+        if response.status_code == 409:
+            raise LeaseLost(response.json().get("detail"))
+        if response.status_code >= 400:
+            raise RuntimeError(f"POST {path} failed with {response.status_code}: {response.content[:500]!r}")
+        self._last_contact = time.monotonic()
+        return response
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """领取一个任务，没有时返回None"""
+        response = self._post("/agents/claim", {"kinds": ["playwright"], "lease_seconds": self.lease_seconds})
+        return None if response.status_code == 204 else response.json()
+
+    def run_job(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """执行领取的任务并提交结果；租约丢失时返回None"""
+        job_path = f"/agents/jobs/{job['job_id']}"
+        lease = {"lease_seconds": self.lease_seconds}
+
+        def send_results(batch):
+            self._post(f"{job_path}/results", {**lease, "results": batch})
+
+        def heartbeat():
+            if time.monotonic() - self._last_contact >= job["heartbeat_interval"]:
+                self._post(f"{job_path}/heartbeat", lease)
+
+        logger.info("Running execution %s (job %s)", job["execution_id"], job["job_id"])
+        try:
+            with tempfile.TemporaryDirectory(prefix="qa_agent_") as directory:
+                write_files(directory, job["files"])
+                report = run_pytest(directory, job["pytest_args"], send_results, heartbeat,
+                                    extra_env=job.get("env"))
+            if report["exitcode"] in COMPLETED_EXIT_CODES:
+                outcome = {"report": report}
+            else:
+                outcome = {"error": f"pytest exited with {report['exitcode']}: {report.get('output', '')[-1000:]}"}
+        except LeaseLost:
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed", job["job_id"])
+            outcome = {"error": f"{type(e).__name__}: {e}"}
+        return self._post(f"{job_path}/complete", outcome).json()
+
+    def run_once(self) -> bool:
+        """领取并执行一个任务；队列为空时返回False"""
+        job = self.claim()
+        if job is None:
+            return False
+        try:
+            self.run_job(job)
+        except LeaseLost as e:
+            logger.warning("Abandoned job %s: %s", job["job_id"], e)
+        return True
+
+    def run_forever(self, max_jobs: Optional[int] = None):
+        done = 0
+        while max_jobs is None or done < max_jobs:
+            try:
+                if self.run_once():
+                    done += 1
+                    continue
+            except (OSError, RuntimeError) as e:
+                # 服务端不可用时等待后重试
+                logger.warning("Agent %s: %s", self.agent_id, e)
+            time.sleep(self.poll_interval)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="QA management remote execution agent")
+    parser.add_argument("--api", default=os.environ.get("QA_API_URL", "http://localhost:8000/api/v1"),
+                        help="API base URL (default: $QA_API_URL)")
+    parser.add_argument("--agent-id", help="Unique agent name (default: hostname:pid)")
+    parser.add_argument("--lease-seconds", type=int, default=60)
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds between claims when idle")
+    parser.add_argument("--max-jobs", type=int, help="Exit after running this many jobs")
+    options = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    agent = Agent(options.api, options.agent_id, lease_seconds=options.lease_seconds,
+                  poll_interval=options.poll_interval)
+    logger.info("Agent %s polling %s", agent.agent_id, agent.api_url)
+    try:
+        agent.run_forever(options.max_jobs)
+    except KeyboardInterrupt:
+        # 正在执行的任务不提交，租约过期后由服务端重新排队
+        pass
+
+
+if __name__ == "__main__":
+    main()
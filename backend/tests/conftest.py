@@ -0,0 +1,42 @@
+"""
+测试公共fixture
+"""
+import os
+
+# 测试不启动跨进程变更通知轮询和执行队列worker（需在导入应用前设置）
+os.environ.setdefault("CHANGE_FEED_POLL_INTERVAL", "0")
+os.environ.setdefault("EXECUTION_WORKERS", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, get_async_db
+from app.main import app
+from app.models import *
+from app.services.tree_cache import tree_cache
+
+
+@pytest.fixture
+def client(tmp_path):
+    """使用临时文件数据库的测试客户端，返回 (客户端, 同步会话)"""
+    db_url = f"{tmp_path}/api.db"
+    sync_engine = create_engine(f"sqlite:///{db_url}")
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_url}")
+
+    async def override_get_async_db():
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    tree_cache.clear()
+    db = sessionmaker(bind=sync_engine)()
+    try:
+        with TestClient(app) as test_client:
+            yield test_client, db
+    finally:
+        app.dependency_overrides.clear()
+        db.close()
+        sync_engine.dispose()
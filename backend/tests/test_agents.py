@@ -0,0 +1,87 @@
+"""
+远程执行agent测试
+"""
+from app.models import *
+from app.services.job_queue import enqueue
+import qa_agent
+
+
+def _queue(db, *priorities):
+    executions = [TestExecution(name=f"run {i}", executor_id=1) for i in range(len(priorities))]
+    db.add_all(executions)
+    db.commit()
+    for execution, priority in zip(executions, priorities):
+        enqueue(db, execution.id, priority=priority)
+    return [execution.id for execution in executions]
+
+
+def test_agent_lease_protocol(client):
+    """测试多个agent按优先级领取不同任务、结果回传更新进度、租约归属校验"""
+    test_client, db = client
+    first, urgent = _queue(db, 0, 5)
+
+    claimed = test_client.post("/api/v1/agents/claim", json={"agent_id": "a1", "lease_seconds": 30}).json()
+    assert claimed["execution_id"] == urgent
+    assert "pytest.ini" in claimed["files"] and claimed["heartbeat_interval"] == 10
+    other = test_client.post("/api/v1/agents/claim", json={"agent_id": "a2"}).json()
+    assert other["execution_id"] == first
+    assert test_client.post("/api/v1/agents/claim", json={"agent_id": "a3"}).status_code == 204
+    assert test_client.post("/api/v1/agents/claim", json={"agent_id": "a3", "kinds": ["engine"]}).status_code == 204
+
+    job_path = f"/api/v1/agents/jobs/{claimed['job_id']}"
+    assert test_client.post(f"{job_path}/heartbeat", json={"agent_id": "a2"}).status_code == 409
+    assert test_client.post(f"{job_path}/heartbeat", json={"agent_id": "a1"}).status_code == 200
+
+    results = [{"nodeid": "t::a", "outcome": "passed"}, {"nodeid": "t::b", "outcome": "failed"}]
+    assert test_client.post(f"{job_path}/results", json={"agent_id": "a1", "results": results}).json()["received"] == 2
+    db.expire_all()
+    execution = db.get(TestExecution, urgent)
+    assert (execution.status, execution.passed_cases, execution.failed_cases) == (ExecutionStatus.RUNNING, 1, 1)
+    assert execution.progress == 100.0 and len(execution.execution_config["live_results"]) == 2
+
+    report = {"summary": {"total": 2, "passed": 1, "failed": 1, "skipped": 0}, "tests": results}
+    assert test_client.post(f"{job_path}/complete", json={"agent_id": "a1"}).status_code == 400
+    assert test_client.post(f"{job_path}/complete", json={"agent_id": "a1", "report": report}).json()["status"] == "succeeded"
+    assert test_client.post(f"{job_path}/heartbeat", json={"agent_id": "a1"}).status_code == 409
+
+    # 执行失败按队列规则重试，执行回到待执行
+    other_path = f"/api/v1/agents/jobs/{other['job_id']}"
+    assert test_client.post(f"{other_path}/complete", json={"agent_id": "a2", "error": "exit 3"}).json()["status"] == "queued"
+    db.expire_all()
+    assert db.get(TestExecution, urgent).status == ExecutionStatus.COMPLETED
+    assert db.get(TestExecution, first).status == ExecutionStatus.PENDING
+
+
+def test_agent_runs_job_and_streams_results(client):
+    """测试agent在本地目录运行pytest，逐条回传结果并提交报告"""
+    test_client, db = client
+    execution_id = _queue(db, 0)[0]
+    agent = qa_agent.Agent("/api/v1", agent_id="local-1", http=test_client, lease_seconds=30)
+
+    job = agent.claim()
+    streamed = []
+    send = test_client.post
+
+    def post(url, json=None):
+        if url.endswith("/results"):
+            streamed.extend(result["outcome"] for result in json["results"])
+        return send(url, json=json)
+
+    agent.http = type("Recorder", (), {"post": staticmethod(post)})()
+    job["files"] = {
+        "test_sample.py": "import pytest\n\n"
+                          "def test_ok():\n    assert True\n\n"
+                          "def test_broken():\n    assert False\n\n"
+                          "@pytest.mark.skip\ndef test_skipped():\n    pass\n",
+    }
+    job["pytest_args"] = []
+    assert agent.run_job(job)["status"] == "succeeded"
+
+    assert sorted(streamed) == ["failed", "passed", "skipped"]
+    db.expire_all()
+    execution = db.get(TestExecution, execution_id)
+    assert execution.status == ExecutionStatus.COMPLETED
+    assert (execution.total_cases, execution.passed_cases, execution.failed_cases, execution.skipped_cases) == (3, 1, 1, 1)
+    assert execution.execution_config["test_results"]["exitcode"] == 1
+    assert "live_results" not in execution.execution_config
+    assert agent.run_once() is False
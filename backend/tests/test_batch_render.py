@@ -0,0 +1,147 @@
+"""
+批量渲染接口测试
+"""
+import io
+import json
+import zipfile
+import pytest
+from app.models import *
+
+
+@pytest.fixture
+def trade_template(client):
+    test_client, db = client
+    template = TradeTemplate(
+        name="swap", node_type=TemplateNodeType.TEMPLATE,
+        jinja2_content=(
+            "<trade><id>{{ id }}</id><ccy>{{ ccy }}</ccy><cp>{{ party.name }}</cp>"
+            "<notional>{{ '%.2f' | format(notional) }}</notional></trade>"
+        ),
+        template_variables={"ccy": "USD", "party": {"name": "ACME"}, "notional": 1000000},
+    )
+    db.add(template)
+    db.commit()
+    return test_client, template.id
+
+
+def test_batch_render_ndjson_with_item_errors(trade_template):
+    """测试JSON数组和NDJSON输入，单条失败不影响其他条目，结果按输入顺序返回"""
+    test_client, template_id = trade_template
+    response = test_client.post(
+        f"/api/v1/trade-templates/{template_id}/render/batch",
+        json=[{"id": 1}, {"id": 2, "ccy": "EUR"}, "not-an-object", {"id": 4, "notional": "n/a"}],
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert lines[0]["rendered_content"] == (
+        "<trade><id>1</id><ccy>USD</ccy><cp>ACME</cp><notional>1000000.00</notional></trade>"
+    )
+    assert "<ccy>EUR</ccy>" in lines[1]["rendered_content"]
+    assert lines[2]["error"] == "Variables must be a JSON object"
+    assert lines[3]["error"].startswith("TypeError")
+
+    body = b'{"id": 1}\n{broken\n\n{"id": 3}'
+    response = test_client.post(
+        f"/api/v1/trade-templates/{template_id}/render/batch?workers=2",
+        content=body, headers={"Content-Type": "application/x-ndjson"},
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [("error" in line) for line in lines] == [False, True, False]
+    assert lines[2]["rendered_content"].startswith("<trade><id>3</id>")
+
+    assert test_client.post(
+        f"/api/v1/trade-templates/{template_id}/render/batch", json={"id": 1}
+    ).status_code == 400
+
+
+def test_batch_render_zip(trade_template):
+    """测试zip输出：每条结果一个文件，失败条目写入 errors.ndjson"""
+    test_client, template_id = trade_template
+    response = test_client.post(
+        f"/api/v1/trade-templates/{template_id}/render/batch?format=zip",
+        json=[{"id": i} for i in range(3)] + [[]],
+    )
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["000000.xml", "000001.xml", "000002.xml", "errors.ndjson"]
+    assert archive.read("000002.xml").startswith(b"<trade><id>2</id>")
+    assert json.loads(archive.read("errors.ndjson")) == {"index": 3, "error": "Variables must be a JSON object"}
+
+
+def test_streaming_render(trade_template):
+    """测试流式渲染：只返回渲染结果，客户端接受时gzip压缩"""
+    test_client, template_id = trade_template
+    expected = "<trade><id>7</id><ccy>USD</ccy><cp>ACME</cp><notional>1000000.00</notional></trade>"
+    url = f"/api/v1/trade-templates/{template_id}/render?stream=true"
+
+    response = test_client.post(url, json={"id": 7}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("application/xml")
+    assert response.text == expected
+
+    response = test_client.post(url, json={"id": 7}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == expected
+
+
+def test_iter_render_chunks():
+    """测试 generate() 的输出按块合并，压缩后可完整解压"""
+    import gzip
+    from app.services.template_renderer import template_renderer
+
+    source = "{% for i in range(n) %}<row>{{ i }}</row>{% endfor %}"
+    chunks = list(template_renderer.iter_render(source, {"n": 5000}, chunk_size=1024))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 1024 for chunk in chunks[:-1])
+    text = b"".join(chunks).decode()
+    assert text.startswith("<row>0</row>") and text.endswith("<row>4999</row>")
+
+    compressed = b"".join(template_renderer.iter_render(source, {"n": 5000}, compress=True))
+    assert gzip.decompress(compressed).decode() == text
+
+
+def test_ndjson_batch_streams_while_body_arrives(trade_template, monkeypatch):
+    """测试NDJSON批量渲染边读请求体边输出：第一条结果在请求体结束之前发出"""
+    import asyncio
+    from app.core.config import settings
+    from app.main import app
+
+    monkeypatch.setattr(settings, "RENDER_BATCH_CHUNK_SIZE", 1)
+    _, template_id = trade_template
+
+    async def run():
+        first_result = asyncio.Event()
+        messages = []
+        body = [b'{"id": 1}\n', b'{"id": 2}\n']
+
+        async def receive():
+            if len(body) == 1:
+                # 最后一行等到第一条结果发出后才到达
+                await asyncio.wait_for(first_result.wait(), 5)
+            if body:
+                return {"type": "http.request", "body": body.pop(0), "more_body": bool(body)}
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            messages.append(message)
+            if message["type"] == "http.response.body" and b'"index":0' in message.get("body", b""):
+                first_result.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": f"/api/v1/trade-templates/{template_id}/render/batch",
+            "raw_path": b"", "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/x-ndjson")],
+            "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), 10)
+        return messages
+
+    messages = asyncio.run(run())
+    assert messages[0]["status"] == 200
+    lines = [json.loads(line) for message in messages[1:] for line in message.get("body", b"").splitlines()]
+    assert [line["index"] for line in lines] == [0, 1]
+    assert lines[1]["rendered_content"].startswith("<trade><id>2</id>")
@@ -0,0 +1,56 @@
+"""
+共享浏览器服务池测试
+"""
+import asyncio
+import sys
+from app.services.browser_servers import BrowserServer, BrowserServerPool
+
+# 与 launch-server 相同的行为：监听端口并输出ws地址
+LISTENER = (
+    "import socket, time\n"
+    "s = socket.socket(); s.bind(('127.0.0.1', 0)); s.listen()\n"
+    "print(f'ws://127.0.0.1:{s.getsockname()[1]}/server', flush=True)\n"
+    "time.sleep(3600)\n"
+)
+
+
+class ListenerServer(BrowserServer):
+    def command(self):
+        return [sys.executable, "-c", LISTENER]
+
+
+def test_lease_limit_health_check_and_restart():
+    """测试会话数上限（超出时等待）、未启动的浏览器类型不提供地址、服务退出后自动重启"""
+    async def run():
+        pool = BrowserServerPool(["chromium"], max_contexts=2, health_interval=0.05, server_factory=ListenerServer)
+        await pool.start()
+        server = pool.servers["chromium"]
+        try:
+            async with pool.lease("firefox") as endpoint:
+                assert endpoint is None
+
+            async def hold():
+                async with pool.lease("chromium") as endpoint:
+                    return endpoint, server.leases
+
+            async with pool.lease("chromium", sessions=2) as endpoint:
+                assert endpoint == server.ws_endpoint and endpoint.startswith("ws://127.0.0.1:")
+                waiting = asyncio.create_task(hold())
+                await asyncio.sleep(0.1)
+                assert not waiting.done()
+            assert await asyncio.wait_for(waiting, 1) == (endpoint, 1)
+            assert server.leases == 0
+
+            first_endpoint = server.ws_endpoint
+            server.process.kill()
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                if server.restarts and await server.is_healthy():
+                    break
+            assert server.restarts == 1 and server.ws_endpoint != first_endpoint
+            return pool.stats()
+        finally:
+            await pool.stop()
+
+    stats = asyncio.run(run())
+    assert stats["servers"]["chromium"]["restarts"] == 1 and stats["max_contexts"] == 2
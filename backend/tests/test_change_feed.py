@@ -0,0 +1,56 @@
+"""
+跨进程变更通知测试
+"""
+import asyncio
+import sqlite3
+from sqlalchemy import create_engine
+from app.core.database import Base
+from app.models import *
+from app.services.change_feed import ChangeFeed
+from app.services.tree_cache import tree_cache
+
+
+def test_other_connection_writes_invalidate_and_broadcast(tmp_path):
+    """测试其他连接（模拟其他worker）的写入使缓存失效，广播消息推送给订阅者"""
+    path = f"{tmp_path}/feed.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    feed = ChangeFeed(path)
+    received = []
+
+    async def on_message(message):
+        received.append(message)
+
+    feed.subscribe("execution_update", on_message)
+
+    async def build():
+        return b"[]"
+
+    async def run():
+        feed.open()
+        await tree_cache.get_or_build("templates", ["trade_templates"], build)
+        await tree_cache.get_or_build("cases", ["test_cases"], build)
+
+        # 空轮询不读取任何表
+        await feed.poll_once()
+        assert tree_cache.get("templates") == b"[]"
+
+        other = sqlite3.connect(path)
+        other.execute(
+            "INSERT INTO trade_templates(name, node_type, sort_order, is_active, created_at, updated_at) "
+            "VALUES ('raw', 'TEMPLATE', 0, 1, datetime('now'), datetime('now'))"
+        )
+        other.commit()
+        other.close()
+        feed.publish("execution_update", {"execution_id": 7, "progress": 50})
+
+        await feed.poll_once()
+        await feed.stop()
+
+    tree_cache.clear()
+    asyncio.run(run())
+    assert tree_cache.get("templates") is None
+    assert tree_cache.get("cases") == b"[]"
+    assert received == [{"execution_id": 7, "progress": 50}]
@@ -0,0 +1,59 @@
+"""
+条件GET（ETag / Last-Modified）测试
+"""
+from app.models import *
+
+
+def test_tree_etag_not_modified_until_change(client):
+    """测试树形接口在数据未变化时返回304，修改后ETag变化"""
+    test_client, db = client
+    root = TestCase(name="root", is_folder=True, creator_id=1)
+    db.add_all([root, TestCase(name="login", parent=root, creator_id=1)])
+    db.commit()
+
+    first = test_client.get("/api/v1/test-cases/tree")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert "Last-Modified" in first.headers
+
+    cached = test_client.get("/api/v1/test-cases/tree", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    # 投影参数不同，表示也不同
+    projected = test_client.get("/api/v1/test-cases/tree", params={"fields": "name"}, headers={"If-None-Match": etag})
+    assert projected.status_code == 200
+
+    # 删除行改变计数，修改行改变 max(updated_at)
+    db.delete(db.query(TestCase).filter_by(name="login").one())
+    db.commit()
+    changed = test_client.get("/api/v1/test-cases/tree", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_detail_conditional_get_and_soft_delete(client):
+    """测试详情接口的条件GET，以及子树软删除后模板树的ETag变化"""
+    test_client, db = client
+    folder = TradeTemplate(name="folder", node_type=TemplateNodeType.FOLDER)
+    template = TradeTemplate(name="trade", node_type=TemplateNodeType.TEMPLATE, parent=folder, jinja2_content="<a/>")
+    db.add_all([folder, template])
+    db.commit()
+
+    detail = test_client.get(f"/api/v1/trade-templates/{template.id}")
+    assert detail.status_code == 200
+    assert test_client.get(
+        f"/api/v1/trade-templates/{template.id}", headers={"If-None-Match": detail.headers["ETag"]}
+    ).status_code == 304
+    assert test_client.get(
+        f"/api/v1/trade-templates/{template.id}", headers={"If-Modified-Since": detail.headers["Last-Modified"]}
+    ).status_code == 304
+    assert test_client.get("/api/v1/trade-templates/999", headers={"If-None-Match": "*"}).status_code == 404
+
+    tree_etag = test_client.get("/api/v1/trade-templates/tree").headers["ETag"]
+    assert test_client.delete(f"/api/v1/trade-templates/{folder.id}").status_code == 200
+    tree = test_client.get("/api/v1/trade-templates/tree", headers={"If-None-Match": tree_etag})
+    assert tree.status_code == 200
+    assert tree.json() == []
@@ -0,0 +1,58 @@
+"""
+SQLite生产配置档测试
+"""
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, RoutingSession, create_sqlite_engines
+from app.models import *
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """创建文件数据库的写引擎和读引擎"""
+    writer, reader = create_sqlite_engines(
+        f"sqlite:///{tmp_path}/profile.db", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=writer)
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+def test_pragmas_applied(engines):
+    """测试连接初始化时设置WAL等参数"""
+    writer, reader = engines
+    with writer.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+    with reader.connect() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("DELETE FROM test_cases"))
+
+
+def test_routing_session_uses_writer_for_writes(engines):
+    """测试读写分离：写操作和写后读取走写引擎，其余查询走读引擎"""
+    writer, reader = engines
+    used = []
+    for name, target in (("writer", writer), ("reader", reader)):
+        event.listen(target, "before_cursor_execute", lambda *args, name=name: used.append(name))
+
+    Session = sessionmaker(class_=RoutingSession, writer=writer, reader=reader)
+    with Session() as db:
+        db.query(TestCase).all()
+        assert used == ["reader"]
+
+        db.add(TestCase(name="case", creator_id=1))
+        db.flush()
+        # 事务内写入后的查询留在写引擎，能看到未提交的数据
+        assert db.query(TestCase).count() == 1
+        assert set(used[1:]) == {"writer"}
+        db.commit()
+
+        used.clear()
+        assert db.query(TestCase).count() == 1
+        assert used == ["reader"]
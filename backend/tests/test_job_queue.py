@@ -0,0 +1,200 @@
+"""
+测试执行队列测试
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import *
+from app.services import job_queue
+from app.services.job_queue import JobWorkerPool, claim, enqueue, finish, recover_expired
+from app.services.test_executor import PlaywrightTestExecutor
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/queue.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _executions(db, count):
+    executions = [TestExecution(name=f"run {i}", executor_id=1) for i in range(count)]
+    db.add_all(executions)
+    db.commit()
+    return [execution.id for execution in executions]
+
+
+def test_claim_priority_lease_recovery_and_retry(session_factory):
+    """测试按优先级原子领取、租约过期后重新排队、失败后退避重试"""
+    db = session_factory()
+    first, urgent, last = _executions(db, 3)
+    job = enqueue(db, first)
+    enqueue(db, urgent, priority=5)
+    enqueue(db, last)
+    assert enqueue(db, first).id == job.id
+
+    assert claim(db, "w1", 60).execution_id == urgent
+    claimed = claim(db, "w2", 60)
+    assert claimed.execution_id == first
+
+    # 模拟进程在执行中崩溃：租约过期，执行状态停留在running
+    db.execute(update(ExecutionJob).where(ExecutionJob.id == claimed.id).values(
+        lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.execute(update(TestExecution).where(TestExecution.id == first).values(status=ExecutionStatus.RUNNING))
+    db.commit()
+    assert recover_expired(db) == [first]
+    assert db.get(TestExecution, first).status == ExecutionStatus.PENDING
+
+    retried = claim(db, "w3", 60)
+    assert (retried.execution_id, retried.attempts) == (first, 2)
+    assert not finish(db, retried.id, "w2", None)  # 旧worker的结果被忽略
+    assert finish(db, retried.id, "w3", "RuntimeError: browser crashed")
+    db.expire_all()
+    requeued = db.get(ExecutionJob, retried.id)
+    assert (requeued.status, requeued.worker_id, requeued.finished_at) == (JobStatus.QUEUED, None, None)
+    # 第2次失败后退避 30 * 2 秒
+    backoff = (requeued.available_at - datetime.utcnow()).total_seconds()
+    assert 55 < backoff <= 60
+
+    # 退避期内不会被领取
+    assert claim(db, "w3", 60).execution_id == last
+    assert claim(db, "w3", 60) is None
+    db.close()
+
+
+def test_recovery_fails_executions_out_of_attempts(session_factory):
+    """测试租约过期且重试用尽的任务标记失败，其执行也标记失败而不是停留在running"""
+    db = session_factory()
+    execution_id = _executions(db, 1)[0]
+    job = enqueue(db, execution_id)
+    db.execute(update(ExecutionJob).where(ExecutionJob.id == job.id).values(max_attempts=1))
+    db.commit()
+    claim(db, "w1", 60)
+    db.execute(update(ExecutionJob).where(ExecutionJob.id == job.id).values(
+        lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.execute(update(TestExecution).where(TestExecution.id == execution_id).values(status=ExecutionStatus.RUNNING))
+    db.commit()
+
+    assert recover_expired(db) == []
+    db.expire_all()
+    assert db.get(ExecutionJob, job.id).status == JobStatus.FAILED
+    execution = db.get(TestExecution, execution_id)
+    assert execution.status == ExecutionStatus.FAILED and execution.completed_at is not None
+    # 过期worker之后提交的结果不覆盖
+    assert not finish(db, job.id, "w1", None)
+    assert db.get(ExecutionJob, job.id).status == JobStatus.FAILED
+    db.close()
+
+
+def test_worker_pool_bounded_concurrency(session_factory, monkeypatch):
+    """测试worker池并发不超过池大小，每个任务使用独立会话，失败重试用尽后标记失败"""
+    running, peak, seen = set(), [0], []
+
+    async def handler(execution_id, db):
+        assert db.get(TestExecution, execution_id) is not None
+        running.add(execution_id)
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.02)
+        running.discard(execution_id)
+        seen.append(execution_id)
+        if execution_id == failing:
+            raise RuntimeError("boom")
+
+    monkeypatch.setitem(job_queue.HANDLERS, "playwright", handler)
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF_SECONDS", 0)
+    db = session_factory()
+    execution_ids = _executions(db, 6)
+    failing = execution_ids[0]
+    for execution_id in execution_ids:
+        enqueue(db, execution_id)
+
+    async def run():
+        pool = JobWorkerPool(2, session_factory, lease_seconds=30, poll_interval=0.01)
+        await pool.start()
+        for _ in range(500):
+            db.expire_all()
+            if not db.query(ExecutionJob).filter(
+                ExecutionJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+            ).count():
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+    asyncio.run(run())
+    assert peak[0] == 2
+    assert sorted(set(seen)) == sorted(execution_ids)
+    assert job_queue.queue_stats(db) == {"queued": 0, "running": 0, "succeeded": 5, "failed": 1}
+    failed = db.query(ExecutionJob).filter(ExecutionJob.status == JobStatus.FAILED).one()
+    assert (failed.execution_id, failed.attempts, failed.last_error) == (failing, 3, "RuntimeError: boom")
+    db.close()
+
+
+def test_playwright_job_keeps_queries_off_the_event_loop(session_factory, monkeypatch):
+    """测试playwright任务的查询和提交都不在事件循环线程中执行"""
+    async def run_pytest(self, execution):
+        assert execution.execution_config == {"tags": ["smoke"]}
+        return {"summary": {"total": 1, "passed": 1}, "tests": []}
+
+    monkeypatch.setattr(PlaywrightTestExecutor, "_run_pytest", run_pytest)
+    db = session_factory()
+    execution = TestExecution(name="run", executor_id=1, execution_config={"tags": ["smoke"]})
+    db.add(execution)
+    db.commit()
+    job = enqueue(db, execution.id)
+    claim(db, "w1", 60)
+    query_threads = set()
+    listener = lambda *args: query_threads.add(threading.get_ident())
+    event.listen(session_factory.kw["bind"], "before_cursor_execute", listener)
+
+    async def run():
+        await JobWorkerPool(1, session_factory).run_job(job, "w1")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    event.remove(session_factory.kw["bind"], "before_cursor_execute", listener)
+    assert query_threads and loop_thread not in query_threads
+    db.expire_all()
+    assert db.get(TestExecution, execution.id).status == ExecutionStatus.COMPLETED
+    assert db.get(ExecutionJob, job.id).status == JobStatus.SUCCEEDED
+    db.close()
+
+
+def test_start_execution_endpoint(client):
+    """测试启动接口只入队：重复启动返回同一任务，队列统计可查询"""
+    test_client, db = client
+    execution_id = _executions(db, 1)[0]
+
+    response = test_client.post(f"/api/v1/test-executions/{execution_id}/start", params={"priority": 3})
+    assert response.status_code == 202
+    job = response.json()
+    assert (job["status"], job["priority"], job["attempts"]) == ("queued", 3, 0)
+    assert test_client.post(f"/api/v1/test-executions/{execution_id}/start").json()["id"] == job["id"]
+
+    assert test_client.get(f"/api/v1/test-executions/{execution_id}/jobs").json()[0]["id"] == job["id"]
+    assert test_client.get("/api/v1/test-executions/queue").json()["jobs"]["queued"] == 1
+    assert test_client.post("/api/v1/test-executions/999/start").status_code == 404
+
+
+def test_execution_updates_pushed_over_websocket(client):
+    """测试执行入队和租约恢复的状态变化推送给WebSocket连接"""
+    test_client, db = client
+    execution_id = _executions(db, 1)[0]
+
+    with test_client.websocket_connect("/api/v1/execution-engine/ws/executions") as websocket:
+        job = test_client.post(f"/api/v1/test-executions/{execution_id}/start").json()
+        message = websocket.receive_json()
+        assert message == {"type": "execution_update", "execution_id": execution_id,
+                           "data": {"job_id": job["id"], "job_status": "queued"}}
+
+        claim(db, "w1", 60)
+        db.execute(update(ExecutionJob).where(ExecutionJob.id == job["id"]).values(
+            lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.execute(update(TestExecution).where(TestExecution.id == execution_id).values(status=ExecutionStatus.RUNNING))
+        db.commit()
+        assert recover_expired(db) == [execution_id]
+        assert websocket.receive_json()["data"] == {"status": "pending"}
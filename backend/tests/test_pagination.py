@@ -0,0 +1,77 @@
+"""
+列表接口键集分页测试
+"""
+from datetime import datetime, timedelta
+from app.models import *
+
+
+def test_keyset_pagination_walks_all_rows(client):
+    """测试分页遍历全部数据，同一时间戳的数据按ID区分"""
+    test_client, db = client
+    base = datetime(2024, 1, 1)
+    # 每两条共用一个created_at，验证 (created_at, id) 的并列处理
+    db.add_all(
+        TestStep(name=f"step-{i}", type=StepType.ACTION, created_at=base + timedelta(minutes=i // 2))
+        for i in range(11)
+    )
+    db.commit()
+
+    names, cursor = [], None
+    while True:
+        params = {"limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        response = test_client.get("/api/v1/test-steps/", params=params)
+        assert response.status_code == 200
+        assert "X-Total-Count" not in response.headers
+        names.extend(step["name"] for step in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert names == [f"step-{i}" for i in reversed(range(11))]
+
+
+def test_unpaged_list_and_total_on_demand(client):
+    """测试不传分页参数时返回全部数据，include_total 时返回总数"""
+    test_client, db = client
+    db.add_all(TradeTemplate(name=f"t-{i}", node_type=TemplateNodeType.TEMPLATE) for i in range(5))
+    db.commit()
+
+    response = test_client.get("/api/v1/trade-templates/")
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+    response = test_client.get("/api/v1/trade-templates/", params={"limit": 2, "include_total": True})
+    assert len(response.json()) == 2
+    assert response.headers["X-Total-Count"] == "5"
+    assert response.headers["X-Next-Cursor"]
+
+    response = test_client.get("/api/v1/trade-templates/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_field_projection(client):
+    """测试字段投影：默认不返回正文，include/fields 控制返回字段和查询列"""
+    test_client, db = client
+    case = TestCase(name="case", gherkin_content="Feature: big", creator_id=1)
+    db.add(case)
+    db.flush()
+    db.add(TestCaseFile(name="login", file_type=FileType.FEATURE, content="Feature: login", test_case_id=case.id))
+    db.commit()
+
+    files = test_client.get("/api/v1/test-case-files/").json()
+    assert "content" not in files[0]
+    assert files[0]["full_name"] == "login.feature"
+
+    files = test_client.get("/api/v1/test-case-files/", params={"include": "content"}).json()
+    assert files[0]["content"] == "Feature: login"
+
+    cases = test_client.get("/api/v1/test-cases/", params={"fields": "name"}).json()
+    assert cases == [{"id": case.id, "name": "case"}]
+
+    tree = test_client.get("/api/v1/test-cases/tree", params={"include": "gherkin_content,files.content"}).json()
+    assert tree[0]["gherkin_content"] == "Feature: big"
+    assert tree[0]["files"][0]["content"] == "Feature: login"
+
+    assert test_client.get("/api/v1/test-cases/", params={"fields": "secret"}).status_code == 400
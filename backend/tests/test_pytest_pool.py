@@ -0,0 +1,110 @@
+"""
+常驻pytest worker池测试
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+from app.services import pytest_worker
+from app.services.pytest_pool import WarmPytestPool
+from app.services.pytest_worker import Worker
+
+# 与 launch-server 相同的行为：监听端口并输出ws地址
+LISTENER = (
+    "import socket, time\n"
+    "s = socket.socket(); s.bind(('127.0.0.1', 0)); s.listen()\n"
+    "print(f'ws://127.0.0.1:{s.getsockname()[1]}/server', flush=True)\n"
+    "time.sleep(3600)\n"
+)
+
+
+def test_warm_pool_runs_and_recycles_workers(tmp_path):
+    """测试执行交给常驻worker（环境变量生效、测试文件重新收集），执行K次后替换worker"""
+    test_file = tmp_path / "test_sample.py"
+    test_file.write_text("import os\n\ndef test_env():\n    assert os.environ['QA_RUN'] == '1'\n")
+
+    async def run():
+        pool = WarmPytestPool(1, max_runs=2, harness_dir=tmp_path, browser_name="", ready_timeout=30)
+        await pool.start()
+        try:
+            args = ["-q", "-p", "no:cacheprovider", str(tmp_path)]
+            first = await pool.run(args, str(tmp_path), {"QA_RUN": "1"})
+            test_file.write_text("def test_changed():\n    assert False\n")
+            second = await pool.run(args, str(tmp_path))
+            third = await pool.run(args, str(tmp_path))
+            return first, second, third, pool.stats()
+        finally:
+            await pool.stop()
+
+    first, second, third, stats = asyncio.run(run())
+    assert first["returncode"] == 0 and "1 passed" in first["stdout"]
+    assert second["returncode"] == 1 and "test_changed" in second["stdout"]
+    assert third["returncode"] == 1
+    assert (stats["runs"], stats["recycled"]) == (3, 1)
+
+
+class ListenerServer(pytest_worker.BrowserServer):
+    def command(self):
+        return [sys.executable, "-c", LISTENER]
+
+
+def test_worker_serves_warm_browser_only_to_matching_headless_runs(tmp_path):
+    """测试常驻worker的浏览器服务地址只传给同类型的无头执行，服务退出后重新启动"""
+    (tmp_path / "test_endpoint.py").write_text(
+        "import os\n\n"
+        "def test_endpoint():\n"
+        "    with open(os.environ['ENDPOINT_FILE'], 'w') as f:\n"
+        "        f.write(os.environ.get('PW_WS_ENDPOINT', ''))\n"
+    )
+    endpoint_file = tmp_path / "endpoint.txt"
+    args = ["-q", "-p", "no:cacheprovider", str(tmp_path)]
+
+    def endpoint(**env):
+        result = worker.run_job({"args": args, "cwd": str(tmp_path),
+                                 "env": {"ENDPOINT_FILE": str(endpoint_file), **env}})
+        assert result["returncode"] == 0, result["stdout"]
+        return endpoint_file.read_text()
+
+    worker = Worker("chromium", server_factory=ListenerServer)
+    worker.warm_up("")
+    try:
+        first = worker.server.ws_endpoint
+        assert first.startswith("ws://127.0.0.1:")
+        assert endpoint(BROWSER="chromium", HEADLESS="true") == first
+        assert endpoint(BROWSER="chromium", HEADLESS="false") == ""
+        assert endpoint(BROWSER="firefox", HEADLESS="true") == ""
+        assert endpoint(BROWSER="chromium", HEADLESS="true", PW_WS_ENDPOINT="ws://leased") == "ws://leased"
+        assert "PW_WS_ENDPOINT" not in os.environ
+
+        worker.server.process.kill()
+        worker.server.process.wait()
+        second = endpoint(BROWSER="chromium", HEADLESS="true")
+        assert second.startswith("ws://127.0.0.1:") and second != first
+    finally:
+        worker.close()
+
+
+def test_pooled_worker_runs_bundle_that_starts_playwright(tmp_path):
+    """测试常驻worker执行自行启动Playwright的执行包（pytest-playwright fixture），连续两次"""
+    pytest.importorskip("playwright")
+    (tmp_path / "test_bundle.py").write_text(
+        "from playwright.sync_api import sync_playwright\n\n"
+        "def test_starts_playwright():\n"
+        "    with sync_playwright() as p:\n"
+        "        assert p.chromium.name == 'chromium'\n"
+    )
+
+    async def run():
+        pool = WarmPytestPool(1, harness_dir=tmp_path, browser_name="chromium", ready_timeout=60)
+        await pool.start()
+        try:
+            args = ["-q", "-p", "no:cacheprovider", str(tmp_path)]
+            env = {"BROWSER": "chromium", "HEADLESS": "true"}
+            return [await pool.run(args, str(tmp_path), env) for _ in range(2)]
+        finally:
+            await pool.stop()
+
+    for result in asyncio.run(run()):
+        assert result["returncode"] == 0, result["stdout"]
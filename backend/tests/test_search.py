@@ -0,0 +1,86 @@
+"""
+全文检索测试
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import *
+from app.services.tree_service import deactivate_subtree
+from app.api.api_v1.endpoints.search import search
+
+
+@pytest.fixture
+def search_db(tmp_path):
+    """创建文件数据库，返回 (同步会话, 检索函数)"""
+    db_url = f"{tmp_path}/search.db"
+    sync_engine = create_engine(f"sqlite:///{db_url}")
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_url}")
+
+    def run_search(q, kinds=None, limit=20, cursor=None):
+        async def run():
+            async with AsyncSession(async_engine) as db:
+                return await search(q=q, kinds=kinds, limit=limit, cursor=cursor, db=db)
+        return asyncio.run(run())
+
+    db = sessionmaker(bind=sync_engine)()
+    try:
+        yield db, run_search
+    finally:
+        db.close()
+        asyncio.run(async_engine.dispose())
+        sync_engine.dispose()
+
+
+def test_search_ranked_highlighted_and_synced(search_db):
+    """测试检索结果排序、高亮，以及触发器同步增删改"""
+    db, run_search = search_db
+    case = TestCase(name="Login works", gherkin_content="Feature: login\n  Scenario: valid <b>password</b>", creator_id=1)
+    step = TestStep(name="open page", type=StepType.ACTION, usage_example="Given I open the login page")
+    template = TradeTemplate(name="FX Spot", node_type=TemplateNodeType.TEMPLATE, jinja2_content="<trade>{{ login }}</trade>")
+    db.add_all([case, step, template])
+    db.commit()
+
+    result = run_search("login")
+    assert [(item["kind"], item["id"]) for item in result["items"]][0] == ("test_case", case.id)
+    assert {item["kind"] for item in result["items"]} == {"test_case", "test_step", "trade_template"}
+    assert result["items"][0]["title"] == "<mark>Login</mark> works"
+    assert "&lt;b&gt;password&lt;/b&gt;" in result["items"][0]["snippet"]
+    assert result["next_cursor"] is None
+
+    # 前缀匹配与类型过滤
+    assert [item["id"] for item in run_search("passw", kinds="test_case")["items"]] == [case.id]
+    with pytest.raises(HTTPException):
+        run_search("login", kinds="unknown")
+
+    # 更新、软删除、删除都同步到索引
+    case.gherkin_content = "Feature: logout"
+    db.commit()
+    deactivate_subtree(db, TradeTemplate, template.id)
+    db.commit()
+    db.delete(step)
+    db.commit()
+    assert [item["title"] for item in run_search("login")["items"]] == ["<mark>Login</mark> works"]
+    assert run_search("logout")["items"][0]["id"] == case.id
+
+
+def test_search_keyset_pagination(search_db):
+    """测试键集分页遍历全部结果且不重复"""
+    db, run_search = search_db
+    db.add_all(TestCase(name=f"checkout case {i}", gherkin_content="checkout " * (i % 5 + 1), creator_id=1) for i in range(25))
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = run_search("checkout", limit=7, cursor=cursor)
+        seen.extend((item["rank"], item["id"]) for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 25
+    assert len({case_id for _, case_id in seen}) == 25
+    assert [rank for rank, _ in seen] == sorted(rank for rank, _ in seen)
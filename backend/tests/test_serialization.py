@@ -0,0 +1,94 @@
+"""
+列表接口行序列化测试
+"""
+from datetime import datetime
+import pytest
+from app.models import *
+from app.utils.serialization import RowSerializer
+
+
+def test_execution_rows_serialized_like_dicts(client):
+    """测试执行列表按列元组序列化：枚举取值、时间为ISO格式、默认值由SQL补齐"""
+    test_client, db = client
+    created = datetime(2024, 5, 1, 8, 30, 15, 120000)
+    db.add_all([
+        TestExecution(
+            name="nightly", status=ExecutionStatus.RUNNING, progress=40, executor_id=1,
+            execution_config={"environment": "staging", "browser": "firefox", "headless": False},
+            created_at=created, updated_at=created,
+        ),
+        TestExecution(name="smoke", executor_id=1, created_at=datetime(2024, 5, 2), updated_at=datetime(2024, 5, 2)),
+    ])
+    db.commit()
+
+    response = test_client.get("/api/v1/test-executions/", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "X-Next-Cursor" in response.headers
+    assert response.json() == [{
+        "id": 2, "name": "smoke", "description": "", "status": "pending", "progress": 0,
+        "environment": "test", "browser": "chromium", "headless": True,
+        "executed_at": "2024-05-02T00:00:00", "created_at": "2024-05-02T00:00:00", "updated_at": "2024-05-02T00:00:00",
+        "test_case_ids": [], "pass_rate": 0, "executor": "system",
+    }]
+
+    nightly = test_client.get(
+        "/api/v1/test-executions/", params={"cursor": response.headers["X-Next-Cursor"]}
+    ).json()[0]
+    assert (nightly["status"], nightly["environment"], nightly["browser"], nightly["headless"]) == (
+        "running", "staging", "firefox", False
+    )
+    assert nightly["created_at"] == created.isoformat()
+
+
+def test_step_rows_fix_legacy_parameters(client):
+    """测试旧版字符串参数列表转换为字典列表"""
+    test_client, db = client
+    db.add(TestStep(name="login", type=StepType.ACTION, parameters=["user", "password"]))
+    db.commit()
+
+    step = test_client.get("/api/v1/test-steps/").json()[0]
+    assert step["type"] == "action"
+    assert step["parameters"] == [{"name": "user", "type": "string"}, {"name": "password", "type": "string"}]
+    assert step["decorator"] == ""
+
+
+def test_constants_are_frozen_and_not_shared():
+    """测试常量字段冻结：列表转为元组，可变值直接拒绝"""
+    serializer = RowSerializer({"id": TestExecution.id}, constants={"ids": [1, [2]], "executor": "system"})
+    first, second = serializer.to_dicts([(1,), (2,)])
+    assert first["ids"] == (1, (2,)) and first["executor"] == "system"
+    first["ids"] = []
+    assert second["ids"] == (1, (2,)) and serializer.constants["ids"] == (1, (2,))
+    with pytest.raises(TypeError):
+        RowSerializer({"id": TestExecution.id}, constants={"config": {}})
+
+
+def test_execution_detail_create_and_update_match_list_rows(client):
+    """测试创建、更新、详情接口返回与列表相同的字段，参数保存在 execution_config"""
+    test_client, db = client
+    db.add(TestCase(name="login", creator_id=1))
+    db.commit()
+
+    created = test_client.post("/api/v1/test-executions/", json={
+        "name": "nightly", "test_case_ids": [1], "browser": "firefox", "headless": False,
+    }).json()
+    assert (created["test_case_ids"], created["browser"], created["headless"], created["status"]) == (
+        [1], "firefox", False, "pending"
+    )
+    assert test_client.get(f"/api/v1/test-executions/{created['id']}").json() == created
+
+    updated = test_client.put(f"/api/v1/test-executions/{created['id']}", json={
+        "name": "nightly", "test_case_ids": [1], "environment": "staging", "status": "running",
+    }).json()
+    assert (updated["environment"], updated["browser"], updated["status"]) == ("staging", "chromium", "running")
+    assert test_client.get("/api/v1/test-executions/").json() == [updated]
+    assert test_client.get("/api/v1/test-executions/", params={"status": "running"}).json() == [updated]
+    assert test_client.get("/api/v1/test-executions/", params={"status": "pending"}).json() == []
+
+    # 未知状态返回422而不是500
+    assert test_client.post("/api/v1/test-executions/", json={"name": "x", "status": "done"}).status_code == 422
+    assert test_client.put(f"/api/v1/test-executions/{created['id']}", json={
+        "name": "nightly", "status": "done",
+    }).status_code == 422
+    assert test_client.get("/api/v1/test-executions/", params={"status": "done"}).status_code == 422
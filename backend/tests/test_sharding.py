@@ -0,0 +1,102 @@
+"""
+执行分片测试
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from app.models import *
+from app.services import test_sharding
+from app.services.shard_plugin import partition
+from app.services.test_executor import PlaywrightTestExecutor
+from app.services.test_sharding import record_durations, shard_args, shard_files
+
+
+def test_partition_longest_processing_time_first():
+    """测试按历史时长最长优先分配到负载最小的分片，没有历史的按中位数估计"""
+    durations = {"a": 10.0, "b": 7.0, "c": 5.0, "d": 4.0, "e": 3.0, "f": 1.0}
+    shards = partition(durations, list(durations), 2)
+    assert shards == [["a", "d", "f"], ["b", "c", "e"]]
+    assert [sum(durations[n] for n in shard) for shard in shards] == [15.0, 15.0]
+
+    # 新场景按已知时长的中位数(4.0)估计
+    shards = partition({"a": 9.0, "b": 4.0, "c": 1.0}, ["a", "b", "c", "new1", "new2"], 3)
+    assert shards == [["a"], ["b", "new2"], ["new1", "c"]]
+    assert partition({}, ["x", "y"], 3)[2] == []
+
+
+def test_sharded_bundle_and_duration_history(client, monkeypatch):
+    """测试执行结果计入时长历史（移动平均），分片执行的文件带上插件与历史时长"""
+    _, db = client
+    monkeypatch.setattr(test_sharding, "XDIST_AVAILABLE", True)
+    report = {"summary": {"total": 3, "passed": 1, "failed": 1, "skipped": 1}, "tests": [
+        {"nodeid": "test_a.py::test_slow@shard0", "outcome": "passed", "duration": 10.0},
+        {"nodeid": "test_a.py::test_fast", "outcome": "failed",
+         "setup": {"duration": 0.5}, "call": {"duration": 1.0}, "teardown": {"duration": 0.5}},
+        {"nodeid": "test_a.py::test_skip", "outcome": "skipped", "duration": 0.0},
+    ]}
+    execution = TestExecution(name="sharded", executor_id=1, execution_config={"shards": 4, "tags": ["smoke"]})
+    db.add(execution)
+    db.commit()
+    executor = PlaywrightTestExecutor(db)
+    executor.process_results(execution, report)
+    db.commit()
+    record_durations(db, [{"nodeid": "test_a.py::test_slow", "outcome": "passed", "duration": 20.0}])
+    db.commit()
+
+    rows = {row.nodeid: row for row in db.query(ScenarioDuration)}
+    assert set(rows) == {"test_a.py::test_slow", "test_a.py::test_fast"}
+    assert (rows["test_a.py::test_slow"].avg_duration, rows["test_a.py::test_slow"].samples) == (13.0, 2)
+    assert rows["test_a.py::test_fast"].avg_duration == 2.0
+
+    files = executor.build_bundle(execution)
+    assert "pytest_collection_modifyitems" in files["conftest.py"]
+    assert json.loads(files["shard_durations.json"]) == {
+        "shards": 4, "durations": {"test_a.py::test_slow": 13.0, "test_a.py::test_fast": 2.0}
+    }
+    assert executor.pytest_args(execution) == ["-n", "4", "--dist", "loadgroup", "-m", "smoke"]
+
+
+def test_sharded_bundle_runs_on_xdist_workers(client, tmp_path):
+    """测试分片执行的文件和参数在 pytest-xdist 下实际运行：每个分片在一个worker上"""
+    pytest.importorskip("xdist")
+    _, db = client
+    record_durations(db, [{"nodeid": "test_a.py::test_slow", "outcome": "passed", "duration": 10.0},
+                          {"nodeid": "test_a.py::test_b", "outcome": "passed", "duration": 1.0}])
+    db.commit()
+    files = shard_files(db, 2)
+    files["test_a.py"] = (
+        "import os\n\n"
+        "def record(name):\n"
+        "    with open(os.path.join(os.path.dirname(__file__), name + '.worker'), 'w') as f:\n"
+        "        f.write(os.environ['PYTEST_XDIST_WORKER'])\n\n"
+        "def test_slow():\n    record('slow')\n\n"
+        "def test_b():\n    record('b')\n\n"
+        "def test_c():\n    record('c')\n"
+    )
+    for path, content in files.items():
+        (tmp_path / path).write_text(content)
+
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *shard_args(2), str(tmp_path)],
+        cwd=tmp_path, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "3 passed" in result.stdout
+    workers = {name: (tmp_path / f"{name}.worker").read_text() for name in ("slow", "b", "c")}
+    # 最长的场景单独一个分片，其余两个在另一个分片（同一个worker）
+    assert workers["b"] == workers["c"] != workers["slow"]
+
+
+def test_shards_fall_back_to_serial_without_xdist(client, monkeypatch):
+    """测试没有安装 pytest-xdist 时分片执行按串行执行（不带 -n 参数和分片插件）"""
+    _, db = client
+    monkeypatch.setattr(test_sharding, "XDIST_AVAILABLE", False)
+    execution = TestExecution(name="sharded", executor_id=1, execution_config={"shards": 4})
+    db.add(execution)
+    db.commit()
+    executor = PlaywrightTestExecutor(db)
+    assert "conftest.py" not in executor.build_bundle(execution)
+    assert executor.pytest_args(execution) == []
@@ -0,0 +1,100 @@
+"""
+标签表达式解析与编译测试
+"""
+import random
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models import *
+from app.models.tag import parse_tags
+from app.services.tag_expression import (
+    And, Not, Or, TagRef, TagExpressionError,
+    compile_tag_expression, parse_tag_expression, tags_to_expression, to_pytest_expression,
+)
+
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db_session():
+    """创建内存数据库会话"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def evaluate(node, tags):
+    """在内存中对标签集合求值，作为对照"""
+    if isinstance(node, TagRef):
+        return node.name in tags
+    if isinstance(node, Not):
+        return not evaluate(node.operand, tags)
+    if isinstance(node, And):
+        return all(evaluate(operand, tags) for operand in node.operands)
+    return any(evaluate(operand, tags) for operand in node.operands)
+
+
+def test_parse_precedence_and_pytest_rendering():
+    """测试运算符优先级与pytest表达式渲染"""
+    node = parse_tag_expression("smoke and not slow or (api and regression)")
+    assert node == Or((
+        And((TagRef("smoke"), Not(TagRef("slow")))),
+        And((TagRef("api"), TagRef("regression"))),
+    ))
+    assert to_pytest_expression(node) == "((smoke and not slow) or (api and regression))"
+    assert parse_tag_expression("@smoke") == TagRef("smoke")
+
+
+def test_tags_to_expression_quotes_names():
+    """测试标签列表转表达式时，含空白、括号、关键字、引号的标签名加引号，解析后仍是原标签"""
+    tags = ["smoke", "slow and flaky", "and", "(wip)", 'say "hi"', "@odd"]
+    expression = tags_to_expression(tags)
+    assert expression.startswith('smoke or "slow and flaky" or "and"')
+    assert parse_tag_expression(expression) == Or(tuple(TagRef(tag) for tag in tags))
+    assert parse_tag_expression("'a b' and not \"or\"") == And((TagRef("a b"), Not(TagRef("or"))))
+    assert to_pytest_expression(parse_tag_expression(tags_to_expression(["smoke", "api"]))) == "(smoke or api)"
+    # pytest -m 无法表达这样的标记名
+    with pytest.raises(TagExpressionError):
+        to_pytest_expression(parse_tag_expression(expression))
+
+
+@pytest.mark.parametrize("expression", ["", "smoke and", "(smoke", "smoke api", "or smoke", "smoke)", "smoke & api", '"smoke'])
+def test_parse_errors(expression):
+    """测试语法错误"""
+    with pytest.raises(TagExpressionError):
+        parse_tag_expression(expression)
+
+
+def test_compiled_sql_matches_in_memory_evaluation(db_session):
+    """测试编译后的SQL结果与逐条求值一致"""
+    rng = random.Random(7)
+    vocabulary = ["smoke", "slow", "api", "regression", "ui"]
+    for i in range(200):
+        tags = ",".join(tag for tag in vocabulary if rng.random() < 0.4)
+        db_session.add(TestCase(name=f"case-{i}", tags=tags, creator_id=1))
+    db_session.commit()
+    case_tags = {case.id: set(parse_tags(case.tags)) for case in db_session.query(TestCase)}
+
+    for expression in [
+        "smoke",
+        "not smoke",
+        "smoke and not slow or (api and regression)",
+        "not (api or ui) and regression",
+        "not slow and not ui",
+        "smoke or missing",
+    ]:
+        node = parse_tag_expression(expression)
+        expected = {case_id for case_id, tags in case_tags.items() if evaluate(node, tags)}
+        assert set(db_session.scalars(compile_tag_expression(expression))) == expected, expression
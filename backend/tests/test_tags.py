@@ -0,0 +1,108 @@
+"""
+测试用例标签索引测试
+"""
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models import *
+from app.models.tag import parse_tags, case_ids_with_any_tag
+
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db_session():
+    """创建内存数据库会话"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def select_cases(db, *names):
+    return db.query(TestCase).filter(TestCase.id.in_(case_ids_with_any_tag(names))).order_by(TestCase.id).all()
+
+
+def test_parse_tags():
+    """测试标签字符串解析"""
+    assert parse_tags(" smoke, @regression,,smoke ") == ["smoke", "regression"]
+    assert parse_tags(None) == []
+
+
+def test_tag_index_sync_and_exact_match(db_session):
+    """测试标签关联在创建、修改、删除时同步，且按标签精确匹配"""
+    smoke = TestCase(name="smoke case", tags="smoke, login", creator_id=1)
+    nosmoke = TestCase(name="nosmoke case", tags="nosmoke", creator_id=1)
+    untagged = TestCase(name="untagged", creator_id=1)
+    db_session.add_all([smoke, nosmoke, untagged])
+    db_session.commit()
+
+    assert select_cases(db_session, "smoke") == [smoke]
+    assert select_cases(db_session, "smoke", "nosmoke") == [smoke, nosmoke]
+    assert sorted(db_session.scalars(select(Tag.name))) == ["login", "nosmoke", "smoke"]
+
+    untagged.tags = "smoke"
+    smoke.tags = "login"
+    db_session.commit()
+    assert select_cases(db_session, "smoke") == [untagged]
+    assert select_cases(db_session, "login") == [smoke]
+
+    untagged_id = untagged.id
+    db_session.delete(untagged)
+    db_session.commit()
+    assert select_cases(db_session, "smoke") == []
+    assert untagged_id not in db_session.scalars(select(test_case_tags.c.test_case_id)).all()
+
+
+def test_execution_endpoints_select_by_tags(client):
+    """测试执行接口按标签和标签表达式选择用例，非法表达式返回400"""
+    test_client, db = client
+    db.add_all([
+        TestCase(name="smoke login", tags="smoke, login", creator_id=1),
+        TestCase(name="smoke slow", tags="smoke, slow", creator_id=1),
+        TestCase(name="api", tags="api", creator_id=1),
+    ])
+    db.commit()
+
+    response = test_client.post("/api/v1/test-executions/", json={"name": "by tags", "tags": ["smoke", "api"]})
+    assert response.status_code == 200
+    execution = db.get(TestExecution, response.json()["id"])
+    assert execution.total_cases == 3
+    assert (execution.execution_config["tags"], execution.execution_config["tag_expression"]) == (["smoke", "api"], None)
+
+    # 与用例标签相同，Gherkin风格的 "@" 前缀被去掉
+    response = test_client.post("/api/v1/test-executions/", json={"name": "gherkin", "tags": ["@smoke", " smoke"]})
+    assert response.status_code == 200
+    execution = db.get(TestExecution, response.json()["id"])
+    assert (execution.total_cases, execution.execution_config["tags"]) == (2, ["smoke"])
+    assert db.execute(case_ids_with_any_tag(["@api"])).scalars().all() == [3]
+
+    response = test_client.post(
+        "/api/v1/test-executions/", json={"name": "by expression", "tag_expression": "smoke and  not slow"}
+    )
+    execution_id = response.json()["id"]
+    assert db.get(TestExecution, execution_id).total_cases == 1
+    assert db.get(TestExecution, execution_id).execution_config["tag_expression"] == "(smoke and not slow)"
+
+    response = test_client.post(f"/api/v1/test-executions/{execution_id}/start", params={"tag_expression": "api or slow"})
+    assert response.status_code == 202
+    db.expire_all()
+    assert db.get(TestExecution, execution_id).execution_config["tag_expression"] == "(api or slow)"
+    response = test_client.post(f"/api/v1/test-executions/{execution_id}/start", params={"tags": ["@api"]})
+    assert response.status_code == 202
+    db.expire_all()
+    assert db.get(TestExecution, execution_id).execution_config["tags"] == ["api"]
+
+    assert test_client.post("/api/v1/test-executions/", json={"name": "bad", "tag_expression": "smoke and"}).status_code == 400
+    assert test_client.post(f"/api/v1/test-executions/{execution_id}/start", params={"tags": ["a b"]}).status_code == 400
@@ -0,0 +1,140 @@
+"""
+Jinja2模板编译缓存测试
+"""
+import os
+import pytest
+from jinja2 import TemplateSyntaxError
+from jinja2.exceptions import SecurityError
+from app.services.template_renderer import TemplateRenderer
+
+TRADE = "<trade><id>{{ trade_id }}</id>{% for leg in legs %}<leg>{{ leg }}</leg>{% endfor %}</trade>"
+
+
+def test_same_source_compiled_once():
+    """测试相同源码只编译一次，LRU按条目数淘汰"""
+    renderer = TemplateRenderer(cache_size=2)
+    assert renderer.render(TRADE, {"trade_id": 1, "legs": ["a"]}) == "<trade><id>1</id><leg>a</leg></trade>"
+    assert renderer.render(TRADE, {"trade_id": 2, "legs": []}) == "<trade><id>2</id></trade>"
+    assert renderer.get_template(TRADE) is renderer.get_template(TRADE)
+    assert (renderer.hits, renderer.misses) == (3, 1)
+
+    renderer.get_template("{{ a }}")
+    renderer.get_template("{{ b }}")
+    assert renderer.stats()["entries"] == 2
+    renderer.get_template(TRADE)
+    assert renderer.misses == 4
+
+    with pytest.raises(TemplateSyntaxError):
+        renderer.get_template("{% for x in %}")
+
+
+def test_sandbox_and_bytecode_cache(tmp_path):
+    """测试沙箱拦截不安全的属性访问，字节码缓存写入磁盘并被新实例复用"""
+    renderer = TemplateRenderer(bytecode_cache_dir=str(tmp_path))
+    with pytest.raises(SecurityError):
+        renderer.render("{{ cycler.__init__.__globals__ }}", {})
+
+    renderer.render(TRADE, {"trade_id": 1, "legs": []})
+    cached_files = os.listdir(tmp_path)
+    assert len(cached_files) == 2
+
+    other = TemplateRenderer(bytecode_cache_dir=str(tmp_path))
+    assert other.render(TRADE, {"trade_id": 3, "legs": ["x"]}) == "<trade><id>3</id><leg>x</leg></trade>"
+    assert os.listdir(tmp_path) == cached_files
+
+
+def test_included_templates_checked_by_revision(client):
+    """测试被引用模板的 uptodate 先比较内存中的失效计数，表未变化时不查询"""
+    from functools import partial
+    from app.models import TradeTemplate, TemplateNodeType
+    from app.services.template_loader import TradeTemplateLoader
+    from app.services.tree_cache import tree_cache
+
+    _, db = client
+    header = TradeTemplate(name="Header", node_type=TemplateNodeType.TEMPLATE, jinja2_content="<hdr>{{ n }}</hdr>")
+    db.add(header)
+    db.commit()
+
+    loader = TradeTemplateLoader(db.get_bind(), revision=partial(tree_cache.generation, "trade_templates"))
+    fetched = []
+    fetch = loader._fetch
+    loader._fetch = lambda full_path: fetched.append(full_path) or fetch(full_path)
+    renderer = TemplateRenderer(named_loader=loader)
+    source = '<trade>{% include "Header" %}</trade>'
+    assert [renderer.render(source, {"n": n}) for n in (1, 2, 3)][-1] == "<trade><hdr>3</hdr></trade>"
+    assert fetched == ["Header"]
+
+    header.jinja2_content = "<header n='{{ n }}'/>"
+    db.commit()
+    assert renderer.render(source, {"n": 4}) == "<trade><header n='4'/></trade>"
+    assert renderer.render(source, {"n": 5}) == "<trade><header n='5'/></trade>"
+    # 提交后一次uptodate查询加一次重新加载，之后不再查询
+    assert fetched == ["Header"] * 3
+
+
+def test_include_by_full_path_and_dependencies(client):
+    """测试按 full_path 引用其他模板：被引用模板修改后重新加载，依赖关系可查询"""
+    from app.models import TradeTemplate, TemplateNodeType
+    from app.services.template_loader import TradeTemplateLoader
+
+    test_client, db = client
+    folder = TradeTemplate(name="Common", node_type=TemplateNodeType.FOLDER)
+    db.add(folder)
+    db.flush()
+    header = TradeTemplate(name="Header", node_type=TemplateNodeType.TEMPLATE, parent_id=folder.id,
+                           jinja2_content="<hdr>{{ trade_id }}</hdr>")
+    trade = TradeTemplate(name="Trade", node_type=TemplateNodeType.TEMPLATE,
+                          jinja2_content='<trade>{% include "Common/Header" %}</trade>')
+    loop = TradeTemplate(name="Loop", node_type=TemplateNodeType.TEMPLATE,
+                         jinja2_content='{% include "Loop" %}{% include "Common/Missing" %}')
+    db.add_all([header, trade, loop])
+    db.commit()
+
+    renderer = TemplateRenderer(named_loader=TradeTemplateLoader(db.get_bind()))
+    assert renderer.render(trade.jinja2_content, {"trade_id": 1}) == "<trade><hdr>1</hdr></trade>"
+    assert renderer.render(trade.jinja2_content, {"trade_id": 2}) == "<trade><hdr>2</hdr></trade>"
+
+    header.jinja2_content = "<header id='{{ trade_id }}'/>"
+    db.commit()
+    assert renderer.render(trade.jinja2_content, {"trade_id": 3}) == "<trade><header id='3'/></trade>"
+    # 引用方按内容哈希缓存，没有重新编译
+    assert renderer.misses == 1
+
+    response = test_client.get(f"/api/v1/trade-templates/{header.id}/dependencies")
+    assert response.json()["dependents"] == ["Trade"]
+    assert test_client.get(f"/api/v1/trade-templates/{trade.id}/dependencies").json()["references"] == ["Common/Header"]
+
+    result = test_client.post(f"/api/v1/trade-templates/{loop.id}/validate").json()
+    assert not result["valid"]
+    assert "Referenced template not found: Common/Missing" in result["errors"]
+    assert "Circular template reference: Loop -> Loop" in result["errors"]
+
+
+def test_undeclared_variables_report(client):
+    """测试静态分析需要的变量（含include的模板），按内容哈希缓存，不渲染模板"""
+    from app.models import TradeTemplate, TemplateNodeType
+    from app.services.template_analysis import analyze
+
+    source = "{% set total = 0 %}{% for leg in legs %}{{ leg.ccy }}{{ total }}{% endfor %}{{ range(n) | list }}"
+    assert analyze(source).variables == {"legs", "n"}
+    assert analyze(source) is analyze(source)
+
+    test_client, db = client
+    header = TradeTemplate(name="Header", node_type=TemplateNodeType.TEMPLATE,
+                           jinja2_content="<hdr>{{ trade_date }}</hdr>")
+    trade = TradeTemplate(name="Trade", node_type=TemplateNodeType.TEMPLATE,
+                          jinja2_content='<trade>{% include "Header" %}{{ trade_id }}</trade>',
+                          template_variables={"trade_id": 1, "book": "X"})
+    broken = TradeTemplate(name="Broken", node_type=TemplateNodeType.TEMPLATE, jinja2_content="{% if %}")
+    db.add_all([header, trade, broken])
+    db.commit()
+
+    result = test_client.get(f"/api/v1/trade-templates/{trade.id}/variables").json()
+    assert result["required"] == ["trade_date", "trade_id"]
+    assert (result["missing"], result["unused"], result["includes"]) == (["trade_date"], ["book"], ["Header"])
+    assert test_client.get(f"/api/v1/trade-templates/{broken.id}/variables").status_code == 400
+
+    report = test_client.get("/api/v1/trade-templates/variables/report", params={"only_missing": True}).json()
+    assert (report["total"], report["with_missing"], report["with_errors"]) == (3, 2, 1)
+    assert [t["full_path"] for t in report["templates"]] == ["Header", "Trade", "Broken"]
+    assert report["templates"][2]["error"].startswith("Jinja2 syntax error")
@@ -0,0 +1,122 @@
+"""
+交易模板XML校验测试
+"""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from app.models import *
+from app.services.job_queue import JobWorkerPool, claim, queue_stats, recover_expired
+from app.services.template_validator import lxml_etree, validate_template
+
+XSD = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="trade"><xs:complexType><xs:sequence>
+    <xs:element name="id" type="xs:integer"/>
+  </xs:sequence></xs:complexType></xs:element>
+</xs:schema>"""
+
+
+def test_validate_rendered_xml():
+    """测试用模板变量渲染后流式解析：格式错误、渲染错误、非XML输出"""
+    assert validate_template("<trade><id>{{ id }}</id></trade>", {"id": 1})["valid"]
+
+    result = validate_template("<trade><id>{{ id }}</trade>", {"id": 1})
+    assert not result["valid"]
+    assert result["errors"][0].startswith("XML parsing error: mismatched tag")
+
+    # 变量内容导致输出不是合法XML，只看模板源码发现不了
+    assert not validate_template("<trade>{{ cp }}</trade>", {"cp": "A & B"})["valid"]
+
+    result = validate_template("<trade>{{ '%d' | format(n) }}</trade>", {"n": "x"})
+    assert result["errors"][0].startswith("Template rendering error: TypeError")
+
+    result = validate_template("{% if %}", {})
+    assert result["errors"][0].startswith("Jinja2 syntax error")
+
+    result = validate_template("plain {{ text }}", {}, XSD)
+    assert result["valid"] and result["warnings"]
+
+    result = validate_template("<trade><id>abc</id></trade>", {}, XSD)
+    if lxml_etree is None:
+        assert result["valid"]
+        assert result["warnings"] == ["XSD validation skipped: lxml is not installed"]
+    else:
+        assert not result["valid"]
+
+
+def run_queue(db):
+    """用绑定测试库的worker执行队列中的任务，直到队列为空"""
+    async def run():
+        pool = JobWorkerPool(1, session_factory=sessionmaker(bind=db.get_bind()), poll_interval=0.02)
+        await pool.start()
+        try:
+            for _ in range(250):
+                await asyncio.sleep(0.02)
+                with pool.session_factory() as session:
+                    stats = queue_stats(session)
+                if not stats["queued"] and not stats["running"]:
+                    return stats
+        finally:
+            await pool.stop()
+
+    return asyncio.run(run())
+
+
+def test_validate_subtree_job(client):
+    """测试子树批量校验：经执行队列运行（请求结束后才执行），逐条保存结果，文件夹的XSD由子节点继承"""
+    test_client, db = client
+    folder = TradeTemplate(name="Swaps", node_type=TemplateNodeType.FOLDER, xml_schema=XSD)
+    db.add(folder)
+    db.flush()
+    good = [
+        TradeTemplate(name=f"T{i}", node_type=TemplateNodeType.TEMPLATE, parent_id=folder.id,
+                      jinja2_content="<trade><id>{{ id }}</id></trade>", template_variables={"id": i})
+        for i in range(3)
+    ]
+    bad = TradeTemplate(name="Broken", node_type=TemplateNodeType.TEMPLATE, parent_id=folder.id,
+                        jinja2_content="<trade><id>{{ id }}</trade>", template_variables={"id": 9})
+    db.add_all(good + [bad])
+    db.commit()
+
+    response = test_client.post(f"/api/v1/trade-templates/{folder.id}/validate/subtree")
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert test_client.get(f"/api/v1/trade-templates/validation-jobs/{job_id}").json()["status"] == "pending"
+    assert db.query(ExecutionJob).one().validation_job_id == job_id
+
+    assert run_queue(db)["succeeded"] == 1
+    job = test_client.get(f"/api/v1/trade-templates/validation-jobs/{job_id}").json()
+    assert (job["status"], job["total"], job["valid_count"], job["invalid_count"]) == ("completed", 4, 3, 1)
+    assert [result["full_path"] for result in job["results"]] == ["Swaps/Broken"]
+    assert job["results"][0]["errors"][0].startswith("XML parsing error")
+
+    all_results = test_client.get(
+        f"/api/v1/trade-templates/validation-jobs/{job_id}", params={"only_invalid": False}
+    ).json()["results"]
+    assert len(all_results) == 4
+
+    result = test_client.post(f"/api/v1/trade-templates/{good[0].id}/validate").json()
+    assert result["valid"]
+    assert test_client.get("/api/v1/trade-templates/validation-jobs/999").status_code == 404
+
+
+def test_validation_job_recovered_after_lease_expiry(client):
+    """测试校验任务的worker中途退出：租约过期后任务重新排队，再次执行到结束"""
+    test_client, db = client
+    template = TradeTemplate(name="T", node_type=TemplateNodeType.TEMPLATE,
+                             jinja2_content="<trade>{{ id }}</trade>", template_variables={"id": 1})
+    db.add(template)
+    db.commit()
+    job_id = test_client.post(f"/api/v1/trade-templates/{template.id}/validate/subtree").json()["id"]
+
+    # 领取后进程退出：任务停在RUNNING，校验任务停在运行中
+    queued = claim(db, "dead-worker", 60)
+    db.query(TemplateValidationJob).update({"status": ValidationJobStatus.RUNNING})
+    queued.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    recover_expired(db)
+    db.expire_all()
+    assert db.get(TemplateValidationJob, job_id).status == ValidationJobStatus.PENDING
+
+    run_queue(db)
+    job = test_client.get(f"/api/v1/trade-templates/validation-jobs/{job_id}").json()
+    assert (job["status"], job["total"], job["valid_count"]) == ("completed", 1, 1)
@@ -0,0 +1,111 @@
+"""
+树形接口缓存测试
+"""
+import asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import *
+from app.services.tree_cache import TreeCache, tree_cache
+from app.services.tree_service import deactivate_subtree
+
+
+def test_concurrent_misses_build_once():
+    """测试同一键的并发未命中只构建一次"""
+    cache = TreeCache(max_bytes=1024)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.01)
+        return b"[1]"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_build("key", ["test_cases"], build) for _ in range(5)))
+
+    assert asyncio.run(run()) == [b"[1]"] * 5
+    assert len(builds) == 1
+    assert asyncio.run(cache.get_or_build("key", ["test_cases"], build)) == b"[1]"
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+
+def test_byte_bound_eviction_and_stale_build():
+    """测试按字节数淘汰最久未使用的条目，构建期间表被修改时不写入缓存"""
+    cache = TreeCache(max_bytes=10)
+
+    async def fill(key, payload):
+        async def build():
+            return payload
+        return await cache.get_or_build(key, ["trade_templates"], build)
+
+    asyncio.run(fill("a", b"aaaa"))
+    asyncio.run(fill("b", b"bbbb"))
+    cache.get("a")
+    asyncio.run(fill("c", b"cccc"))
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.stats()["bytes"] == 8
+
+    async def racing_build():
+        cache.invalidate(["trade_templates"])
+        return b"old"
+
+    assert asyncio.run(cache.get_or_build("d", ["trade_templates"], racing_build)) == b"old"
+    assert cache.get("d") is None
+
+
+def test_commit_invalidates_dependent_entries(tmp_path):
+    """测试提交（包括批量软删除）使依赖该表的条目失效，回滚不失效"""
+    engine = create_engine(f"sqlite:///{tmp_path}/cache.db")
+    Base.metadata.create_all(bind=engine)
+    tree_cache.clear()
+
+    async def build():
+        return b"[]"
+
+    def warm():
+        for key, table in (("templates", "trade_templates"), ("cases", "test_cases")):
+            asyncio.run(tree_cache.get_or_build(key, [table], build))
+
+    with sessionmaker(bind=engine)() as db:
+        folder = TradeTemplate(name="folder", node_type=TemplateNodeType.FOLDER)
+        db.add(folder)
+        db.commit()
+
+        warm()
+        folder.name = "renamed"
+        db.flush()
+        db.rollback()
+        assert tree_cache.get("templates") == b"[]"
+
+        deactivate_subtree(db, TradeTemplate, folder.id)
+        db.commit()
+        assert tree_cache.get("templates") is None
+        assert tree_cache.get("cases") == b"[]"
+
+        warm()
+        db.add(TestCase(name="case", creator_id=1))
+        db.commit()
+        assert tree_cache.get("templates") == b"[]"
+        assert tree_cache.get("cases") is None
+    engine.dispose()
+
+
+def test_tree_endpoint_served_from_cache(client):
+    """测试树形接口第二次请求命中缓存，写入后重新构建"""
+    test_client, db = client
+    db.add(TradeTemplate(name="trade", node_type=TemplateNodeType.TEMPLATE))
+    db.commit()
+
+    hits = test_client.get("/health/cache").json()["hits"]
+    first = test_client.get("/api/v1/trade-templates/tree")
+    second = test_client.get("/api/v1/trade-templates/tree")
+    assert first.json() == second.json() == [first.json()[0]]
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert test_client.get("/health/cache").json()["hits"] == hits + 1
+
+    created = test_client.post("/api/v1/trade-templates/", json={"name": "other", "node_type": "template"})
+    assert created.status_code == 200
+    names = [node["name"] for node in test_client.get("/api/v1/trade-templates/tree").json()]
+    assert sorted(names) == ["other", "trade"]
@@ -0,0 +1,246 @@
+"""
+树形结构加载测试
+"""
+import asyncio
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models import *
+from app.services.tree_service import load_subtree, build_tree, deactivate_subtree
+from app.api.api_v1.endpoints.test_cases_simplified import TEST_CASE_FIELDS, load_test_cases_tree
+from app.api.api_v1.endpoints.test_case_files import TEST_CASE_FILE_FIELDS
+from app.utils.projection import ProjectionParams
+
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db_session():
+    """创建内存数据库会话"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def create_case_tree(db, depth=4, fanout=3):
+    """创建一棵多层测试用例树，返回根节点"""
+    root = TestCase(name="root", is_folder=True, creator_id=1)
+    db.add(root)
+    db.flush()
+
+    level = [root]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                is_leaf = d == depth - 1
+                case = TestCase(
+                    name=f"{parent.name}-{i}",
+                    is_folder=not is_leaf,
+                    parent_id=parent.id,
+                    sort_order=fanout - i,
+                    creator_id=1,
+                )
+                db.add(case)
+                next_level.append(case)
+        db.flush()
+        level = next_level
+
+    for leaf in level:
+        db.add(TestCaseFile(name=leaf.name, file_type=FileType.FEATURE, content="Feature: x", test_case_id=leaf.id))
+    db.commit()
+    return root
+
+
+def count_queries(target=engine):
+    """统计执行的SQL语句数量"""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", before_execute)
+    return statements, lambda: event.remove(target, "before_cursor_execute", before_execute)
+
+
+def test_load_subtree_and_build_tree(db_session):
+    """测试子树加载与内存组装"""
+    root = create_case_tree(db_session, depth=2, fanout=2)
+
+    nodes = load_subtree(db_session, TestCase, root.id, order_by=(TestCase.sort_order, TestCase.id))
+    assert len(nodes) == 6
+
+    tree = build_tree(nodes, lambda n: {"id": n.id, "name": n.name}, root.id)
+    assert [n["name"] for n in tree] == ["root-1", "root-0"]
+    assert [n["name"] for n in tree[0]["children"]] == ["root-1-1", "root-1-0"]
+    assert tree[0]["children"][0]["children"] == []
+
+
+def test_tree_endpoint_query_count_is_constant(tmp_path):
+    """测试树形接口的查询次数与节点数量无关"""
+    db_url = f"{tmp_path}/tree.db"
+    sync_engine = create_engine(f"sqlite:///{db_url}")
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as db:
+        create_case_tree(db, depth=4, fanout=3)
+    sync_engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_url}")
+
+    async def load_tree():
+        async with AsyncSession(async_engine) as db:
+            return await load_test_cases_tree(
+                db, None, TEST_CASE_FIELDS.resolve(ProjectionParams(None, None).own(["files"])),
+                TEST_CASE_FILE_FIELDS.resolve(ProjectionParams(None, None)),
+            )
+
+    statements, stop = count_queries(async_engine.sync_engine)
+    try:
+        tree = asyncio.run(load_tree())
+    finally:
+        stop()
+        asyncio.run(async_engine.dispose())
+
+    assert len(statements) == 2
+    assert len(tree) == 1
+
+    leaf = tree[0]["children"][0]["children"][0]["children"][0]["children"][0]
+    assert leaf["children"] == []
+    assert len(leaf["files"]) == 1
+    assert leaf["full_path"] == "root/root-2/root-2-2/root-2-2-2/root-2-2-2-2"
+    # 默认投影不包含正文
+    assert "gherkin_content" not in leaf
+    assert "content" not in leaf["files"][0]
+    assert tree[0]["files"] == []
+
+
+def test_materialized_path_on_create_move_and_rename(db_session):
+    """测试物化路径在创建、移动、重命名时保持同步"""
+    folder_a = TradeTemplate(name="A", node_type=TemplateNodeType.FOLDER)
+    folder_b = TradeTemplate(name="B", node_type=TemplateNodeType.FOLDER, parent=folder_a)
+    template = TradeTemplate(name="Trade", node_type=TemplateNodeType.TEMPLATE, parent=folder_b)
+    folder_x = TradeTemplate(name="X", node_type=TemplateNodeType.FOLDER)
+    db_session.add_all([folder_a, folder_b, template, folder_x])
+    db_session.commit()
+
+    assert template.full_path == "A/B/Trade"
+    assert template.path == f"/{folder_a.id}/{folder_b.id}/{template.id}/"
+    assert template.ancestor_ids == [folder_a.id, folder_b.id]
+    assert template.is_descendant_of(folder_a)
+
+    # 移动子树
+    folder_b.parent_id = folder_x.id
+    db_session.commit()
+    assert template.full_path == "X/B/Trade"
+    assert not template.is_descendant_of(folder_a)
+    assert folder_x.get_all_children() == [folder_b, template]
+
+    # 重命名祖先节点
+    folder_x.name = "Y"
+    db_session.commit()
+    db_session.expire_all()
+    assert db_session.get(TradeTemplate, template.id).full_path == "Y/B/Trade"
+
+    # 不允许移动到自身子树下
+    folder_x.parent_id = template.id
+    with pytest.raises(ValueError):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_update_recomputes_missing_materialized_path(db_session):
+    """测试没有物化路径的旧数据在首次更新时按父链补算，而不是报错"""
+    folder = TradeTemplate(name="A", node_type=TemplateNodeType.FOLDER)
+    template = TradeTemplate(name="Trade", node_type=TemplateNodeType.TEMPLATE, parent=folder)
+    db_session.add_all([folder, template])
+    db_session.commit()
+    db_session.query(TradeTemplate).update({"path": None, "full_path": None})
+    db_session.commit()
+    db_session.expire_all()
+
+    template = db_session.get(TradeTemplate, template.id)
+    template.description = "edited"
+    db_session.commit()
+    db_session.expire_all()
+    assert db_session.get(TradeTemplate, template.id).full_path == "A/Trade"
+    assert db_session.get(TradeTemplate, folder.id).path == f"/{folder.id}/"
+
+    template.name = "Renamed"
+    db_session.commit()
+    assert template.path == f"/{folder.id}/{template.id}/" and template.full_path == "A/Renamed"
+
+
+def test_deactivate_subtree_single_statement(db_session):
+    """测试子树软删除只执行一条UPDATE"""
+    root = TradeTemplate(name="root", node_type=TemplateNodeType.FOLDER)
+    db_session.add(root)
+    db_session.flush()
+    parent = root
+    for depth in range(6):
+        child = TradeTemplate(name=f"level-{depth}", node_type=TemplateNodeType.FOLDER, parent_id=parent.id)
+        sibling = TradeTemplate(name=f"leaf-{depth}", node_type=TemplateNodeType.TEMPLATE, parent_id=parent.id)
+        db_session.add_all([child, sibling])
+        db_session.flush()
+        parent = child
+    other = TradeTemplate(name="other", node_type=TemplateNodeType.FOLDER)
+    db_session.add(other)
+    db_session.commit()
+    root_id = root.id
+
+    statements, stop = count_queries()
+    try:
+        count = deactivate_subtree(db_session, TradeTemplate, root_id)
+    finally:
+        stop()
+    db_session.commit()
+
+    assert len(statements) == 1
+    assert count == 13
+    assert db_session.query(TradeTemplate).filter(TradeTemplate.is_active == True).all() == [other]
+    assert deactivate_subtree(db_session, TradeTemplate, root_id) == 0
+
+
+def test_move_endpoints_reject_cycles(client):
+    """测试更新接口移动节点：移到自身或子孙节点下、父节点不存在时返回400，正常移动重写路径"""
+    test_client, db = client
+
+    def create(url, **fields):
+        response = test_client.post(url, json=fields)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    root = create("/api/v1/test-cases/", name="root", is_folder=True)
+    child = create("/api/v1/test-cases/", name="child", is_folder=True, parent_id=root)
+    leaf = create("/api/v1/test-cases/", name="leaf", parent_id=child)
+
+    for parent_id in (root, leaf, 999):
+        response = test_client.put(f"/api/v1/test-cases/{root}", json={"parent_id": parent_id})
+        assert response.status_code == 400
+    response = test_client.put(f"/api/v1/test-cases/{child}", json={"parent_id": None})
+    assert (response.status_code, response.json()["parent_id"]) == (200, None)
+    db.expire_all()
+    assert (db.get(TestCase, leaf).path, db.get(TestCase, leaf).full_path) == (f"/{child}/{leaf}/", "child/leaf")
+    # 名称冲突按新的层级检查
+    create("/api/v1/test-cases/", name="leaf", parent_id=root)
+    assert test_client.put(f"/api/v1/test-cases/{leaf}", json={"parent_id": root}).status_code == 400
+
+    folder = create("/api/v1/trade-templates/", name="folder", node_type="folder")
+    template = create("/api/v1/trade-templates/", name="t", node_type="template", parent_id=folder)
+    assert test_client.put(f"/api/v1/trade-templates/{folder}", json={"parent_id": template}).status_code == 400
+    assert test_client.put(f"/api/v1/trade-templates/{template}", json={"parent_id": None}).status_code == 200
+    db.expire_all()
+    assert db.get(TradeTemplate, template).path == f"/{template}/"
+
@@ -19,7 +19,11 @@ def browser():
     headless = os.getenv("HEADLESS", "false").lower() == "true"
     
     with sync_playwright() as p:
-        if browser_type == "firefox":
+        ws_endpoint = os.getenv("PW_WS_ENDPOINT")
+        if ws_endpoint:
+            # 连接QA系统后端的共享浏览器服务；close() 只断开连接，服务继续运行
+            browser = getattr(p, browser_type if browser_type in ("firefox", "webkit") else "chromium").connect(ws_endpoint)
+        elif browser_type == "firefox":
             browser = p.firefox.launch(headless=headless, slow_mo=int(os.getenv("SLOW_MO", "0")))
         elif browser_type == "webkit":
             browser = p.webkit.launch(headless=headless, slow_mo=int(os.getenv("SLOW_MO", "0")))
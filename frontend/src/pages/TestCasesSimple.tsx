@@ -398,6 +398,22 @@ config:
     }
   }
 
+  // The file list omits content; load it when a file is opened
+  const loadFileContent = async (file: any) => {
+    setFileContent('')
+    try {
+      const response = await fetch(`http://localhost:8000/api/v1/test-case-files/${file.id}`)
+      if (response.ok) {
+        const detail = await response.json()
+        setSelectedFile({ ...file, content: detail.content })
+        setFileContent(detail.content || '')
+      }
+    } catch (error) {
+      console.error('Failed to load file content:', error)
+      message.error('Failed to load file content')
+    }
+  }
+
   const onTreeSelect = (selectedKeys: any[], info: any) => {
     if (selectedKeys.length > 0 && info.node.data) {
       const nodeData = info.node.data
@@ -405,7 +421,7 @@ config:
 
       if (nodeData.nodeType === 'file') {
         setSelectedFile(nodeData)
-        setFileContent(nodeData.content || '')
+        loadFileContent(nodeData)
         setSelectedTestCase(nodeData.parentTestCase)
         setSelectedParentId(null) // Files don't set parent for new items
       } else {
@@ -247,6 +247,22 @@ const TradeTemplatesNewPage: React.FC = () => {
 
 
 
+  // The template list omits jinja2_content; load it when a template is opened
+  const loadTemplateContent = async (template: any) => {
+    setTemplateContent('')
+    try {
+      const response = await fetch(`http://localhost:8000/api/v1/trade-templates/${template.id}`)
+      if (response.ok) {
+        const detail = await response.json()
+        setSelectedTemplate({ ...template, jinja2_content: detail.jinja2_content })
+        setTemplateContent(detail.jinja2_content || '')
+      }
+    } catch (error) {
+      console.error('Failed to load template content:', error)
+      message.error('Failed to load template content')
+    }
+  }
+
   const onTreeSelect = (selectedKeys: any[], info: any) => {
     if (selectedKeys.length > 0 && info.node.data) {
       const nodeData = info.node.data
@@ -255,7 +271,7 @@ const TradeTemplatesNewPage: React.FC = () => {
       setSelectedTemplate(nodeData)
       
       if (nodeData.nodeType === 'template') {
-        setTemplateContent(nodeData.jinja2_content || '')
+        loadTemplateContent(nodeData)
       } else if (nodeData.nodeType === 'folder') {
         setSelectedParentId(nodeData.id)
       }